@@ -0,0 +1,139 @@
+"""
+Compares the vectorized Fact_Tickets builder with the previous
+map/apply/explode/merge implementation on synthetic tickets.
+
+Run from `src`:
+
+    python -m benchmarks.fact_tickets_benchmark --rows 1000000 10000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from services.transform_dw_service import TransformDwService
+from utils.columnar import as_datetime
+
+# Tag ids travel as text, like the GUIDs read from the source
+TAG_IDS = np.array([str(i) for i in range(1, 300)], dtype=object)
+
+
+def make_tickets(rows: int, seed: int = 42):
+    """Synthetic tickets (fact columns only) and ~1.5 tags per ticket."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2024-01-01T00:00")
+    created = start + rng.integers(0, 525600, rows).astype("timedelta64[m]")
+    closed = created + rng.integers(1, 20000, rows).astype("timedelta64[m]")
+    closed[rng.random(rows) < 0.3] = np.datetime64("NaT")
+    tickets = pd.DataFrame(
+        {
+            "ticket_id": np.arange(1, rows + 1),
+            "user_id": rng.integers(1, 100000, rows),
+            "agent_id": rng.integers(1, 500, rows),
+            "company_id": rng.integers(1, 5000, rows),
+            "category_id": rng.integers(1, 50, rows),
+            "priorityId": rng.integers(1, 5, rows),
+            "current_status": rng.integers(1, 8, rows),
+            "product_id": rng.integers(1, 200, rows),
+            "channel": rng.choice(
+                np.array(["Email", "Phone", "Chat", "Portal"], dtype=object), rows
+            ),
+            "created_at": created,
+            "closed_at": closed,
+            "first_response_at": created + np.timedelta64(30, "m"),
+        }
+    )
+    tags_per_ticket = rng.integers(0, 4, rows)
+    tags = pd.DataFrame(
+        {
+            "ticket_id": np.repeat(tickets["ticket_id"].to_numpy(), tags_per_ticket),
+            "tag_id": TAG_IDS[rng.integers(0, len(TAG_IDS), tags_per_ticket.sum())],
+        }
+    )
+    return tickets, tags
+
+
+def legacy_create_fact_tickets(df, tags_data, dim_dates):
+    """The fact builder this benchmark measures against."""
+    ticket_to_tags_map = {}
+    if not tags_data.empty:
+        ticket_to_tags_map = (
+            tags_data.groupby(tags_data["ticket_id"].astype(str))["tag_id"]
+            .agg(list)
+            .to_dict()
+        )
+
+    df["TagId_BK_List"] = df["ticket_id"].astype(str).map(ticket_to_tags_map)
+    df["TagId_BK_List"] = df["TagId_BK_List"].apply(
+        lambda x: x if (isinstance(x, list) and x) else ["-1"]
+    )
+    fact = df.explode("TagId_BK_List").rename(columns={"TagId_BK_List": "TagId_BK"})
+    dim_dates_with_key = dim_dates.reset_index().rename(columns={"index": "DateKey"})
+    for date_col_name, new_key_name in [
+        ("created_at", "EntryDateKey"),
+        ("closed_at", "ClosedDateKey"),
+        ("first_response_at", "FirstResponseDateKey"),
+    ]:
+        temp_dates = as_datetime(fact[date_col_name])
+        fact_date_parts = pd.DataFrame(
+            {
+                "Year": temp_dates.dt.year,
+                "Month": temp_dates.dt.month,
+                "Day": temp_dates.dt.day,
+                "Hour": temp_dates.dt.hour,
+                "Minute": temp_dates.dt.minute,
+            }
+        ).reset_index()
+        merged_keys = pd.merge(
+            fact_date_parts,
+            dim_dates_with_key,
+            on=["Year", "Month", "Day", "Hour", "Minute"],
+            how="left",
+        )
+        fact[new_key_name] = merged_keys.sort_values("index")["DateKey"]
+    fact["QtTickets"] = 1
+    return fact.reset_index(drop=True)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[1000000, 10000000], metavar="N"
+    )
+    parser.add_argument(
+        "--skip-legacy",
+        action="store_true",
+        help="Time only the vectorized builder (the legacy one needs far more memory).",
+    )
+    args = parser.parse_args()
+
+    service = TransformDwService()
+    for rows in args.rows:
+        tickets, tags = make_tickets(rows)
+        dim_dates = service._create_dim_dates(tickets)
+
+        fact, vectorized_seconds = timed(
+            service._create_fact_tickets, tickets, tags, dim_dates
+        )
+        line = f"{rows:>10} tickets -> {len(fact):>10} fact rows | vectorized {vectorized_seconds:7.2f}s"
+        del fact
+
+        if not args.skip_legacy:
+            legacy_fact, legacy_seconds = timed(
+                legacy_create_fact_tickets, tickets, tags, dim_dates
+            )
+            del legacy_fact
+            line += f" | legacy {legacy_seconds:7.2f}s | x{legacy_seconds / vectorized_seconds:.1f}"
+        print(line, flush=True)
+
+
+if __name__ == "__main__":
+    main()
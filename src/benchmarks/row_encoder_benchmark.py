@@ -0,0 +1,80 @@
+"""
+Compares the column-wise row encoder with the per-cell conversions it
+replaced, on Fact_Tickets rows built from synthetic tickets.
+
+Run from `src`:
+
+    python -m benchmarks.row_encoder_benchmark --rows 1000000 2000000
+"""
+
+import argparse
+
+import pandas as pd
+
+from benchmarks.fact_tickets_benchmark import make_tickets, timed
+from services.transform_dw_service import TransformDwService
+from utils.row_encoder import encode_rows
+
+
+def legacy_to_native_rows(df):
+    """The per-cell conversion of the fact staging insert."""
+
+    def to_native(val):
+        if pd.isna(val):
+            return None
+        if hasattr(val, "item"):
+            return val.item()
+        return val
+
+    return [
+        tuple(to_native(x) for x in row)
+        for row in df.itertuples(index=False, name=None)
+    ]
+
+
+def legacy_where_rows(df):
+    """The object-frame conversion of the dimension staging insert."""
+    return df.astype(object).where(pd.notnull(df), None).values.tolist()
+
+
+def encoded_rows(df):
+    """Encodes every chunk, like the staging insert; returns the first one."""
+    first_chunk = None
+    for chunk in encode_rows(df):
+        if first_chunk is None:
+            first_chunk = chunk
+    return first_chunk or []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[1000000, 2000000], metavar="N"
+    )
+    args = parser.parse_args()
+
+    service = TransformDwService()
+    for rows in args.rows:
+        tickets, tags = make_tickets(rows)
+        # Calendar keys: nullable Int64 date/time keys next to int64 and text
+        fact = service._create_fact_tickets(tickets, tags, None)
+        del tickets, tags
+
+        encoded, encoder_seconds = timed(encoded_rows, fact)
+        line = f"{len(fact):>10} fact rows | encoder {encoder_seconds:7.2f}s"
+
+        for name, legacy in (
+            ("to_native", legacy_to_native_rows),
+            ("where", legacy_where_rows),
+        ):
+            legacy_encoded, legacy_seconds = timed(legacy, fact)
+            if [tuple(row) for row in legacy_encoded[: len(encoded)]] != encoded:
+                raise AssertionError(f"{name} rows differ from the encoder's")
+            del legacy_encoded
+            line += f" | {name} {legacy_seconds:7.2f}s x{legacy_seconds / encoder_seconds:.1f}"
+        del encoded
+        print(line, flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,657 @@
+import hashlib
+import os
+import sqlite3
+from datetime import date, datetime
+from typing import Iterator, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+
+from utils.columnar import record_batch_from_rows, schema_from_description
+from utils.row_encoder import encode_rows
+
+from .logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# How long a SQLite connection waits for another one's write transaction
+SQLITE_BUSY_TIMEOUT_SECONDS = 300
+
+
+class SqlBackend:
+    """
+    Database engine behind DBConnector: opens the connections, reads result
+    sets into Arrow and renders the statements whose syntax differs between
+    engines. The defaults are the ANSI forms shared by SQLite and DuckDB.
+    """
+
+    name = None
+    supports_fast_executemany = False
+    supports_bulk_insert = False
+    supports_savepoints = True
+    current_timestamp_sql = "SELECT CURRENT_TIMESTAMP"
+    boolean_type = "BOOLEAN"
+    business_key_type = "VARCHAR(255)"
+
+    def connect(self, connector):
+        raise NotImplementedError
+
+    def begin_transaction(self, connection):
+        """
+        Opens a transaction for DBConnector.transaction. pyodbc connections
+        (autocommit off) always have one open, so this is a no-op by default.
+        """
+
+    def savepoint_sql(self, name: str) -> str:
+        return f"SAVEPOINT {name}"
+
+    def rollback_to_savepoint_sql(self, name: str) -> str:
+        return f"ROLLBACK TO SAVEPOINT {name}"
+
+    def release_savepoint_sql(self, name: str) -> Optional[str]:
+        return f"RELEASE SAVEPOINT {name}"
+
+    def iter_record_batches(self, cursor, arraysize: int) -> Iterator[pa.RecordBatch]:
+        """
+        Yields the pending result set of an executed cursor as Arrow record
+        batches of up to `arraysize` rows, one `fetchmany` block each.
+        """
+        raise NotImplementedError
+
+    def fetch_table(self, cursor, arraysize: int) -> pa.Table:
+        """Reads the pending result set of an executed cursor into Arrow."""
+        raise NotImplementedError
+
+    def quote(self, identifier: str) -> str:
+        return f'"{identifier}"'
+
+    def top(self, limit: Optional[int]) -> str:
+        """Row limit placed right after SELECT."""
+        return ""
+
+    def limit(self, limit: Optional[int]) -> str:
+        """Row limit placed at the end of the query."""
+        return f"LIMIT {int(limit)}" if limit else ""
+
+    def temp_table_name(self, name: str, shared: bool = False) -> str:
+        """
+        Name of a staging table. `shared` tables must be visible to the other
+        connections of the pool, not only to the session that creates them.
+        """
+        return name
+
+    def create_temp_table_sql(
+        self, table: str, columns_ddl: str, shared: bool = False
+    ) -> str:
+        temp = "" if shared else "TEMP "
+        return f"CREATE {temp}TABLE {table} ({columns_ddl})"
+
+    def create_temp_table_like_sql(
+        self, table: str, source_table: str, shared: bool = False
+    ) -> str:
+        temp = "" if shared else "TEMP "
+        return f"CREATE {temp}TABLE {table} AS SELECT * FROM {source_table} WHERE 1 = 0"
+
+    def create_table_if_missing_sql(self, table: str, columns_ddl: str) -> str:
+        return f"CREATE TABLE IF NOT EXISTS {table} ({columns_ddl})"
+
+    def create_index_sql(
+        self,
+        index_name: str,
+        table: str,
+        columns: Sequence[str],
+        unique: bool = False,
+        clustered: bool = False,
+    ) -> Optional[str]:
+        unique_clause = "UNIQUE " if unique else ""
+        columns_str = ", ".join(self.quote(c) for c in columns)
+        return f"CREATE {unique_clause}INDEX {index_name} ON {table}({columns_str})"
+
+    def upsert_sql(
+        self,
+        target: str,
+        source: str,
+        key_column: str,
+        update_columns: Sequence[str],
+    ) -> List[str]:
+        """
+        Statements that update the rows of `target` matched by `key_column`
+        in `source` and insert the unmatched ones.
+        """
+        key = self.quote(key_column)
+        statements = []
+        if update_columns:
+            update_set = ", ".join(
+                f"{self.quote(c)} = Source.{self.quote(c)}" for c in update_columns
+            )
+            statements.append(
+                f"""
+                UPDATE {target} AS Target SET {update_set}
+                FROM {source} AS Source
+                WHERE Target.{key} = Source.{key}
+                """
+            )
+        statements.extend(
+            self.insert_missing_sql(
+                target,
+                source,
+                f"Target.{key} = Source.{key}",
+                [key_column, *update_columns],
+            )
+        )
+        return statements
+
+    def insert_missing_sql(
+        self,
+        target: str,
+        source: str,
+        match_condition: str,
+        columns: Sequence[str],
+    ) -> List[str]:
+        """
+        Statements that insert the `source` rows with no `target` row matching
+        `match_condition` (written against the Target and Source aliases).
+        """
+        insert_cols = ", ".join(self.quote(c) for c in columns)
+        source_cols = ", ".join(f"Source.{self.quote(c)}" for c in columns)
+        return [
+            f"""
+            INSERT INTO {target} ({insert_cols})
+            SELECT {source_cols} FROM {source} AS Source
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {target} AS Target WHERE {match_condition}
+            )
+            """
+        ]
+
+    def update_changed_sql(
+        self,
+        target: str,
+        source: str,
+        match_condition: str,
+        update_columns: Sequence[str],
+        changed_condition: str,
+    ) -> List[str]:
+        """
+        Statements that update the `target` rows matching a `source` row on
+        `match_condition` for which `changed_condition` holds (both written
+        against the Target and Source aliases).
+        """
+        update_set = ", ".join(
+            f"{self.quote(c)} = Source.{self.quote(c)}" for c in update_columns
+        )
+        return [
+            f"""
+            UPDATE {target} AS Target SET {update_set}
+            FROM {source} AS Source
+            WHERE ({match_condition}) AND ({changed_condition})
+            """
+        ]
+
+    def delete_missing_sql(
+        self,
+        target: str,
+        source: str,
+        scope_column: str,
+        match_condition: str,
+    ) -> List[str]:
+        """
+        Statements that delete the `target` rows whose `scope_column` value
+        is in `source` but that match no `source` row on `match_condition`.
+        """
+        scope = self.quote(scope_column)
+        return [
+            f"""
+            DELETE FROM {target} AS Target
+            WHERE Target.{scope} IN (SELECT Source.{scope} FROM {source} AS Source)
+            AND NOT EXISTS (
+                SELECT 1 FROM {source} AS Source WHERE {match_condition}
+            )
+            """
+        ]
+
+    def bulk_insert_sql(self, table: str, columns: Sequence[str], source: str) -> str:
+        """
+        INSERT ... SELECT copying `columns` into `table` from a bulk `source`
+        (a table-valued parameter or a relation registered on the connection).
+        """
+        cols = ", ".join(self.quote(c) for c in columns)
+        return f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {source}"
+
+    def bulk_insert(self, cursor, table: str, df: pd.DataFrame):
+        """
+        Copies a frame into `table` without row-by-row parameter binding.
+        Only available when `supports_bulk_insert`; the caller commits.
+        """
+        raise NotImplementedError
+
+    def identity_insert_sql(self, table: str, enabled: bool) -> Optional[str]:
+        """Statement allowing explicit values in identity columns, if needed."""
+        return None
+
+    def table_checksum_sql(self, table: str) -> Optional[str]:
+        """Query returning a checksum of a whole table, when the engine has one."""
+        return None
+
+    @staticmethod
+    def local_database_path(db_name: str, extension: str) -> str:
+        directory = os.getenv("DB_LOCAL_DIR", "state/db")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{db_name}.{extension}")
+
+
+class MssqlBackend(SqlBackend):
+    """SQL Server through pyodbc, the production database."""
+
+    name = "mssql"
+    supports_fast_executemany = True
+    supports_bulk_insert = True
+    current_timestamp_sql = "SELECT SYSDATETIME()"
+    boolean_type = "BIT"
+    business_key_type = "NVARCHAR(255)"
+
+    def connect(self, connector):
+        import pyodbc
+
+        connection_string = (
+            "DRIVER={ODBC Driver 17 for SQL Server};"
+            f"SERVER={connector.host},{connector.port};"
+            f"DATABASE={connector.db_name};"
+            f"UID={connector.user};"
+            f"PWD={connector.password};"
+        )
+
+        connection = pyodbc.connect(connection_string)
+        connection.autocommit = False
+        return connection
+
+    def savepoint_sql(self, name: str) -> str:
+        return f"SAVE TRANSACTION {name}"
+
+    def rollback_to_savepoint_sql(self, name: str) -> str:
+        return f"ROLLBACK TRANSACTION {name}"
+
+    def release_savepoint_sql(self, name: str) -> Optional[str]:
+        # SQL Server savepoints live until the transaction ends
+        return None
+
+    def iter_record_batches(self, cursor, arraysize: int) -> Iterator[pa.RecordBatch]:
+        # Column types come from the cursor description, so datetime, int and
+        # bool columns keep their types even when a block is all NULL
+        schema = schema_from_description(cursor.description)
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                break
+            yield record_batch_from_rows(rows, schema)
+
+    def fetch_table(self, cursor, arraysize: int) -> pa.Table:
+        schema = schema_from_description(cursor.description)
+        return pa.Table.from_batches(
+            self.iter_record_batches(cursor, arraysize), schema=schema
+        )
+
+    def quote(self, identifier: str) -> str:
+        return f"[{identifier}]"
+
+    def top(self, limit: Optional[int]) -> str:
+        return f"TOP ({int(limit)})" if limit else ""
+
+    def limit(self, limit: Optional[int]) -> str:
+        return ""
+
+    def temp_table_name(self, name: str, shared: bool = False) -> str:
+        return f"##{name}" if shared else f"#{name}"
+
+    def create_temp_table_sql(
+        self, table: str, columns_ddl: str, shared: bool = False
+    ) -> str:
+        return f"CREATE TABLE {table} ({columns_ddl})"
+
+    def create_temp_table_like_sql(
+        self, table: str, source_table: str, shared: bool = False
+    ) -> str:
+        return f"SELECT TOP 0 * INTO {table} FROM {source_table}"
+
+    def create_table_if_missing_sql(self, table: str, columns_ddl: str) -> str:
+        return (
+            f"IF OBJECT_ID(N'{table}', N'U') IS NULL "
+            f"CREATE TABLE {table} ({columns_ddl})"
+        )
+
+    def create_index_sql(
+        self,
+        index_name: str,
+        table: str,
+        columns: Sequence[str],
+        unique: bool = False,
+        clustered: bool = False,
+    ) -> Optional[str]:
+        unique_clause = "UNIQUE " if unique else ""
+        clustered_clause = "CLUSTERED " if clustered else ""
+        columns_str = ", ".join(self.quote(c) for c in columns)
+        return (
+            f"CREATE {unique_clause}{clustered_clause}INDEX {index_name} "
+            f"ON {table}({columns_str});"
+        )
+
+    def upsert_sql(
+        self,
+        target: str,
+        source: str,
+        key_column: str,
+        update_columns: Sequence[str],
+    ) -> List[str]:
+        key = self.quote(key_column)
+        update_clause = ""
+        if update_columns:
+            update_set = ", ".join(
+                f"Target.{self.quote(c)} = Source.{self.quote(c)}"
+                for c in update_columns
+            )
+            update_clause = f"WHEN MATCHED THEN UPDATE SET {update_set}"
+
+        insert_cols_list = [key_column, *update_columns]
+        insert_cols = ", ".join(self.quote(c) for c in insert_cols_list)
+        source_cols = ", ".join(f"Source.{self.quote(c)}" for c in insert_cols_list)
+        return [
+            f"""
+            MERGE {target} AS Target
+            USING {source} AS Source
+            ON Target.{key} = Source.{key}
+            {update_clause}
+            WHEN NOT MATCHED BY Target THEN
+                INSERT ({insert_cols})
+                VALUES ({source_cols});
+            """
+        ]
+
+    def insert_missing_sql(
+        self,
+        target: str,
+        source: str,
+        match_condition: str,
+        columns: Sequence[str],
+    ) -> List[str]:
+        insert_cols = ", ".join(self.quote(c) for c in columns)
+        source_cols = ", ".join(f"Source.{self.quote(c)}" for c in columns)
+        return [
+            f"""
+            MERGE {target} AS Target
+            USING {source} AS Source
+                ON {match_condition}
+            WHEN NOT MATCHED BY Target THEN
+                INSERT ({insert_cols})
+                VALUES ({source_cols});
+            """
+        ]
+
+    def update_changed_sql(
+        self,
+        target: str,
+        source: str,
+        match_condition: str,
+        update_columns: Sequence[str],
+        changed_condition: str,
+    ) -> List[str]:
+        update_set = ", ".join(
+            f"Target.{self.quote(c)} = Source.{self.quote(c)}" for c in update_columns
+        )
+        return [
+            f"""
+            UPDATE Target SET {update_set}
+            FROM {target} AS Target
+            INNER JOIN {source} AS Source ON {match_condition}
+            WHERE {changed_condition};
+            """
+        ]
+
+    def delete_missing_sql(
+        self,
+        target: str,
+        source: str,
+        scope_column: str,
+        match_condition: str,
+    ) -> List[str]:
+        scope = self.quote(scope_column)
+        return [
+            f"""
+            DELETE Target FROM {target} AS Target
+            WHERE Target.{scope} IN (SELECT Source.{scope} FROM {source} AS Source)
+            AND NOT EXISTS (
+                SELECT 1 FROM {source} AS Source WHERE {match_condition}
+            );
+            """
+        ]
+
+    def bulk_insert_sql(self, table: str, columns: Sequence[str], source: str) -> str:
+        cols = ", ".join(self.quote(c) for c in columns)
+        # TABLOCK lets inserts into heaps such as the staging tables be
+        # minimally logged
+        return (
+            f"INSERT INTO {table} WITH (TABLOCK) ({cols}) "
+            f"SELECT {cols} FROM {source} AS Source"
+        )
+
+    def table_type_columns_ddl(self, df: pd.DataFrame) -> str:
+        """Columns of a table type holding the rows of `df`, typed from its dtypes."""
+        columns = []
+        for name, values in df.items():
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = pd.Series(values.dtype.categories)
+            inferred = pd.api.types.infer_dtype(values, skipna=True)
+            sql_type = {
+                "boolean": "BIT",
+                "integer": "BIGINT",
+                "floating": "FLOAT",
+                "mixed-integer-float": "FLOAT",
+                "datetime64": "DATETIME2",
+                "datetime": "DATETIME2",
+                "date": "DATE",
+            }.get(inferred, "NVARCHAR(MAX)")
+            columns.append(f"{self.quote(name)} {sql_type}")
+        return ", ".join(columns)
+
+    def table_type_name(self, columns_ddl: str) -> str:
+        """
+        Name of the table type with the given columns. Types are named after
+        their columns, so staging tables of the same shape share one and a
+        type never has to be altered.
+        """
+        digest = hashlib.sha1(columns_ddl.encode("utf-8")).hexdigest()[:16]
+        return f"etl_rows_{digest}"
+
+    def create_table_type_sql(self, type_name: str, columns_ddl: str) -> str:
+        return (
+            f"IF TYPE_ID(N'dbo.{type_name}') IS NULL "
+            f"CREATE TYPE dbo.{self.quote(type_name)} AS TABLE ({columns_ddl})"
+        )
+
+    def table_valued_parameter(self, type_name: str, rows: List[tuple]) -> list:
+        """pyodbc's form of a table-valued parameter in an ad hoc statement."""
+        return [type_name, "dbo", *rows]
+
+    def bulk_insert(self, cursor, table: str, df: pd.DataFrame):
+        # Each chunk of rows travels as one table-valued parameter
+        columns_ddl = self.table_type_columns_ddl(df)
+        type_name = self.table_type_name(columns_ddl)
+        cursor.execute(self.create_table_type_sql(type_name, columns_ddl))
+        insert_sql = self.bulk_insert_sql(table, df.columns, "?")
+        for rows in encode_rows(df):
+            cursor.execute(insert_sql, [self.table_valued_parameter(type_name, rows)])
+
+    def identity_insert_sql(self, table: str, enabled: bool) -> Optional[str]:
+        return f"SET IDENTITY_INSERT {table} {'ON' if enabled else 'OFF'};"
+
+    def table_checksum_sql(self, table: str) -> Optional[str]:
+        return f"SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM {table}"
+
+
+def _parse_sqlite_datetime(value: bytes) -> datetime:
+    return datetime.fromisoformat(value.decode())
+
+
+class SqliteBackend(SqlBackend):
+    """
+    Embedded SQLite database at DB_LOCAL_DIR/<db_name>.sqlite. SQLite has no
+    schemas, so the `dbo` schema is the attached file <db_name>.dbo.sqlite.
+    """
+
+    name = "sqlite"
+    current_timestamp_sql = (
+        "SELECT strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime') AS \"now [datetime]\""
+    )
+
+    def connect(self, connector):
+        for declared_type in ("DATETIME", "DATETIME2", "TIMESTAMP"):
+            sqlite3.register_converter(declared_type, _parse_sqlite_datetime)
+        sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+        sqlite3.register_adapter(date, lambda value: value.isoformat())
+
+        connection = sqlite3.connect(
+            self.local_database_path(connector.db_name, "sqlite"),
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            # Pooled connections are opened and used by different threads
+            check_same_thread=False,
+            # and wait for each other's load transactions
+            timeout=SQLITE_BUSY_TIMEOUT_SECONDS,
+        )
+        connection.execute(
+            "ATTACH DATABASE ? AS dbo",
+            (self.local_database_path(connector.db_name, "dbo.sqlite"),),
+        )
+        return connection
+
+    def begin_transaction(self, connection):
+        # sqlite3 only opens one implicitly before DML, leaving DDL such as
+        # the staging tables outside of it. IMMEDIATE takes the write lock up
+        # front: pooled connections upgrading a read lock would deadlock
+        if not connection.in_transaction:
+            connection.execute("BEGIN IMMEDIATE")
+
+    def iter_record_batches(self, cursor, arraysize: int) -> Iterator[pa.RecordBatch]:
+        # SQLite does not report column types, so they are inferred per block:
+        # an all-NULL block has null columns
+        names = [column_description[0] for column_description in cursor.description]
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            yield pa.record_batch(
+                [pa.array(list(values)) for values in columns], names=names
+            )
+
+    def fetch_table(self, cursor, arraysize: int) -> pa.Table:
+        # The block types are unified at the end (an all-NULL block takes the
+        # type of the rest)
+        names = [column_description[0] for column_description in cursor.description]
+        tables = [
+            pa.Table.from_batches([batch])
+            for batch in self.iter_record_batches(cursor, arraysize)
+        ]
+        if not tables:
+            return pa.table({name: pa.array([], pa.null()) for name in names})
+        return pa.concat_tables(tables, promote_options="permissive")
+
+
+class _DuckdbConnection:
+    """
+    Adapts a DuckDB connection to the DB-API calls made by DBConnector.
+    Statements run in autocommit mode: a long-lived transaction would pin a
+    snapshot and hide tables staged by the other pooled connections. `begin`
+    opens an explicit one for DBConnector.transaction.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self):
+        # A DuckDB connection is its own cursor; duplicates would run in
+        # another transaction
+        return self._connection
+
+    def begin(self):
+        self._connection.begin()
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        import duckdb
+
+        try:
+            self._connection.rollback()
+        except duckdb.TransactionException:
+            # Nothing to undo outside an explicit transaction
+            pass
+
+    def close(self):
+        self._connection.close()
+
+
+class DuckdbBackend(SqlBackend):
+    """Embedded DuckDB database at DB_LOCAL_DIR/<db_name>.duckdb."""
+
+    name = "duckdb"
+    supports_bulk_insert = True
+    # DuckDB has no savepoints, but aborts the whole transaction on any error
+    supports_savepoints = False
+    current_timestamp_sql = "SELECT localtimestamp"
+
+    def connect(self, connector):
+        import duckdb
+
+        connection = duckdb.connect(
+            self.local_database_path(connector.db_name, "duckdb")
+        )
+        connection.execute("CREATE SCHEMA IF NOT EXISTS dbo")
+        return _DuckdbConnection(connection)
+
+    def begin_transaction(self, connection):
+        connection.begin()
+
+    def iter_record_batches(self, cursor, arraysize: int) -> Iterator[pa.RecordBatch]:
+        yield from cursor.to_arrow_reader(arraysize)
+
+    def fetch_table(self, cursor, arraysize: int) -> pa.Table:
+        return cursor.to_arrow_table()
+
+    def bulk_insert(self, cursor, table: str, df: pd.DataFrame):
+        # DuckDB scans the registered frame in place
+        relation = "etl_bulk_rows"
+        cursor.register(relation, df)
+        try:
+            cursor.execute(self.bulk_insert_sql(table, df.columns, relation))
+        finally:
+            cursor.unregister(relation)
+
+    def create_index_sql(
+        self,
+        index_name: str,
+        table: str,
+        columns: Sequence[str],
+        unique: bool = False,
+        clustered: bool = False,
+    ) -> Optional[str]:
+        # DuckDB joins staging tables by hash; ART indexes would only slow
+        # down the load
+        return None
+
+
+SQL_BACKENDS = {
+    MssqlBackend.name: MssqlBackend,
+    SqliteBackend.name: SqliteBackend,
+    DuckdbBackend.name: DuckdbBackend,
+}
+
+
+def get_backend(name: Optional[str] = None) -> SqlBackend:
+    """Returns the backend named by `name` or DB_BACKEND (default: mssql)."""
+    name = (name or os.getenv("DB_BACKEND", MssqlBackend.name)).lower()
+    if name not in SQL_BACKENDS:
+        raise ValueError(
+            f"Unsupported DB_BACKEND '{name}'. "
+            f"Expected one of: {', '.join(SQL_BACKENDS)}."
+        )
+    return SQL_BACKENDS[name]()
@@ -1,11 +1,20 @@
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterator
 
-import pyodbc
+import pyarrow as pa
 
+from .db_backend import get_backend
 from .logger import setup_logger
 
 logger = setup_logger(__name__)
 
+DEFAULT_FETCH_ARRAYSIZE = 5000
+# 0 commits a transaction scope only when it ends
+DEFAULT_COMMIT_INTERVAL_ROWS = 0
+
 
 class DBConnector:
     def __init__(self, db_name: str):
@@ -14,24 +23,29 @@ class DBConnector:
         self.user = os.getenv("DB_USER")
         self.password = os.getenv("DB_PASSWORD")
         self.port = os.getenv("DB_PORT", "1433")
+        self.backend = get_backend()
+
+        self.fetch_arraysize = int(
+            os.getenv("DB_FETCH_ARRAYSIZE", DEFAULT_FETCH_ARRAYSIZE)
+        )
+        self.commit_interval_rows = int(
+            os.getenv("DB_COMMIT_INTERVAL_ROWS", DEFAULT_COMMIT_INTERVAL_ROWS)
+        )
 
         self.connection = None
         self.cursor = None
+        self.in_transaction = False
+        self._batch_commits = True
+        self._rows_since_commit = 0
+        self._savepoint_depth = 0
+        # First error of the current transaction scope, which aborts it
+        self._transaction_error = None
 
     def connect(self):
         try:
-            connection_string = (
-                "DRIVER={ODBC Driver 17 for SQL Server};"
-                f"SERVER={self.host},{self.port};"
-                f"DATABASE={self.db_name};"
-                f"UID={self.user};"
-                f"PWD={self.password};"
-            )
-
-            self.connection = pyodbc.connect(connection_string)
-            self.connection.autocommit = False
+            self.connection = self.backend.connect(self)
             self.cursor = self.connection.cursor()
-            logger.info(f"Connected to database {self.db_name}")
+            logger.info(f"Connected to {self.backend.name} database {self.db_name}")
 
         except Exception as e:
             logger.error(f"Error connecting to database: {str(e)}")
@@ -45,7 +59,107 @@ class DBConnector:
 
     logger.info("Connection closed.")
 
+    @contextmanager
+    def transaction(self, batch_commits=True):
+        """
+        Runs the statements of the block as one transaction: they are committed
+        together when it ends, or rolled back together and the error raised.
+        Inside it statements are not committed one by one and their errors are
+        raised. The first failed statement aborts the scope: later statements
+        are refused and it rolls back even when the block caught the error,
+        unless the statement ran in a `savepoint`. Inserted rows are still
+        committed every DB_COMMIT_INTERVAL_ROWS unless `batch_commits` is
+        False. A nested scope joins the enclosing one.
+        """
+        if self.in_transaction:
+            yield self
+            return
+
+        self.backend.begin_transaction(self.connection)
+        self.in_transaction = True
+        self._batch_commits = batch_commits
+        self._rows_since_commit = 0
+        self._transaction_error = None
+        try:
+            yield self
+            if self._transaction_error is not None:
+                raise RuntimeError(
+                    "Transaction aborted by a failed statement."
+                ) from self._transaction_error
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            self.in_transaction = False
+            self._transaction_error = None
+
+    @contextmanager
+    def savepoint(self):
+        """
+        Runs the statements of the block so that, inside a transaction, a
+        failure rolls back only them and leaves the scope usable, e.g. for a
+        retry of the same batch. Outside a transaction, or on backends
+        without savepoints (where a failure aborts the scope), it does nothing.
+        """
+        if not self.in_transaction or not self.backend.supports_savepoints:
+            yield self
+            return
+
+        self._check_transaction()
+        name = f"etl_savepoint_{self._savepoint_depth}"
+        self.cursor.execute(self.backend.savepoint_sql(name))
+        self._savepoint_depth += 1
+        try:
+            yield self
+        except Exception:
+            self._savepoint_depth -= 1
+            try:
+                self.cursor.execute(self.backend.rollback_to_savepoint_sql(name))
+                self._transaction_error = None
+            except Exception as e:
+                logger.error(f"Error rolling back to savepoint {name}: {str(e)}")
+            raise
+
+        self._savepoint_depth -= 1
+        release_sql = self.backend.release_savepoint_sql(name)
+        if release_sql:
+            self.cursor.execute(release_sql)
+        # Commits deferred while the savepoint was open
+        self._commit_batch([])
+
+    def _check_transaction(self):
+        """Refuses statements in a transaction aborted by a failed one."""
+        if self.in_transaction and self._transaction_error is not None:
+            raise RuntimeError(
+                "Transaction aborted by a failed statement; it will be rolled back."
+            ) from self._transaction_error
+
+    def _commit_batch(self, rows):
+        """
+        Counts rows inserted inside a transaction and, every
+        `DB_COMMIT_INTERVAL_ROWS`, commits them and opens a new transaction.
+        Commits wait for open savepoints, which a commit would discard.
+        """
+        self._rows_since_commit += len(rows)
+        if (
+            not self._batch_commits
+            or self._savepoint_depth
+            or self.commit_interval_rows <= 0
+            or self._rows_since_commit < self.commit_interval_rows
+        ):
+            return
+        self.connection.commit()
+        self.backend.begin_transaction(self.connection)
+        logger.debug(f"Committed {self._rows_since_commit} inserted rows.")
+        self._rows_since_commit = 0
+
     def execute_query(self, query, params=None):
+        """
+        Executes a statement and commits it. Errors are logged and rolled
+        back; inside a transaction they are raised and abort the scope.
+        """
+        self._check_transaction()
         try:
             if not self.cursor:
                 logger.error("Could not execute query: cursor is not available.")
@@ -55,13 +169,73 @@ class DBConnector:
                 self.cursor.execute(query, params)
             else:
                 self.cursor.execute(query)
-            self.connection.commit()
+            if not self.in_transaction:
+                self.connection.commit()
         except Exception as e:
             logger.error(
                 f"Error executing query: {query}. Parameters: {params}. Error: {str(e)}"
             )
+            if self.in_transaction:
+                self._transaction_error = e
+                raise
             self.connection.rollback()
 
+    def execute_many(self, query, rows):
+        """
+        Executes a parameterized statement for every row, using pyodbc's
+        `fast_executemany` on SQL Server, then commits (inside a transaction,
+        only every `DB_COMMIT_INTERVAL_ROWS` rows, if set).
+        """
+        if not self.cursor:
+            logger.error("Could not execute query: cursor is not available.")
+            return
+
+        self._check_transaction()
+        fast_executemany = self.backend.supports_fast_executemany
+        try:
+            if fast_executemany:
+                self.cursor.fast_executemany = True
+            self.cursor.executemany(query, rows)
+            if self.in_transaction:
+                self._commit_batch(rows)
+            else:
+                self.connection.commit()
+        except Exception as e:
+            logger.error(f"Error executing batch: {query}. Error: {str(e)}")
+            if self.in_transaction:
+                self._transaction_error = e
+            else:
+                self.connection.rollback()
+            raise
+        finally:
+            if fast_executemany:
+                self.cursor.fast_executemany = False
+
+    def bulk_insert(self, table, df):
+        """
+        Copies a DataFrame into `table` through the backend's bulk path
+        (table-valued parameters on SQL Server, an in-place scan on DuckDB),
+        then commits (inside a transaction, like `execute_many`).
+        """
+        if not self.cursor:
+            logger.error("Could not execute query: cursor is not available.")
+            return
+
+        self._check_transaction()
+        try:
+            self.backend.bulk_insert(self.cursor, table, df)
+            if self.in_transaction:
+                self._commit_batch(df)
+            else:
+                self.connection.commit()
+        except Exception as e:
+            logger.error(f"Error bulk inserting into {table}. Error: {str(e)}")
+            if self.in_transaction:
+                self._transaction_error = e
+            else:
+                self.connection.rollback()
+            raise
+
     def fetch_all(self, query, params=None):
         try:
             if not self.cursor:
@@ -80,6 +254,56 @@ class DBConnector:
             )
             return None
 
+    def iter_batches(
+        self, query, params=None, arraysize=None
+    ) -> Iterator[pa.RecordBatch]:
+        """
+        Executes a query and yields its result as Arrow record batches of up
+        to `arraysize` rows, so only one block is held in memory at a time.
+        The cursor is busy until the generator is exhausted. Unlike
+        `fetch_all`, errors are raised: a partial stream cannot be told apart
+        from a complete one.
+        """
+        if not self.cursor:
+            logger.error("Could not fetch data: cursor is not available.")
+            return
+
+        arraysize = arraysize or self.fetch_arraysize
+        try:
+            if params:
+                self.cursor.execute(query, params)
+            else:
+                self.cursor.execute(query)
+            yield from self.backend.iter_record_batches(self.cursor, arraysize)
+        except Exception as e:
+            logger.error(
+                f"Error streaming query: {query}. Parameters: {params}. Error: {str(e)}"
+            )
+            raise
+
+    def fetch_table(self, query, params=None, arraysize=None) -> pa.Table:
+        """
+        Executes a query and builds a typed Arrow table directly from the
+        `fetchmany` blocks; only one block of driver rows is alive at a time.
+        How the columns are typed depends on the backend (see db_backend).
+        """
+        if not self.cursor:
+            logger.error("Could not fetch data: cursor is not available.")
+            return None
+
+        arraysize = arraysize or self.fetch_arraysize
+        try:
+            if params:
+                self.cursor.execute(query, params)
+            else:
+                self.cursor.execute(query)
+            return self.backend.fetch_table(self.cursor, arraysize)
+        except Exception as e:
+            logger.error(
+                f"Error executing query: {query}. Parameters: {params}. Error: {str(e)}"
+            )
+            raise
+
     def select(self, table, columns="*", condition=None):
         if condition:
             condition_str = " AND ".join([f"{col} = ?" for col in condition.keys()])
@@ -88,3 +312,49 @@ class DBConnector:
         else:
             query = f"SELECT {', '.join(columns)} FROM {table}"
             return self.fetch_all(query)
+
+
+class DBConnectionPool:
+    """
+    Thread-safe pool of connected DBConnector instances to the same database.
+    At most `max_size` connections are handed out at once, which bounds the
+    number of concurrent queries sent to the server.
+    """
+
+    def __init__(self, db_name: str, max_size: int):
+        self.db_name = db_name
+        self.max_size = max_size
+
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._connections = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection, opening a new one if none is idle."""
+        self._slots.acquire()
+        try:
+            try:
+                db = self._idle.get_nowait()
+            except queue.Empty:
+                db = DBConnector(db_name=self.db_name)
+                db.connect()
+                with self._lock:
+                    self._connections.append(db)
+
+            try:
+                yield db
+            finally:
+                self._idle.put(db)
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            for db in self._connections:
+                db.close()
+            self._connections.clear()
+
+        while not self._idle.empty():
+            self._idle.get_nowait()
@@ -2,7 +2,7 @@ import logging
 import os
 
 from elasticsearch import Elasticsearch
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import bulk, scan
 
 from .singleton_conn_elastic import SingletonConnElastic
 
@@ -10,6 +10,7 @@ INDEX_MAPPING = {
     "mappings": {
         "properties": {
             "ticket_id": {"type": "keyword"},
+            "content_hash": {"type": "keyword"},
             "title": {
                 "type": "text",
                 "analyzer": "brazilian",
@@ -209,6 +210,16 @@ class ElasticClient(logging.Handler, metaclass=SingletonConnElastic):
             ssl_show_warn=False,
         )
 
+        # Imported here: utils modules log through config.logger, which
+        # imports this module
+        from utils.adaptive_batch import AdaptiveBatchController
+
+        # Documents per bulk request, adapted to the cluster's response times
+        self.bulk_max_bytes = int(os.getenv("ELASTICSEARCH_BULK_MAX_BYTES", "10485760"))
+        self.bulk_batches = AdaptiveBatchController(
+            "Elasticsearch bulk", initial_size=500, min_size=10, max_size=5000
+        )
+
         self._ensure_etl_index()
         self._checked_log_indices = set()
 
@@ -224,10 +235,14 @@ class ElasticClient(logging.Handler, metaclass=SingletonConnElastic):
             )
             self.es.indices.create(index=self.elastic_index, body=INDEX_MAPPING)
 
-    def bulk_upsert(self, documents):
+    def bulk_upsert(self, documents, on_batch_sent=None):
         """
-        ETL method. Sends data to the `elastic_index`.
+        ETL method. Sends data to the `elastic_index`. `on_batch_sent`, when
+        given, is called with the actions and errors of each batch once it
+        has been sent, in order.
         """
+        from utils.adaptive_batch import BACKOFF_HTTP_STATUSES, BatchBackoff
+
         actions = []
         for doc in documents:
             doc_id = doc.get("ticket_id")
@@ -244,10 +259,30 @@ class ElasticClient(logging.Handler, metaclass=SingletonConnElastic):
             actions.append(action)
         if not actions:
             return True, []
-        try:
+
+        def send(batch):
             success, errors = bulk(
-                self.es, actions, raise_on_error=False, raise_on_exception=False
+                self.es,
+                batch,
+                chunk_size=len(batch),
+                max_chunk_bytes=self.bulk_max_bytes,
+                raise_on_error=False,
+                raise_on_exception=False,
             )
+            # Throttled or too large: the whole batch is retried smaller
+            # (upserts are idempotent)
+            for error in errors:
+                for item in error.values():
+                    if item.get("status") in BACKOFF_HTTP_STATUSES:
+                        raise BatchBackoff(f"HTTP {item['status']} from bulk API")
+            if on_batch_sent:
+                on_batch_sent(batch, errors)
+            return success, errors
+
+        try:
+            results = self.bulk_batches.run(actions, send)
+            success = sum(batch_success for batch_success, _ in results)
+            errors = [error for _, batch_errors in results for error in batch_errors]
             if errors:
                 self.internal_logger.error(f"Bulk upsert failures in ETL: {errors[:5]}")
             return success, errors
@@ -257,6 +292,21 @@ class ElasticClient(logging.Handler, metaclass=SingletonConnElastic):
             )
             return False, [str(e)]
 
+    def scan_content_hashes(self):
+        """
+        Reads the `content_hash` stored in every document of the ETL index.
+        Returns a dict of document ID to hash.
+        """
+        hashes = {}
+        for hit in scan(
+            self.es,
+            index=self.elastic_index,
+            query={"query": {"exists": {"field": "content_hash"}}},
+            _source=["content_hash"],
+        ):
+            hashes[hit["_id"]] = hit["_source"]["content_hash"]
+        return hashes
+
     def emit(self, record):
         """
         Logger method. Sends data to the `log_index`.
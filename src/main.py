@@ -1,15 +1,43 @@
 # ruff: noqa: F401
+import argparse
+
 from schedule import run_pending
 
 from config.elastic_client import ElasticClient
 from config.logger import setup_logger
+from process.dw_etl_processor import DwEtlProcessor
+from process.elastic_etl_processor import ElasticEtlProcessor
 from process.scheduler import run_sequential_etl_jobs
 
 logger = setup_logger(__name__)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VisionData ETL")
+    parser.add_argument(
+        "--replay",
+        metavar="RUN_ID",
+        help="Re-run transform and load from a staged extraction snapshot and exit.",
+    )
+    parser.add_argument(
+        "--rebuild-hashes",
+        action="store_true",
+        help="Rebuild the local content hash store from the Elasticsearch index and exit.",
+    )
+    parser.add_argument(
+        "--populate-calendar",
+        action="store_true",
+        help="Create and pre-populate the Dim_Date and Dim_Time dimensions and exit.",
+    )
+    args = parser.parse_args()
 
-    # Main loop to run scheduled jobs
-    while True:
-        run_pending()
+    if args.rebuild_hashes:
+        ElasticEtlProcessor().rebuild_hash_store()
+    elif args.populate_calendar:
+        DwEtlProcessor().populate_calendar()
+    elif args.replay:
+        run_sequential_etl_jobs(replay_run_id=args.replay)
+    else:
+        # Main loop to run scheduled jobs
+        while True:
+            run_pending()
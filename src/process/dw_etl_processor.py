@@ -4,66 +4,224 @@ import time
 import aspectlib
 
 from config.aop_logging import log_execution
-from config.db_connector import DBConnector
+from config.db_connector import DBConnectionPool, DBConnector
+from config.dotenv_loader import get_boolean_from_env
 from config.logger import setup_logger
-from services.extract_dw_service import ExtractDwService
 from services.load_dw_service import LoadDwService
 from services.transform_dw_service import TransformDwService
+from utils.memory_usage import track_peak_rss
+from utils.run_ledger import EXTRACT_STEP, RunLedger, window_step
+from utils.snapshot_store import SnapshotStore
+from utils.watermark_store import WatermarkStore
+
+from .snapshot_replay_processor import SnapshotReplayProcessor
+from .tickets_extract_processor import TicketsExtractProcessor
 
 logger = setup_logger(__name__)
 
 
 class DwEtlProcessor:
+    JOB_NAME = "dw"
+
     def __init__(self):
-        db_client = os.getenv("CLIENT_DB_NAME")
         dw_db = os.getenv("DW_DB_NAME")
 
-        self.db_client = DBConnector(db_name=db_client)
-        self.db_client.connect()
-
-        self.extract_service = ExtractDwService(db_connection=self.db_client)
         self.transform_service = TransformDwService()
 
         self.dw_db = DBConnector(db_name=dw_db)
 
-        self.load_service = LoadDwService(db_connection=self.dw_db)
+        # Dimensions and fact ranges are loaded concurrently when more than
+        # one worker is allowed
+        max_workers = max(
+            int(os.getenv("ETL_DW_LOAD_WORKERS", "1")),
+            int(os.getenv("ETL_FACT_MERGE_WORKERS", "1")),
+        )
+        self.connection_pool = (
+            DBConnectionPool(db_name=dw_db, max_size=max_workers)
+            if max_workers > 1
+            else None
+        )
+
+        self.load_service = LoadDwService(
+            db_connection=self.dw_db, connection_pool=self.connection_pool
+        )
+
+        self.watermark_store = WatermarkStore()
+        self.next_watermark = None
+
+        # Each window's transformed tables and loads are checkpointed under a
+        # run ID when enabled, so a failed run is resumed where it stopped
+        self.run_ledger = (
+            RunLedger() if get_boolean_from_env("ETL_RESUMABLE_RUNS") else None
+        )
+        self.run_id = None
+        self.snapshot_store = SnapshotStore()
+
+    def _checkpointed(self, window_number) -> bool:
+        return bool(self.run_ledger and self.run_id and window_number)
 
     def extract_data(self):
+        """
+        Yields this job's own extraction windows (standalone run). A resumed
+        run replays the extraction it staged instead.
+        """
         logger.info("DW ETL: Extracting data from source")
         time.sleep(2)
-        raw_data = self.extract_service.extract_complete_tickets_data()
+        if self.run_ledger:
+            self.run_id, resumed = self.run_ledger.open_run(self.JOB_NAME)
+            extractor = (
+                SnapshotReplayProcessor(run_id=self.run_id)
+                if resumed
+                else TicketsExtractProcessor(
+                    job_names=[self.JOB_NAME], run_id=self.run_id
+                )
+            )
+        else:
+            extractor = TicketsExtractProcessor(job_names=[self.JOB_NAME])
+        yield from extractor.iter_batches()
+        if self.run_ledger:
+            self.run_ledger.checkpoint(self.run_id, EXTRACT_STEP)
+        self.next_watermark = extractor.next_watermark
         logger.info("DW ETL: Data extraction completed")
-        self.db_client.close()
-        return raw_data
 
-    def transform_data(self, extracted_data):
+    def transform_data(self, extracted_data, window_number=None):
         logger.info("DW ETL: Transforming data to dimensional model")
         time.sleep(2)
-        transformed = self.transform_service.transform(extracted_data)
+        if self._checkpointed(window_number):
+            transformed = self._transform_staged(extracted_data, window_number)
+        else:
+            transformed = self.transform_service.transform(extracted_data)
         logger.info("DW ETL: Data transformation completed")
         return transformed
 
-    def load_data(self, transformed_data):
-        """Loads data into the Data Warehouse"""
+    def _transform_staged(self, extracted_data, window_number):
+        """
+        Transforms a window of a resumable run. The tables an earlier attempt
+        built are read back from the snapshot store; every other one is
+        staged there and checkpointed as soon as it is built.
+        """
+        prefix = window_step(window_number, self.JOB_NAME, "transform", "")
+        staged = {}
+        for step in self.run_ledger.completed_steps(self.run_id, prefix):
+            table_name = step[len(prefix) :]
+            staged[table_name] = self.snapshot_store.read_frame(
+                self.run_id, self.JOB_NAME, window_number, table_name
+            )
+        if staged:
+            logger.info(
+                f"DW ETL: Reusing {len(staged)} tables built by run {self.run_id}."
+            )
+
+        def stage(table_name, df):
+            self.snapshot_store.write_frame(
+                self.run_id, self.JOB_NAME, window_number, table_name, df
+            )
+            self.run_ledger.checkpoint(self.run_id, prefix + table_name)
+
+        return self.transform_service.transform(
+            extracted_data, staged=staged, on_table_built=stage
+        )
+
+    def load_data(self, transformed_data, window_number=None):
+        """
+        Loads data into the Data Warehouse. In a resumable run, the tables
+        already loaded from the window are skipped.
+        """
         logger.info("DW ETL: Loading data into the Data Warehouse")
         self.dw_db.connect()
         if not transformed_data:
             logger.error("DW ETL: No transformed data to load")
             return
 
-        self.load_service.load(transformed_data)
+        on_table_loaded = None
+        if self._checkpointed(window_number):
+            prefix = window_step(window_number, self.JOB_NAME, "load", "")
+            loaded = {
+                step[len(prefix) :]
+                for step in self.run_ledger.completed_steps(self.run_id, prefix)
+            }
+            if loaded:
+                logger.info(
+                    f"DW ETL: {', '.join(sorted(loaded))} already loaded by run "
+                    f"{self.run_id}, skipped."
+                )
+            transformed_data = {
+                table_name: df
+                for table_name, df in transformed_data.items()
+                if table_name not in loaded
+            }
+
+            def on_table_loaded(table_name):
+                self.run_ledger.checkpoint(self.run_id, prefix + table_name)
+
+        self.load_service.load(transformed_data, on_table_loaded)
         logger.info("DW ETL: Load into DW completed.")
 
-    def execute(self):
+    def process_window(self, extracted, window_number=None):
+        """
+        Transforms and loads one extraction window into the Data Warehouse.
+        `window_number` (from 1) identifies its checkpoints in a resumable run.
+        """
+        checkpointed = self._checkpointed(window_number)
+        step = window_step(window_number, self.JOB_NAME) if checkpointed else None
         try:
-            extracted = self.extract_data()
-            if extracted and extracted.get("tickets"):
-                transformed = self.transform_data(extracted)
-                self.load_data(transformed)
+            if checkpointed and self.run_ledger.is_done(self.run_id, step):
+                logger.info(
+                    f"DW ETL: Window {window_number} already loaded by run "
+                    f"{self.run_id}, skipped."
+                )
+            elif extracted and extracted.get("tickets"):
+                transformed = self.transform_data(extracted, window_number)
+                with track_peak_rss("DW load", self.transform_service.memory_lean):
+                    self.load_data(transformed, window_number)
+                if checkpointed:
+                    self.run_ledger.checkpoint(self.run_id, step)
             else:
                 logger.info("DW ETL: No data extracted to process.")
+        finally:
+            if self.connection_pool:
+                self.connection_pool.close_all()
+            self.dw_db.close()
+
+    def save_watermark(self, next_watermark):
+        """Records the watermark once every window of the run has been loaded."""
+        if next_watermark:
+            self.watermark_store.set(self.JOB_NAME, next_watermark)
+
+    def populate_calendar(self):
+        """Creates and pre-populates the Dim_Date and Dim_Time calendar dimensions."""
+        self.dw_db.connect()
+        try:
+            self.load_service.ensure_calendar()
         finally:
             self.dw_db.close()
 
+    def execute(self):
+        """
+        Runs the DW ETL standalone, extracting and loading window by window.
+        A resumable run keeps extracting after a failed window, so the next
+        run can resume from the staged extraction, and then raises the error.
+        """
+        error = None
+        for window_number, extracted in enumerate(self.extract_data(), start=1):
+            if error:
+                continue
+            try:
+                self.process_window(extracted, window_number)
+            except Exception as e:
+                if not self.run_ledger:
+                    raise
+                logger.error(
+                    f"DW ETL: Window {window_number} failed; run {self.run_id} "
+                    f"will resume from it: {e}"
+                )
+                error = e
+        if error:
+            raise error
+
+        self.save_watermark(self.next_watermark)
+        if self.run_ledger:
+            self.run_ledger.finish_run(self.run_id)
+
 
 aspectlib.weave(DwEtlProcessor, log_execution)
@@ -1,35 +1,72 @@
-import os
 import time
 
 import aspectlib
 
 from config.aop_logging import log_execution
-from config.db_connector import DBConnector
+from config.dotenv_loader import get_boolean_from_env
 from config.elastic_client import ElasticClient
 from config.logger import setup_logger
-from services.extract_elastic_service import ExtractElasticService
 from services.transforme_elastic_service import TransformeElasticService
+from utils.hash_store import HashStore, content_hash
+from utils.run_ledger import EXTRACT_STEP, RunLedger, window_step
+from utils.watermark_store import WatermarkStore
+
+from .snapshot_replay_processor import SnapshotReplayProcessor
+from .tickets_extract_processor import TicketsExtractProcessor
 
 logger = setup_logger(__name__)
 
 
 class ElasticEtlProcessor:
-    def __init__(self):
-        db_name = os.getenv("CLIENT_DB_NAME")
+    JOB_NAME = "elastic"
 
-        self.db_connector = DBConnector(db_name=db_name)
-        self.db_connector.connect()
+    def __init__(self):
         self.elastic_client = ElasticClient()
         self.transformed_data = None
-        self.extract_service = ExtractElasticService(db_connection=self.db_connector)
         self.transforme_service = TransformeElasticService()
 
+        self.watermark_store = WatermarkStore()
+        self.next_watermark = None
+
+        # Documents whose content hash did not change since they were last
+        # indexed are skipped (when ETL_ELASTIC_SKIP_UNCHANGED is enabled)
+        skip_unchanged = get_boolean_from_env("ETL_ELASTIC_SKIP_UNCHANGED")
+        self.hash_store = HashStore(namespace=self.JOB_NAME) if skip_unchanged else None
+        self._hash_store_checked = False
+
+        # Each window's bulk batches are checkpointed under a run ID when
+        # enabled, so a failed run is resumed where it stopped
+        self.run_ledger = (
+            RunLedger() if get_boolean_from_env("ETL_RESUMABLE_RUNS") else None
+        )
+        self.run_id = None
+
+    def _checkpointed(self, window_number) -> bool:
+        return bool(self.run_ledger and self.run_id and window_number)
+
     def extract_data(self):
+        """
+        Yields this job's own extraction windows (standalone run). A resumed
+        run replays the extraction it staged instead.
+        """
         logger.info("Extracting data")
         time.sleep(2)
-        raw_data = self.extract_service.extract_complete_tickets_data()
+        if self.run_ledger:
+            self.run_id, resumed = self.run_ledger.open_run(self.JOB_NAME)
+            extractor = (
+                SnapshotReplayProcessor(run_id=self.run_id)
+                if resumed
+                else TicketsExtractProcessor(
+                    job_names=[self.JOB_NAME], run_id=self.run_id
+                )
+            )
+        else:
+            extractor = TicketsExtractProcessor(job_names=[self.JOB_NAME])
+        yield from extractor.iter_batches()
+        if self.run_ledger:
+            self.run_ledger.checkpoint(self.run_id, EXTRACT_STEP)
+        self.next_watermark = extractor.next_watermark
         logger.info("Data extraction completed")
-        return raw_data
 
     def transform_data(self, extracted_data):
         logger.info("Transforming data")
@@ -40,28 +77,187 @@ class ElasticEtlProcessor:
         )
         logger.info("Data transformation completed")
 
-    def load_data(self):
-        """Loads data into Elasticsearch using the optimized bulk helper."""
+    def rebuild_hash_store(self):
+        """Rebuilds the local hash store from the hashes stored in the index."""
+        if not self.hash_store:
+            logger.error("Content hashing is disabled (ETL_ELASTIC_SKIP_UNCHANGED).")
+            return
+        logger.info("Rebuilding the content hash store from the index...")
+        self.hash_store.replace_all(self.elastic_client.scan_content_hashes())
+
+    def _select_changed_documents(self, documents):
+        """
+        Fingerprints the documents and keeps the ones that are new or changed
+        since they were last indexed. Returns them with their hashes by ID.
+        """
+        if not self._hash_store_checked:
+            # A missing or lost store is rebuilt instead of re-sending everything
+            if self.hash_store.count() == 0:
+                self.rebuild_hash_store()
+            self._hash_store_checked = True
+
+        hashes = {}
+        for doc in documents:
+            doc.pop("content_hash", None)
+            doc["content_hash"] = content_hash(doc)
+            hashes[str(doc.get("ticket_id"))] = doc["content_hash"]
+
+        stored_hashes = self.hash_store.get_many(hashes.keys())
+        changed = [
+            doc
+            for doc in documents
+            if stored_hashes.get(str(doc.get("ticket_id"))) != doc["content_hash"]
+        ]
+        logger.info(
+            f"{len(documents) - len(changed)} of {len(documents)} documents "
+            "unchanged since the last load, skipped."
+        )
+        return changed, {
+            str(doc.get("ticket_id")): doc["content_hash"] for doc in changed
+        }
+
+    @staticmethod
+    def _failed_document_ids(errors):
+        """IDs of the documents rejected by a bulk request, or None if all failed."""
+        failed_ids = set()
+        for error in errors:
+            if not isinstance(error, dict):
+                return None
+            for item in error.values():
+                failed_ids.add(str(item.get("_id")))
+        return failed_ids
+
+    def _batch_checkpoint(self, step, documents, start):
+        """
+        Returns a bulk batch callback recording, under `step`, how many of the
+        window's documents (from position `start`) are indexed. Progress stops
+        at the first batch with errors, whose documents must be sent again.
+        """
+        positions = {
+            str(doc.get("ticket_id")): start + offset + 1
+            for offset, doc in enumerate(documents)
+        }
+        failed = False
+
+        def checkpoint(batch, errors):
+            nonlocal failed
+            failed = failed or bool(errors)
+            if not failed:
+                indexed = positions[str(batch[-1]["_id"])]
+                self.run_ledger.checkpoint(self.run_id, step, str(indexed))
+
+        return checkpoint
+
+    def load_data(self, window_number=None):
+        """
+        Loads data into Elasticsearch using the optimized bulk helper. In a
+        resumable run, the documents indexed by earlier attempts are skipped.
+        """
         logger.info("Loading data into Elasticsearch using bulk operation...")
 
         if not self.transformed_data:
             logger.error("No transformed data to load")
-            return
+            return True
+
+        documents = self.transformed_data
+        on_batch_sent = None
+        if self._checkpointed(window_number):
+            # The transform is deterministic: the same documents, in the
+            # same order, come out of the staged window on every attempt
+            step = window_step(window_number, self.JOB_NAME, "indexed")
+            start = int(
+                self.run_ledger.completed_steps(self.run_id, step).get(step) or 0
+            )
+            if start:
+                logger.info(
+                    f"{start} documents already indexed by run {self.run_id}, skipped."
+                )
+                documents = documents[start:]
+            on_batch_sent = self._batch_checkpoint(step, documents, start)
 
-        success_count, errors = self.elastic_client.bulk_upsert(self.transformed_data)
+        hashes = {}
+        if self.hash_store:
+            documents, hashes = self._select_changed_documents(documents)
+            if not documents:
+                logger.info("No new or changed documents to load.")
+                return True
+
+        success_count, errors = self.elastic_client.bulk_upsert(
+            documents, on_batch_sent=on_batch_sent
+        )
+
+        if self.hash_store:
+            failed_ids = self._failed_document_ids(errors)
+            if failed_ids is not None:
+                self.hash_store.set_many(
+                    {
+                        doc_id: value
+                        for doc_id, value in hashes.items()
+                        if doc_id not in failed_ids
+                    }
+                )
 
         if errors:
             logger.error(f"Load completed with {len(errors)} errors.")
-        else:
+            return False
+
+        logger.info(
+            f"Load completed successfully: {success_count} documents processed."
+        )
+        return True
+
+    def process_window(self, extracted, window_number=None):
+        """
+        Transforms and indexes one extraction window.
+        Returns False when the bulk load reported errors.
+        `window_number` (from 1) identifies its checkpoints in a resumable run.
+        """
+        checkpointed = self._checkpointed(window_number)
+        step = window_step(window_number, self.JOB_NAME) if checkpointed else None
+        if checkpointed and self.run_ledger.is_done(self.run_id, step):
             logger.info(
-                f"Load completed successfully: {success_count} documents processed."
+                f"Window {window_number} already indexed by run {self.run_id}, skipped."
             )
+            return True
 
-    def execute(self):
-        extracted = self.extract_data()
-        self.db_connector.close()
         self.transform_data(extracted)
-        self.load_data()
+        loaded = self.load_data(window_number)
+        if loaded and checkpointed:
+            self.run_ledger.checkpoint(self.run_id, step)
+        return loaded
+
+    def save_watermark(self, next_watermark):
+        """Records the watermark once every window of the run has been indexed."""
+        if next_watermark:
+            self.watermark_store.set(self.JOB_NAME, next_watermark)
+
+    def execute(self):
+        """
+        Runs the Elasticsearch ETL standalone, window by window. A resumable
+        run keeps extracting after a window raised, so the next run can
+        resume from the staged extraction, and then raises the error.
+        """
+        loaded = True
+        error = None
+        for window_number, extracted in enumerate(self.extract_data(), start=1):
+            try:
+                loaded = self.process_window(extracted, window_number) and loaded
+            except Exception as e:
+                if not self.run_ledger:
+                    raise
+                logger.error(
+                    f"Window {window_number} failed; run {self.run_id} "
+                    f"will resume from it: {e}"
+                )
+                loaded = False
+                error = error or e
+        if error:
+            raise error
+
+        if loaded:
+            self.save_watermark(self.next_watermark)
+            if self.run_ledger:
+                self.run_ledger.finish_run(self.run_id)
 
 
 aspectlib.weave(ElasticEtlProcessor, log_execution)
@@ -5,23 +5,30 @@ from schedule import every
 
 from config.aop_logging import log_execution
 from config.logger import setup_logger
+from utils.run_ledger import EXTRACT_STEP
 
 from .dw_etl_processor import DwEtlProcessor
 from .elastic_etl_processor import ElasticEtlProcessor
+from .snapshot_replay_processor import SnapshotReplayProcessor
+from .tickets_extract_processor import TicketsExtractProcessor
 
 logger = setup_logger(__name__)
 schedule_times = os.getenv("SCHEDULE_TIME", "00:10").split(",")
 
+# Ledger job of the runs extracting once for both ETL jobs
+SCHEDULED_RUN_JOB = "scheduled"
+
 
 @log_execution
-def run_elastic_job():
+def run_elastic_job(etl_job_elastic, extracted, window_number=None):
     """
-    Function dedicated to running the Elasticsearch ETL.
+    Function dedicated to running the Elasticsearch ETL on one extraction window.
     """
     logger.info("Starting the ETL job for Elasticsearch...")
     try:
-        etl_job_elastic = ElasticEtlProcessor()
-        etl_job_elastic.execute()
+        if not etl_job_elastic.process_window(extracted, window_number):
+            logger.error("ETL job for Elasticsearch finished with load errors.")
+            return "ELASTIC_ETL_FAILED"
         logger.info("ETL job for Elasticsearch completed successfully.")
         return "ELASTIC_ETL_SUCCESS"
     except Exception as e:
@@ -30,14 +37,13 @@ def run_elastic_job():
 
 
 @log_execution
-def run_dw_job():
+def run_dw_job(etl_job_dw, extracted, window_number=None):
     """
-    Function dedicated to running the Data Warehouse ETL.
+    Function dedicated to running the Data Warehouse ETL on one extraction window.
     """
     logger.info("Starting the ETL job for the Data Warehouse...")
     try:
-        etl_job_dw = DwEtlProcessor()
-        etl_job_dw.execute()
+        etl_job_dw.process_window(extracted, window_number)
         logger.info("ETL job for the Data Warehouse completed successfully.")
         return "DW_ETL_SUCCESS"
     except Exception as e:
@@ -45,16 +51,73 @@ def run_dw_job():
         return "DW_ETL_FAILED"
 
 
-def run_sequential_etl_jobs():
+def run_sequential_etl_jobs(replay_run_id=None):
     """
-    Runs the ETL jobs sequentially: first DW, then Elasticsearch.
+    Extracts the source data once, window by window, and runs the ETL jobs
+    sequentially on each window: first DW, then Elasticsearch. A job that fails
+    on a window skips the remaining ones and keeps its previous watermark.
+    With ETL_RESUMABLE_RUNS, an unfinished run is resumed from its staged
+    extraction, skipping the steps it already completed.
+
+    Args:
+        replay_run_id: Run ID of a staged snapshot. When given, the windows
+            are read from the snapshot instead of the source database.
     """
     logger.info("Starting sequential execution of ETL jobs.")
 
-    dw_result = run_dw_job()
-    elastic_result = run_elastic_job()
-
-    results = {"dw": dw_result, "elastic": elastic_result}
+    results = {"dw": "DW_ETL_SUCCESS", "elastic": "ELASTIC_ETL_SUCCESS"}
+    try:
+        etl_job_dw = DwEtlProcessor()
+        etl_job_elastic = ElasticEtlProcessor()
+        run_ledger = None
+        if replay_run_id:
+            extractor = SnapshotReplayProcessor(run_id=replay_run_id)
+            staging_snapshot = False
+        elif etl_job_dw.run_ledger:
+            # ETL_RESUMABLE_RUNS: the extraction is staged under the run ID
+            run_ledger = etl_job_dw.run_ledger
+            run_id, resumed = run_ledger.open_run(SCHEDULED_RUN_JOB)
+            extractor = (
+                SnapshotReplayProcessor(run_id=run_id)
+                if resumed
+                else TicketsExtractProcessor(
+                    job_names=[DwEtlProcessor.JOB_NAME, ElasticEtlProcessor.JOB_NAME],
+                    run_id=run_id,
+                )
+            )
+            etl_job_dw.run_id = etl_job_elastic.run_id = run_id
+            staging_snapshot = True
+        else:
+            extractor = TicketsExtractProcessor(
+                job_names=[DwEtlProcessor.JOB_NAME, ElasticEtlProcessor.JOB_NAME]
+            )
+            staging_snapshot = extractor.snapshot_store is not None
+
+        for window_number, extracted in enumerate(extractor.iter_batches(), start=1):
+            if results["dw"] == "DW_ETL_SUCCESS":
+                results["dw"] = run_dw_job(etl_job_dw, extracted, window_number)
+            if results["elastic"] == "ELASTIC_ETL_SUCCESS":
+                results["elastic"] = run_elastic_job(
+                    etl_job_elastic, extracted, window_number
+                )
+            # A staged run keeps extracting so it can be replayed in full
+            if (
+                "SUCCESS" not in results["dw"] + results["elastic"]
+                and not staging_snapshot
+            ):
+                break
+        if run_ledger:
+            run_ledger.checkpoint(run_id, EXTRACT_STEP)
+
+        if results["dw"] == "DW_ETL_SUCCESS":
+            etl_job_dw.save_watermark(extractor.next_watermark)
+        if results["elastic"] == "ELASTIC_ETL_SUCCESS":
+            etl_job_elastic.save_watermark(extractor.next_watermark)
+        if run_ledger and "FAILED" not in results["dw"] + results["elastic"]:
+            run_ledger.finish_run(run_id)
+    except Exception as e:
+        logger.error(f"Error extracting data for the ETL jobs: {e}", exc_info=True)
+        results = {"dw": "DW_ETL_FAILED", "elastic": "ELASTIC_ETL_FAILED"}
 
     logger.info(
         f"Sequential execution completed with the following statuses: {results}"
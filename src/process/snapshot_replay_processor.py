@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import aspectlib
+
+from config.aop_logging import log_execution
+from config.logger import setup_logger
+from utils.snapshot_store import SnapshotStore
+
+logger = setup_logger(__name__)
+
+
+class SnapshotReplayProcessor:
+    """
+    Serves the extraction windows of a staged snapshot in place of the source
+    database, so transform and load can be re-run for a past run ID.
+    """
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.snapshot_store = SnapshotStore()
+        self.next_watermark = None
+
+    def iter_batches(self):
+        """Yields the snapshot windows, in the order they were extracted."""
+        manifest = self.snapshot_store.read_manifest(self.run_id)
+        logger.info(f"Replaying snapshot {self.run_id} ({manifest['windows']} windows)")
+        yield from self.snapshot_store.iter_windows(self.run_id)
+
+        # The watermark captured by the original run is applied on success
+        if manifest["next_watermark"]:
+            self.next_watermark = datetime.fromisoformat(manifest["next_watermark"])
+
+
+aspectlib.weave(SnapshotReplayProcessor, log_execution)
@@ -0,0 +1,120 @@
+import os
+from typing import List, Optional
+
+import aspectlib
+
+from config.aop_logging import log_execution
+from config.db_connector import DBConnectionPool, DBConnector
+from config.dotenv_loader import get_boolean_from_env
+from config.logger import setup_logger
+from services.extract_tickets_service import ExtractTicketsService
+from utils.snapshot_store import SnapshotStore
+from utils.watermark_store import WatermarkStore
+
+logger = setup_logger(__name__)
+
+
+class TicketsExtractProcessor:
+    """
+    Extracts the ticket data once on behalf of one or more ETL jobs, so the
+    source database is scanned a single time per schedule.
+    """
+
+    def __init__(self, job_names: List[str], run_id: Optional[str] = None):
+        """
+        Args:
+            job_names: Jobs that consume the extraction. In incremental mode
+                the oldest watermark among them bounds the extraction.
+            run_id: ID of a resumable run (see RunLedger). Its extraction is
+                always staged, under that ID, so the run can be resumed.
+        """
+        self.job_names = job_names
+
+        db_name = os.getenv("CLIENT_DB_NAME")
+        self.db_client = DBConnector(db_name=db_name)
+
+        # Child tables are read concurrently when more than one worker is allowed
+        max_workers = int(os.getenv("ETL_EXTRACT_MAX_WORKERS", "1"))
+        self.connection_pool = (
+            DBConnectionPool(db_name=db_name, max_size=max_workers)
+            if max_workers > 1
+            else None
+        )
+        self.extract_service = ExtractTicketsService(
+            db_connection=self.db_client, connection_pool=self.connection_pool
+        )
+
+        # Tickets are extracted in keyset windows when a batch size is set
+        self.batch_size = int(os.getenv("ETL_BATCH_SIZE", "0"))
+
+        self.incremental = bool(get_boolean_from_env("ETL_INCREMENTAL"))
+        self.watermark_store = WatermarkStore()
+        self.next_watermark = None
+
+        # Extraction windows are staged as Parquet for replay when enabled
+        self.snapshot_store = (
+            SnapshotStore() if run_id or get_boolean_from_env("ETL_SNAPSHOT") else None
+        )
+        self.run_id = run_id or SnapshotStore.new_run_id()
+
+    def _get_changed_since(self):
+        if not self.incremental:
+            return None
+
+        watermarks = [self.watermark_store.get(job) for job in self.job_names]
+        if any(watermark is None for watermark in watermarks):
+            return None
+        return min(watermarks)
+
+    def iter_batches(self):
+        """
+        Yields the extraction windows, staging each one in the snapshot store
+        when ETL_SNAPSHOT is enabled.
+        """
+        if not self.snapshot_store:
+            yield from self._extract_windows()
+            return
+
+        logger.info(f"Staging extraction snapshot {self.run_id}")
+        window_number = 0
+        for extracted in self._extract_windows():
+            window_number += 1
+            self.snapshot_store.write_window(self.run_id, window_number, extracted)
+            yield extracted
+        self.snapshot_store.write_manifest(
+            self.run_id, window_number, self.next_watermark
+        )
+
+    def _extract_windows(self):
+        """
+        Yields keyset pages of ETL_BATCH_SIZE tickets with their child
+        collections, or the whole extraction as a single window when no batch
+        size is configured.
+        """
+        logger.info(f"Extracting ticket data for jobs: {self.job_names}")
+        self.db_client.connect()
+        try:
+            changed_since = self._get_changed_since()
+            if self.incremental:
+                self.next_watermark = self.extract_service.get_source_timestamp()
+                logger.info(f"Incremental extraction since {changed_since}")
+
+            if self.batch_size > 0:
+                yield from self.extract_service.iter_ticket_batches(
+                    self.batch_size, changed_since=changed_since
+                )
+            else:
+                extracted = self.extract_service.extract_complete_tickets_data(
+                    changed_since=changed_since
+                )
+                logger.info(
+                    f"Extraction completed: {len(extracted['tickets'])} tickets."
+                )
+                yield extracted
+        finally:
+            if self.connection_pool:
+                self.connection_pool.close_all()
+            self.db_client.close()
+
+
+aspectlib.weave(TicketsExtractProcessor, log_execution)
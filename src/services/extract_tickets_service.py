@@ -0,0 +1,517 @@
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import aspectlib
+import pyarrow as pa
+
+from config.aop_logging import log_execution
+from config.logger import setup_logger
+from services.reference_data_service import ReferenceDataService
+from utils.adaptive_batch import AdaptiveBatchController, is_backoff_error
+from utils.columnar import concat_tables, empty_table
+
+logger = setup_logger(__name__)
+
+# Narrow ticket rows: reference columns are joined in memory afterwards
+TICKET_SELECT_FIELDS = """
+    t.TicketId as ticket_id,
+    t.Title as title,
+    t.Description as description,
+    t.Channel as channel,
+    t.Device as device,
+    t.CurrentStatusId as current_status,
+    t.SLAPlanId as sla_plan,
+    t.PriorityId as priorityId,
+    t.CreatedAt as created_at,
+    t.FirstResponseAt as first_response_at,
+    t.ClosedAt as closed_at,
+    t.CompanyId as company_id,
+    t.CreatedByUserId as user_id,
+    t.AssignedAgentId as agent_id,
+    t.ProductId as product_id,
+    t.CategoryId as category_id,
+    t.SubcategoryId as subcategory_id
+"""
+
+TICKET_FROM_CLAUSE = """
+    FROM dbo.Tickets t
+"""
+
+# Columns of the extracted tickets, once enriched with the reference tables
+TICKET_COLUMNS = [
+    "ticket_id",
+    "title",
+    "description",
+    "channel",
+    "device",
+    "current_status",
+    "status_name",
+    "sla_plan",
+    "priorityId",
+    "priority",
+    "created_at",
+    "first_response_at",
+    "closed_at",
+    "company_id",
+    "company_name",
+    "company_cnpj",
+    "company_segment",
+    "user_id",
+    "user_full_name",
+    "user_email",
+    "user_phone",
+    "user_cpf",
+    "user_is_vip",
+    "agent_id",
+    "agent_full_name",
+    "agent_email",
+    "agent_department",
+    "product_id",
+    "product_name",
+    "product_code",
+    "product_description",
+    "category_id",
+    "category_name",
+    "subcategory_id",
+    "subcategory_name",
+    "sla_plan_name",
+    "sla_first_response_mins",
+    "sla_resolution_mins",
+]
+
+# Selects tickets whose own dates, status history or audit trail moved after ?
+CHANGED_TICKETS_CONDITION = """
+    (
+        t.CreatedAt > ?
+        OR t.FirstResponseAt > ?
+        OR t.ClosedAt > ?
+        OR EXISTS (
+            SELECT 1 FROM dbo.TicketStatusHistory tsh
+            WHERE tsh.TicketId = t.TicketId AND tsh.ChangedAt > ?
+        )
+        OR EXISTS (
+            SELECT 1 FROM dbo.AuditLogs al
+            WHERE al.EntityType = 'ticket'
+                AND al.EntityId = t.TicketId
+                AND al.PerformedAt > ?
+        )
+    )
+"""
+
+STAGED_TICKET_IDS_TABLE = "etl_ticket_ids"
+
+# SQL Server accepts at most 2100 parameters per statement
+MAX_IN_LIST_PARAMETERS = 2000
+
+
+class ExtractTicketsService:
+    """
+    Service responsible for extracting ticket data from the database.
+    Reads, in a single pass, the union of the columns needed by the DW and
+    Elasticsearch pipelines. Every collection is returned as a typed Arrow
+    table; child tables carry the `ticket_id` of their parent. Ticket rows are
+    read narrow and enriched in memory with the cached reference tables.
+    """
+
+    def __init__(self, db_connection, connection_pool=None):
+        """
+        Args:
+            db_connection: Instance of DBConnector class
+            connection_pool: Optional DBConnectionPool. When given, the child
+                tables are extracted concurrently, one pooled connection each.
+        """
+
+        self.db = db_connection
+        self.connection_pool = connection_pool
+        self.child_filter_strategy = os.getenv(
+            "ETL_CHILD_FILTER_STRATEGY", "in_list"
+        ).lower()
+        self.staged_ids_table = None
+        self.reference_data = ReferenceDataService(db_connection)
+        self.in_list_batches = AdaptiveBatchController(
+            "extract IN-list",
+            initial_size=1000,
+            min_size=50,
+            max_size=MAX_IN_LIST_PARAMETERS,
+            max_payload_bytes=64 * 1024 * 1024,
+        )
+
+    def _execute_in_chunks(self, base_query: str, ids: list, db=None) -> pa.Table:
+        """
+        Executes a SQL query with an IN clause, splitting it into batches sized
+        by the adaptive controller and kept below the SQL Server parameter limit.
+        Runs on `db` when given (a pooled connection), else on this service's.
+        """
+        db = db or self.db
+        if not ids:
+            return empty_table()
+
+        str_ids = [str(i) for i in ids]
+        logger.info(
+            f"Querying {len(str_ids)} IDs in batches of up to "
+            f"{self.in_list_batches.size}."
+        )
+
+        def fetch_chunk(chunk_ids):
+            placeholders = ",".join(["?"] * len(chunk_ids))
+
+            # Add placeholders inside parentheses
+            query = f"{base_query} ({placeholders})"
+            try:
+                return db.fetch_table(query, chunk_ids)
+            except Exception as e:
+                if is_backoff_error(e):
+                    raise
+                logger.error(f"Error executing batch of {len(chunk_ids)} IDs: {e}")
+                return empty_table()
+
+        tables = self.in_list_batches.run(
+            str_ids, fetch_chunk, payload_bytes=lambda table: table.nbytes
+        )
+        return concat_tables(tables)
+
+    def _stage_ticket_ids(self, ticket_ids: List[str]):
+        """
+        Bulk-loads the extracted ticket IDs into a session temp table, so child
+        tables can be read with one set-based JOIN instead of IN-list batches.
+        """
+        unique_ids = list(dict.fromkeys(ticket_ids))
+
+        # Pooled connections run in other sessions, so they need a shared table
+        backend = self.db.backend
+        shared = self.connection_pool is not None
+        table_name = STAGED_TICKET_IDS_TABLE
+        if shared:
+            table_name = f"{STAGED_TICKET_IDS_TABLE}_{uuid.uuid4().hex[:12]}"
+        table_name = backend.temp_table_name(table_name, shared=shared)
+        logger.info(f"Staging {len(unique_ids)} ticket IDs in {table_name}.")
+
+        self.db.execute_query(f"DROP TABLE IF EXISTS {table_name}")
+        self.db.execute_query(
+            backend.create_temp_table_sql(
+                table_name, "TicketId NVARCHAR(64) NOT NULL PRIMARY KEY", shared=shared
+            )
+        )
+        self.db.execute_many(
+            f"INSERT INTO {table_name} (TicketId) VALUES (?)",
+            [(ticket_id,) for ticket_id in unique_ids],
+        )
+        self.staged_ids_table = table_name
+
+    def _drop_staged_ticket_ids(self):
+        self.db.execute_query(f"DROP TABLE IF EXISTS {self.staged_ids_table}")
+        self.staged_ids_table = None
+
+    def _extract_child_on_pooled_connection(
+        self, method_name: str, ticket_ids: Optional[List[str]]
+    ) -> pa.Table:
+        """
+        Runs one child-table extraction on a connection borrowed from the pool.
+        The workers share this service, so the IN-list batch size learned by
+        one is used by the others.
+        """
+        with self.connection_pool.connection() as db:
+            return getattr(self, method_name)(ticket_ids, db=db)
+
+    def _extract_children(self, ticket_ids: Optional[List[str]]) -> Dict[str, pa.Table]:
+        """
+        Extracts the four child tables. They do not depend on each other, so with
+        a connection pool they run concurrently, bounded by the pool size.
+        """
+        child_methods = {
+            "attachments": "_get_attachments",
+            "tags": "_get_tags",
+            "status_history": "_get_status_history",
+            "audit_logs": "_get_audit_logs",
+        }
+
+        if not self.connection_pool:
+            return {
+                key: getattr(self, method_name)(ticket_ids)
+                for key, method_name in child_methods.items()
+            }
+
+        logger.info(
+            f"Extracting child tables on up to {self.connection_pool.max_size} "
+            "pooled connections."
+        )
+        with ThreadPoolExecutor(max_workers=self.connection_pool.max_size) as pool:
+            futures = {
+                key: pool.submit(
+                    self._extract_child_on_pooled_connection, method_name, ticket_ids
+                )
+                for key, method_name in child_methods.items()
+            }
+            return {key: future.result() for key, future in futures.items()}
+
+    def _extract_children_of(
+        self, ticket_ids: Optional[List[str]]
+    ) -> Dict[str, pa.Table]:
+        """
+        Extracts the child tables of the given tickets (every ticket when None),
+        staging the IDs first when the temp-table strategy is configured.
+        """
+        staged = ticket_ids is not None and self.child_filter_strategy == "temp_table"
+        if staged:
+            self._stage_ticket_ids(ticket_ids)
+
+        try:
+            return self._extract_children(ticket_ids)
+        finally:
+            if staged:
+                self._drop_staged_ticket_ids()
+
+    def _read_child_table(
+        self,
+        base_query: str,
+        ticket_column: str,
+        ticket_ids: Optional[List[str]],
+        condition: Optional[str] = None,
+        db=None,
+    ) -> pa.Table:
+        """
+        Reads the child-table rows of the extracted tickets.
+        `ticket_ids=None` means the whole ticket table was extracted, so no ID
+        filter is applied. Otherwise the IDs are matched through the staged temp
+        table when available, or through IN-list batches. Runs on `db` when
+        given, else on this service's connection.
+        """
+        db = db or self.db
+        where_clause = f"WHERE {condition}" if condition else ""
+
+        if ticket_ids is None:
+            return db.fetch_table(f"{base_query} {where_clause}")
+
+        if self.staged_ids_table:
+            query = f"""
+            {base_query}
+            JOIN {self.staged_ids_table} ids ON ids.TicketId = {ticket_column}
+            {where_clause}
+            """
+            return db.fetch_table(query)
+
+        in_filter = f"{ticket_column} IN"
+        if condition:
+            in_filter = f"{condition} AND {in_filter}"
+        return self._execute_in_chunks(
+            f"{base_query} WHERE {in_filter}", ticket_ids, db=db
+        )
+
+    def get_source_timestamp(self) -> Optional[datetime]:
+        """
+        Returns the current time of the source database. Captured before an
+        incremental extraction, it becomes the watermark of the next run.
+        """
+        results = self.db.fetch_all(self.db.backend.current_timestamp_sql)
+        return results[0][0] if results else None
+
+    def _get_tickets_base_data(
+        self,
+        ticket_ids: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        changed_since: Optional[datetime] = None,
+    ) -> pa.Table:
+        """
+        Extracts main ticket data with basic relationships.
+        When `changed_since` is given, only tickets changed after it are read.
+        """
+        if ticket_ids:
+            base_query = f"SELECT {TICKET_SELECT_FIELDS} {TICKET_FROM_CLAUSE} WHERE t.TicketId IN"
+            return self._execute_in_chunks(base_query, ticket_ids)
+        elif changed_since:
+            top_clause = self.db.backend.top(limit)
+            limit_clause = self.db.backend.limit(limit)
+            query = f"SELECT {top_clause} {TICKET_SELECT_FIELDS} {TICKET_FROM_CLAUSE} WHERE {CHANGED_TICKETS_CONDITION} ORDER BY t.CreatedAt DESC {limit_clause}"
+            return self.db.fetch_table(query, [changed_since] * 5)
+        elif limit:
+            top_clause = self.db.backend.top(limit)
+            limit_clause = self.db.backend.limit(limit)
+            query = f"SELECT {top_clause} {TICKET_SELECT_FIELDS} {TICKET_FROM_CLAUSE} ORDER BY t.CreatedAt DESC {limit_clause}"
+            return self.db.fetch_table(query)
+        else:
+            query = f"SELECT {TICKET_SELECT_FIELDS} {TICKET_FROM_CLAUSE} ORDER BY t.CreatedAt DESC"
+            return self.db.fetch_table(query)
+
+    def _get_tickets_page(
+        self,
+        batch_size: int,
+        after_ticket_id=None,
+        changed_since: Optional[datetime] = None,
+    ) -> pa.Table:
+        """
+        Reads the next keyset page of tickets, ordered by TicketId, starting
+        right after `after_ticket_id`.
+        """
+        conditions = []
+        params = []
+        if after_ticket_id is not None:
+            conditions.append("t.TicketId > ?")
+            params.append(after_ticket_id)
+        if changed_since:
+            conditions.append(CHANGED_TICKETS_CONDITION)
+            params.extend([changed_since] * 5)
+
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+        SELECT {self.db.backend.top(batch_size)} {TICKET_SELECT_FIELDS}
+        {TICKET_FROM_CLAUSE}
+        {where_clause}
+        ORDER BY t.TicketId
+        {self.db.backend.limit(batch_size)}
+        """
+        return self.db.fetch_table(query, params)
+
+    def iter_ticket_batches(
+        self, batch_size: int, changed_since: Optional[datetime] = None
+    ) -> Iterator[Dict[str, pa.Table]]:
+        """
+        Pages through the tickets by keyset on TicketId and yields, for each page
+        of up to `batch_size` tickets, a complete extraction with the child
+        collections attached (same shape as `extract_complete_tickets_data`).
+        """
+        after_ticket_id = None
+        batch_number = 0
+
+        while True:
+            tickets_data = self._get_tickets_page(
+                batch_size, after_ticket_id, changed_since
+            )
+            if tickets_data.num_rows == 0:
+                return
+
+            batch_number += 1
+            logger.info(
+                f"Extracted ticket batch {batch_number} with {len(tickets_data)} tickets."
+            )
+            ticket_id_column = tickets_data.column("ticket_id")
+            ticket_ids = [str(ticket_id) for ticket_id in ticket_id_column.to_pylist()]
+            yield {
+                "tickets": self.reference_data.enrich(tickets_data, TICKET_COLUMNS),
+                **self._extract_children_of(ticket_ids),
+            }
+
+            if tickets_data.num_rows < batch_size:
+                return
+            after_ticket_id = ticket_id_column[-1].as_py()
+
+    def _get_attachments(self, ticket_ids: Optional[List[str]], db=None) -> pa.Table:
+        """
+        Extracts attachments from the specified tickets (all tickets when None).
+        """
+        if ticket_ids is not None and not ticket_ids:
+            return empty_table()
+
+        base_query = """
+        SELECT
+            att.AttachmentId as id,
+            att.TicketId as ticket_id,
+            att.FileName as filename,
+            att.MimeType as mime_type,
+            att.SizeBytes as size_bytes,
+            att.StoragePath as storage_path,
+            att.UploadedAt as uploaded_at
+        FROM dbo.Attachments att
+        """
+        return self._read_child_table(base_query, "att.TicketId", ticket_ids, db=db)
+
+    def _get_tags(self, ticket_ids: Optional[List[str]], db=None) -> pa.Table:
+        """
+        Extracts tags (ID and Name) from the specified tickets (all tickets when None).
+        """
+        if ticket_ids is not None and not ticket_ids:
+            return empty_table()
+
+        base_query = """
+        SELECT
+            tt.TicketId as ticket_id,
+            t.TagId as tag_id,
+            t.Name as tag_name
+        FROM dbo.TicketTags tt
+        JOIN dbo.Tags t ON tt.TagId = t.TagId
+        """
+        return self._read_child_table(base_query, "tt.TicketId", ticket_ids, db=db)
+
+    def _get_status_history(self, ticket_ids: Optional[List[str]], db=None) -> pa.Table:
+        """
+        Extracts status history from the specified tickets (all tickets when None).
+        """
+        if ticket_ids is not None and not ticket_ids:
+            return empty_table()
+
+        base_query = """
+        SELECT
+            tsh.TicketId as ticket_id,
+            tsh.FromStatusId as from_status,
+            tsh.ToStatusId as to_status,
+            tsh.ChangedAt as changed_at,
+            tsh.ChangedByAgentId as changed_by_agent_id,
+            a.FullName as changed_by_agent_name
+        FROM dbo.TicketStatusHistory tsh
+        LEFT JOIN dbo.Agents a ON tsh.ChangedByAgentId = a.AgentId
+        """
+        return self._read_child_table(base_query, "tsh.TicketId", ticket_ids, db=db)
+
+    def _get_audit_logs(self, ticket_ids: Optional[List[str]], db=None) -> pa.Table:
+        """
+        Extracts audit logs from the specified tickets (all tickets when None).
+        """
+        if ticket_ids is not None and not ticket_ids:
+            return empty_table()
+
+        base_query = """
+        SELECT
+            al.EntityId as ticket_id,
+            al.AuditId as id,
+            al.EntityType as entity_type,
+            al.EntityId as entity_id,
+            al.Operation as operation,
+            al.PerformedBy as performed_by,
+            al.PerformedAt as performed_at,
+            al.DetailsJson as details
+        FROM dbo.AuditLogs al
+        """
+        return self._read_child_table(
+            base_query,
+            "al.EntityId",
+            ticket_ids,
+            condition="al.EntityType = 'ticket'",
+            db=db,
+        )
+
+    def extract_complete_tickets_data(
+        self,
+        ticket_ids: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        changed_since: Optional[datetime] = None,
+    ) -> Dict[str, pa.Table]:
+        """
+        Extracts all necessary data from tickets.
+        With `changed_since`, only tickets changed after that watermark are extracted.
+        """
+        tickets_data = self._get_tickets_base_data(ticket_ids, limit, changed_since)
+
+        if tickets_data.num_rows == 0:
+            return {
+                "tickets": tickets_data,
+                "attachments": empty_table(),
+                "tags": empty_table(),
+                "status_history": empty_table(),
+                "audit_logs": empty_table(),
+            }
+
+        full_extraction = ticket_ids is None and limit is None and changed_since is None
+        child_ticket_ids = (
+            None
+            if full_extraction
+            else [str(i) for i in tickets_data.column("ticket_id").to_pylist()]
+        )
+        children = self._extract_children_of(child_ticket_ids)
+        tickets_data = self.reference_data.enrich(tickets_data, TICKET_COLUMNS)
+
+        return {"tickets": tickets_data, **children}
+
+
+aspectlib.weave(ExtractTicketsService, log_execution)
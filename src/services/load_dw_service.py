@@ -1,20 +1,404 @@
-from typing import Dict, List
+import copy
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
 
 import aspectlib
+import numpy as np
 import pandas as pd
 
 from config.aop_logging import log_execution
 from config.db_connector import DBConnector
 from config.logger import setup_logger
+from utils.adaptive_batch import AdaptiveBatchController
+from utils.calendar_keys import (
+    DIM_DATE_COLUMNS,
+    DIM_TIME_COLUMNS,
+    build_dim_date,
+    build_dim_time,
+    date_key_range,
+    key_to_date,
+)
+from utils.hash_store import HashStore, row_hashes
+from utils.row_encoder import encode_rows
 
 logger = setup_logger(__name__)
 
+FACT_DATE_KEY_COLUMNS = ["EntryDateKey", "ClosedDateKey", "FirstResponseDateKey"]
+
+# Business keys per lookup statement, below SQL Server's 2100-parameter limit
+MAX_IN_LIST_PARAMETERS = 2000
+
+ROW_HASH_COLUMN = "RowHash"
+
+# (dimension, fact business key, dimension business key, surrogate key)
+FACT_KEY_LOOKUPS = [
+    ("Dim_Users", "UserId_BK", "UserId_BK", "UserKey"),
+    ("Dim_Agents", "AgentId_BK", "AgentId_BK", "AgentKey"),
+    ("Dim_Companies", "CompanyId_BK", "CompanyId_BK", "CompanyKey"),
+    ("Dim_Categories", "CategoryId_BK", "CategoryId_BK", "CategoryKey"),
+    ("Dim_Priorities", "PriorityId_BK", "PriorityId_BK", "PriorityKey"),
+    ("Dim_Status", "StatusId_BK", "StatusId_BK", "StatusKey"),
+    ("Dim_Products", "ProductId_BK", "ProductId_BK", "ProductKey"),
+    ("Dim_Tags", "TagId_BK", "TagId_BK", "TagKey"),
+    ("Dim_Channel", "Channel_BK", "ChannelName", "ChannelKey"),
+]
+
+# Default ETL_FACT_MERGE_RANGE_SIZE: TicketKey values or months per range
+FACT_MERGE_RANGE_SIZES = {"ticket": 100000, "month": 1}
+
+FACT_COLUMNS = [
+    "TicketKey",
+    "UserKey",
+    "AgentKey",
+    "CompanyKey",
+    "CategoryKey",
+    "PriorityKey",
+    "StatusKey",
+    "ProductKey",
+    "TagKey",
+    "ChannelKey",
+    "EntryDateKey",
+    "ClosedDateKey",
+    "FirstResponseDateKey",
+    "EntryTimeKey",
+    "ClosedTimeKey",
+    "FirstResponseTimeKey",
+    "QtTickets",
+]
+
+
+def fact_column_type(column: str) -> str:
+    """SQL type of a Fact_Tickets column in the staging tables."""
+    if column == ROW_HASH_COLUMN:
+        return "CHAR(16)"
+    return "BIGINT" if "Key" in column else "INT"
+
+
+def integral_keys(series: pd.Series) -> pd.Series:
+    """
+    Returns business keys of integer IDs as integers. An ID column holding
+    nulls arrives as float64, so without this the same ID would be staged as
+    '3.0' or '3' depending on whether its extraction window has a null.
+    """
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        return series.astype("Int64")
+    return series
+
 
 class LoadDwService:
-    def __init__(self, db_connection: DBConnector):
+    def __init__(self, db_connection: DBConnector, connection_pool=None):
+        """
+        Args:
+            db_connection: Instance of DBConnector class
+            connection_pool: Optional DBConnectionPool to the DW. When given,
+                the dimensions are loaded concurrently, one pooled connection
+                each, and Fact_Tickets once they have all been merged.
+        """
         self.db = db_connection
+        self.connection_pool = connection_pool
+        self.date_dimension = os.getenv("ETL_DATE_DIMENSION", "minute").lower()
+        # Dim_Date range known to be loaded, () when empty, None until read
+        self._calendar_range = None
+        self.insert_batches = AdaptiveBatchController(
+            "DW staging insert", initial_size=10000, min_size=500
+        )
+
+        # off: every row is merged; cache: row hashes kept in the local hash
+        # store; column: compared with the RowHash column of the dimension
+        self.dimension_delta = os.getenv("ETL_DIMENSION_DELTA", "off").lower()
+        if self.dimension_delta not in ("off", "cache", "column"):
+            raise ValueError(
+                f"Unsupported ETL_DIMENSION_DELTA '{self.dimension_delta}'. "
+                "Expected 'off', 'cache' or 'column'."
+            )
+        # client: surrogate keys fetched and merged in pandas; server: resolved
+        # by one INSERT...SELECT joining the dimensions in the DW
+        self.fact_key_resolution = os.getenv(
+            "ETL_FACT_KEY_RESOLUTION", "client"
+        ).lower()
+        if self.fact_key_resolution not in ("client", "server"):
+            raise ValueError(
+                f"Unsupported ETL_FACT_KEY_RESOLUTION '{self.fact_key_resolution}'. "
+                "Expected 'client' or 'server'."
+            )
+
+        # insert: new ticket x tag rows only; upsert: changed rows (by RowHash)
+        # are updated and ticket x tag rows no longer staged are deleted
+        self.fact_load_mode = os.getenv("ETL_FACT_LOAD_MODE", "insert").lower()
+        if self.fact_load_mode not in ("insert", "upsert"):
+            raise ValueError(
+                f"Unsupported ETL_FACT_LOAD_MODE '{self.fact_load_mode}'. "
+                "Expected 'insert' or 'upsert'."
+            )
+
+        # none: one MERGE of the whole staged fact; ticket/month: one MERGE,
+        # committed on its own, per TicketKey range or EntryDateKey month range
+        self.fact_merge_partition = os.getenv(
+            "ETL_FACT_MERGE_PARTITION", "none"
+        ).lower()
+        if self.fact_merge_partition not in ("none", "ticket", "month"):
+            raise ValueError(
+                f"Unsupported ETL_FACT_MERGE_PARTITION '{self.fact_merge_partition}'. "
+                "Expected 'none', 'ticket' or 'month'."
+            )
+        if self.fact_merge_partition == "month" and self.date_dimension != "calendar":
+            raise ValueError(
+                "ETL_FACT_MERGE_PARTITION 'month' requires ETL_DATE_DIMENSION "
+                "'calendar' (YYYYMMDD date keys)."
+            )
+        self.fact_merge_range_size = int(
+            os.getenv(
+                "ETL_FACT_MERGE_RANGE_SIZE",
+                FACT_MERGE_RANGE_SIZES.get(self.fact_merge_partition, 0),
+            )
+        )
+
+        if self.fact_merge_partition != "none" and self.fact_merge_range_size < 1:
+            raise ValueError("ETL_FACT_MERGE_RANGE_SIZE must be a positive integer.")
+
+        # Pooled connections used at once by the dimension and fact range loads
+        self.dimension_workers = int(os.getenv("ETL_DW_LOAD_WORKERS", "1"))
+        self.fact_merge_workers = int(os.getenv("ETL_FACT_MERGE_WORKERS", "1"))
+
+        # executemany: parameterized INSERT batches; bulk: table-valued
+        # parameters (SQL Server) or an in-place scan (DuckDB), for the tables
+        # of ETL_STAGING_LOADER_TABLES (all when unset). Backends without a
+        # bulk path (SQLite) keep executemany
+        self.staging_loader = os.getenv("ETL_STAGING_LOADER", "executemany").lower()
+        if self.staging_loader not in ("executemany", "bulk"):
+            raise ValueError(
+                f"Unsupported ETL_STAGING_LOADER '{self.staging_loader}'. "
+                "Expected 'executemany' or 'bulk'."
+            )
+        loader_tables = os.getenv("ETL_STAGING_LOADER_TABLES", "")
+        self.staging_loader_tables = {
+            table.strip() for table in loader_tables.split(",") if table.strip()
+        }
+
+        delta_tables = os.getenv("ETL_DIMENSION_DELTA_TABLES", "")
+        self.dimension_delta_tables = {
+            table.strip() for table in delta_tables.split(",") if table.strip()
+        }
+
+    def _fact_columns(self) -> List[str]:
+        if self.fact_load_mode == "upsert":
+            return [*FACT_COLUMNS, ROW_HASH_COLUMN]
+        return FACT_COLUMNS
+
+    def _insert_rows(self, insert_sql: str, df: pd.DataFrame):
+        """
+        Inserts a frame into a staging table. Its rows are encoded to native
+        values in bounded chunks and sent in adaptively sized executemany
+        batches.
+        """
+
+        def insert_batch(batch):
+            # A batch timing out may have applied part of its rows: they are
+            # rolled back before it is retried smaller, not inserted twice
+            with self.db.savepoint():
+                self.db.execute_many(insert_sql, batch)
+
+        for rows in encode_rows(df):
+            self.insert_batches.run(rows, insert_batch)
+
+    def _tracks_delta(self, table_name: str) -> bool:
+        return self.dimension_delta != "off" and (
+            not self.dimension_delta_tables or table_name in self.dimension_delta_tables
+        )
+
+    def _fetch_by_keys(
+        self, table_name: str, business_key_col: str, keys: List[str], column: str
+    ) -> Dict[str, object]:
+        """Reads `column` of the dimension rows with the given business keys."""
+        quote = self.db.backend.quote
+        values = {}
+        for start in range(0, len(keys), MAX_IN_LIST_PARAMETERS):
+            chunk = keys[start : start + MAX_IN_LIST_PARAMETERS]
+            placeholders = ", ".join(["?"] * len(chunk))
+            rows = self.db.fetch_all(
+                f"SELECT {quote(business_key_col)}, {quote(column)} "
+                f"FROM {table_name} WHERE {quote(business_key_col)} IN ({placeholders})",
+                chunk,
+            )
+            values.update((str(bk), value) for bk, value in rows or [])
+        return values
+
+    def _changed_dimension_rows(
+        self,
+        table_name: str,
+        df_dim: pd.DataFrame,
+        business_key_col: str,
+        columns_to_update: List[str],
+    ):
+        """
+        Keeps the dimension rows that are new or whose attributes changed
+        since they were last loaded. Returns them with their hashes by key.
+        """
+        keys = df_dim[business_key_col].astype(str)
+        hashes = row_hashes(df_dim, [business_key_col, *columns_to_update])
+
+        if self.dimension_delta == "cache":
+            stored = HashStore(f"dw:{table_name}").get_many(keys.unique())
+            # The cache only knows what was loaded: a row it holds that is no
+            # longer in the dimension (e.g. the table was emptied) is staged
+            unchanged = keys[keys.map(stored) == hashes].unique().tolist()
+            existing = self._fetch_by_keys(
+                table_name, business_key_col, unchanged, business_key_col
+            )
+            stored = {key: stored[key] for key in existing}
+        else:
+            stored = self._fetch_by_keys(
+                table_name, business_key_col, keys.unique().tolist(), ROW_HASH_COLUMN
+            )
+
+        changed = (keys.map(stored) != hashes).to_numpy()
+        logger.info(
+            f"{int(changed.sum())} of {len(df_dim)} rows of {table_name} are new "
+            "or changed."
+        )
+        df_changed = df_dim[changed]
+        if self.dimension_delta == "column":
+            df_changed = df_changed.assign(**{ROW_HASH_COLUMN: hashes[changed]})
+        return df_changed, dict(zip(keys[changed], hashes[changed]))
+
+    def _calendar_default_range(self):
+        start = date.fromisoformat(os.getenv("ETL_CALENDAR_START", "2000-01-01"))
+        end = os.getenv("ETL_CALENDAR_END")
+        end = date.fromisoformat(end) if end else date(date.today().year + 1, 12, 31)
+        return start, end
+
+    def _uses_bulk_loader(self, table_name: str) -> bool:
+        return (
+            self.staging_loader == "bulk"
+            and self.db.backend.supports_bulk_insert
+            and (
+                not self.staging_loader_tables
+                or table_name in self.staging_loader_tables
+            )
+        )
+
+    def _insert_frame(self, table_name: str, df: pd.DataFrame, dw_table: str = None):
+        """
+        Inserts a frame into `table_name` through the backend's bulk path when
+        ETL_STAGING_LOADER selects it for `dw_table` (the DW table being
+        staged, `table_name` itself by default), else with executemany.
+        """
+        if self._uses_bulk_loader(dw_table or table_name):
+            logger.info(f"Bulk loading {len(df)} rows into {table_name}...")
+            self.db.bulk_insert(table_name, df)
+            return
+
+        quote = self.db.backend.quote
+        cols_str = ", ".join(quote(c) for c in df.columns)
+        placeholders = ", ".join(["?"] * len(df.columns))
+        insert_sql = f"INSERT INTO {table_name} ({cols_str}) VALUES ({placeholders})"
+        self._insert_rows(insert_sql, df)
+
+    def _create_calendar_tables(self):
+        backend = self.db.backend
+        quote = backend.quote
+        dim_date_ddl = {
+            "DateKey": "INT NOT NULL PRIMARY KEY",
+            "FullDate": "DATE NOT NULL",
+            "Year": "SMALLINT NOT NULL",
+            "Quarter": "TINYINT NOT NULL",
+            "Month": "TINYINT NOT NULL",
+            "MonthName": "VARCHAR(10) NOT NULL",
+            "Day": "TINYINT NOT NULL",
+            "DayOfWeek": "TINYINT NOT NULL",
+            "DayName": "VARCHAR(10) NOT NULL",
+            "WeekOfYear": "TINYINT NOT NULL",
+            "IsWeekend": f"{backend.boolean_type} NOT NULL",
+        }
+        dim_time_ddl = {
+            "TimeKey": "SMALLINT NOT NULL PRIMARY KEY",
+            "Hour": "TINYINT NOT NULL",
+            "Minute": "TINYINT NOT NULL",
+        }
+        for table_name, columns, ddl in [
+            ("Dim_Date", DIM_DATE_COLUMNS, dim_date_ddl),
+            ("Dim_Time", DIM_TIME_COLUMNS, dim_time_ddl),
+        ]:
+            columns_ddl = ", ".join(f"{quote(c)} {ddl[c]}" for c in columns)
+            self.db.execute_query(
+                backend.create_table_if_missing_sql(table_name, columns_ddl)
+            )
+
+    def ensure_calendar(self, date_keys: pd.Series = None):
+        """
+        Creates and pre-populates Dim_Date (one row per day, YYYYMMDD keys) and
+        Dim_Time (one row per minute of the day, HHMM keys). Dim_Date covers
+        ETL_CALENDAR_START to ETL_CALENDAR_END and is extended to any key in
+        `date_keys` outside that range; only missing days are inserted, and
+        the loaded range is remembered so later loads run no query at all.
+        """
+        quote = self.db.backend.quote
+        if self._calendar_range is None:
+            self._create_calendar_tables()
+
+            time_key = quote("TimeKey")
+            loaded_times = {
+                row[0]
+                for row in self.db.fetch_all(f"SELECT {time_key} FROM Dim_Time") or []
+            }
+            dim_time = build_dim_time()
+            dim_time = dim_time[~dim_time["TimeKey"].isin(loaded_times)]
+            if not dim_time.empty:
+                logger.info(f"Populating Dim_Time with {len(dim_time)} rows.")
+                with self.db.transaction(batch_commits=False):
+                    self._insert_frame("Dim_Time", dim_time)
+
+            date_key = quote("DateKey")
+            rows = self.db.fetch_all(
+                f"SELECT MIN({date_key}), MAX({date_key}) FROM Dim_Date"
+            )
+            loaded_min, loaded_max = rows[0] if rows else (None, None)
+            self._calendar_range = (
+                (key_to_date(loaded_min), key_to_date(loaded_max))
+                if loaded_min is not None
+                else ()
+            )
 
-    def load(self, transformed_data: Dict[str, pd.DataFrame]):
+        start, end = self._calendar_default_range()
+        if date_keys is not None:
+            key_min, key_max = date_key_range(date_keys)
+            if key_min is not None:
+                start = min(start, key_to_date(key_min))
+                end = max(end, key_to_date(key_max))
+
+        missing_ranges = [(start, end)]
+        if self._calendar_range:
+            loaded_start, loaded_end = self._calendar_range
+            missing_ranges = [
+                (start, loaded_start - timedelta(days=1)),
+                (loaded_end + timedelta(days=1), end),
+            ]
+            start, end = min(start, loaded_start), max(end, loaded_end)
+
+        for range_start, range_end in missing_ranges:
+            if range_start <= range_end:
+                dim_date = build_dim_date(range_start, range_end)
+                logger.info(
+                    f"Populating Dim_Date from {range_start} to {range_end} "
+                    f"({len(dim_date)} days)."
+                )
+                # A failed insert must not leave part of a range behind
+                with self.db.transaction(batch_commits=False):
+                    self._insert_frame("Dim_Date", dim_date)
+        self._calendar_range = (start, end)
+
+    def load(
+        self,
+        transformed_data: Dict[str, pd.DataFrame],
+        on_table_loaded: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Loads the dimensions, then the fact table. `on_table_loaded` is called
+        with the name of each table once its load is committed.
+        """
         dimension_mappings = [
             (
                 "Dim_Dates",
@@ -58,25 +442,84 @@ class LoadDwService:
             ),
         ]
 
-        for table_name, bk_col_df, bk_col_db, attribute_cols in dimension_mappings:
-            if (
-                table_name in transformed_data
-                and not transformed_data[table_name].empty
-            ):
-                df = transformed_data[table_name].copy()
-                full_table_name = table_name
-                self._load_dimension(
-                    df=df,
-                    table_name=full_table_name,
-                    business_key_col=bk_col_df,
-                    columns_to_update=attribute_cols,
-                )
+        dimensions = [
+            {
+                "df": transformed_data[table_name],
+                "table_name": table_name,
+                "business_key_col": bk_col_df,
+                "columns_to_update": attribute_cols,
+            }
+            for table_name, bk_col_df, bk_col_db, attribute_cols in dimension_mappings
+            if table_name in transformed_data and not transformed_data[table_name].empty
+        ]
+        if self.connection_pool and self.dimension_workers > 1 and len(dimensions) > 1:
+            self._load_dimensions_concurrently(dimensions, on_table_loaded)
+        else:
+            for dimension in dimensions:
+                self._load_dimension(**dimension)
+                if on_table_loaded:
+                    on_table_loaded(dimension["table_name"])
 
         if (
             "Fact_Tickets" in transformed_data
             and not transformed_data["Fact_Tickets"].empty
         ):
+            if self.date_dimension == "calendar":
+                fact = transformed_data["Fact_Tickets"]
+                self.ensure_calendar(
+                    pd.concat(
+                        [fact[col] for col in FACT_DATE_KEY_COLUMNS if col in fact]
+                    )
+                )
             self._load_fact_tickets(transformed_data["Fact_Tickets"])
+            if on_table_loaded:
+                on_table_loaded("Fact_Tickets")
+
+    def _on_connection(self, db: DBConnector) -> "LoadDwService":
+        """
+        A service loading on `db` with this one's settings and batch sizing,
+        parsed once from the environment.
+        """
+        worker = copy.copy(self)
+        worker.db = db
+        worker.connection_pool = None
+        return worker
+
+    def _load_dimension_on_pooled_connection(
+        self, dimension: dict, on_table_loaded: Optional[Callable[[str], None]]
+    ):
+        """Runs one dimension load on a connection borrowed from the pool."""
+        with self.connection_pool.connection() as db:
+            self._on_connection(db)._load_dimension(**dimension)
+        if on_table_loaded:
+            on_table_loaded(dimension["table_name"])
+
+    def _load_dimensions_concurrently(
+        self,
+        dimensions: List[dict],
+        on_table_loaded: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Loads the dimensions, which do not depend on one another, on up to
+        ETL_DW_LOAD_WORKERS pooled connections. Returns once every load has
+        committed and raises the first error met.
+        """
+        max_workers = min(self.dimension_workers, self.connection_pool.max_size)
+        logger.info(
+            f"Loading {len(dimensions)} dimensions on up to {max_workers} "
+            "pooled connections."
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(
+                    self._load_dimension_on_pooled_connection,
+                    dimension,
+                    on_table_loaded,
+                )
+                for dimension in dimensions
+            ]
+            for future in futures:
+                future.result()
 
     def _load_dimension(
         self,
@@ -85,8 +528,10 @@ class LoadDwService:
         business_key_col: str,
         columns_to_update: List[str],
     ):
-        temp_table_name = (
-            f"##{table_name.split('.')[-1].replace('[','').replace(']','')}_temp"
+        backend = self.db.backend
+        quote = backend.quote
+        temp_table_name = backend.temp_table_name(
+            f"{table_name.split('.')[-1].replace('[','').replace(']','')}_temp"
         )
         logger.info(
             f"Starting load for dimension {table_name}. Total of {len(df)} records."
@@ -99,78 +544,91 @@ class LoadDwService:
                 df_dim = df_dim[cols_to_insert].dropna()
             else:
                 cols_to_insert = [business_key_col] + columns_to_update
-                df_dim = df[cols_to_insert].drop_duplicates()
+                # A row without business key (e.g. of tickets with no agent)
+                # is never referenced by a fact and no MERGE would match it:
+                # each load would insert it again
+                df_dim = df[cols_to_insert].dropna(subset=[business_key_col])
+                df_dim = df_dim.assign(
+                    **{business_key_col: integral_keys(df_dim[business_key_col])}
+                ).drop_duplicates()
 
-            self.db.execute_query(
-                f"SELECT TOP 0 * INTO {temp_table_name} FROM {table_name}"
-            )
+                if self._tracks_delta(table_name):
+                    df_dim, changed_hashes = self._changed_dimension_rows(
+                        table_name, df_dim, business_key_col, columns_to_update
+                    )
+                    if df_dim.empty:
+                        logger.info(f"No changes for {table_name}; MERGE skipped.")
+                        return
+                    if self.dimension_delta == "column":
+                        columns_to_update = [*columns_to_update, ROW_HASH_COLUMN]
 
-            if not df_dim.empty:
-                df_prepared = df_dim.where(pd.notnull(df_dim), None)
-                cols_str = ", ".join([f"[{c}]" for c in df_prepared.columns])
-                placeholders = ", ".join(["?"] * len(df_prepared.columns))
-                insert_sql = f"INSERT INTO {temp_table_name} ({cols_str}) VALUES ({placeholders})"
+            # Staging and MERGE commit together: a failed load leaves the
+            # dimension untouched
+            with self.db.transaction():
+                self.db.execute_query(
+                    backend.create_temp_table_like_sql(temp_table_name, table_name)
+                )
 
-                self.db.cursor.fast_executemany = True
-                self.db.cursor.executemany(insert_sql, df_prepared.values.tolist())
-                self.db.connection.commit()
-                self.db.cursor.fast_executemany = False
+                if not df_dim.empty:
+                    self._insert_frame(temp_table_name, df_dim, dw_table=table_name)
 
-            if business_key_col is None:
-                logger.info(
-                    f"Optimizing and loading data for {table_name} using EXCEPT..."
-                )
+                if business_key_col is None:
+                    logger.info(
+                        f"Optimizing and loading data for {table_name} using EXCEPT..."
+                    )
 
-                pk_cols = [f"[{c}]" for c in columns_to_update]
-                index_name = f"IX_{temp_table_name.replace('#','')}_PK"
-                create_index_sql = f"CREATE CLUSTERED INDEX {index_name} ON {temp_table_name}({', '.join(pk_cols)});"
-                self.db.execute_query(create_index_sql)
-
-                insert_cols_str = ", ".join(pk_cols)
-                insert_except_sql = f"""
-                INSERT INTO {table_name} ({insert_cols_str})
-                SELECT DISTINCT {insert_cols_str} FROM {temp_table_name}
-                EXCEPT
-                SELECT {insert_cols_str} FROM {table_name};
-                """
-                self.db.execute_query(insert_except_sql)
-                logger.info(
-                    f"INSERT...EXCEPT operation for dimension {table_name} completed."
-                )
+                    pk_cols = [quote(c) for c in columns_to_update]
+                    index_name = f"IX_{temp_table_name.replace('#','')}_PK"
+                    create_index_sql = backend.create_index_sql(
+                        index_name, temp_table_name, columns_to_update, clustered=True
+                    )
+                    if create_index_sql:
+                        self.db.execute_query(create_index_sql)
 
-            else:
-                logger.info(f"Optimizing and merging data for {table_name}...")
-
-                index_name = f"IX_{temp_table_name.replace('#','')}"
-                create_index_sql = f"CREATE UNIQUE CLUSTERED INDEX {index_name} ON {temp_table_name}([{business_key_col}]);"
-                self.db.execute_query(create_index_sql)
-                logger.info(f"Index created on temporary table for {table_name}.")
-
-                update_clause = ""
-                if columns_to_update:
-                    update_set = ", ".join(
-                        [
-                            f"Target.[{col}] = Source.[{col}]"
-                            for col in columns_to_update
-                        ]
+                    insert_cols_str = ", ".join(pk_cols)
+                    insert_except_sql = f"""
+                    INSERT INTO {table_name} ({insert_cols_str})
+                    SELECT DISTINCT {insert_cols_str} FROM {temp_table_name}
+                    EXCEPT
+                    SELECT {insert_cols_str} FROM {table_name};
+                    """
+                    self.db.execute_query(insert_except_sql)
+                    logger.info(
+                        f"INSERT...EXCEPT operation for dimension {table_name} completed."
                     )
-                    update_clause = f"WHEN MATCHED THEN UPDATE SET {update_set}"
-
-                insert_cols_list = [business_key_col] + columns_to_update
-                insert_cols = ", ".join([f"[{c}]" for c in insert_cols_list])
-                source_cols = ", ".join([f"Source.[{c}]" for c in insert_cols_list])
-
-                merge_sql = f"""
-                MERGE {table_name} AS Target
-                USING {temp_table_name} AS Source
-                ON Target.[{business_key_col}] = Source.[{business_key_col}]
-                {update_clause}
-                WHEN NOT MATCHED BY Target THEN
-                    INSERT ({insert_cols})
-                    VALUES ({source_cols});
-                """
-                self.db.execute_query(merge_sql)
-                logger.info(f"MERGE operation for dimension {table_name} completed.")
+
+                else:
+                    logger.info(f"Optimizing and merging data for {table_name}...")
+
+                    index_name = f"IX_{temp_table_name.replace('#','')}"
+                    create_index_sql = backend.create_index_sql(
+                        index_name,
+                        temp_table_name,
+                        [business_key_col],
+                        unique=True,
+                        clustered=True,
+                    )
+                    if create_index_sql:
+                        self.db.execute_query(create_index_sql)
+                        logger.info(
+                            f"Index created on temporary table for {table_name}."
+                        )
+
+                    for upsert_sql in backend.upsert_sql(
+                        table_name, temp_table_name, business_key_col, columns_to_update
+                    ):
+                        self.db.execute_query(upsert_sql)
+                    logger.info(
+                        f"MERGE operation for dimension {table_name} completed."
+                    )
+
+            if (
+                business_key_col is not None
+                and self._tracks_delta(table_name)
+                and self.dimension_delta == "cache"
+            ):
+                # Only once the MERGE is committed
+                HashStore(f"dw:{table_name}").set_many(changed_hashes)
 
         except Exception as e:
             logger.error(
@@ -191,8 +649,9 @@ class LoadDwService:
     ) -> pd.DataFrame:
         table_name = dim_table
         placeholders = ", ".join(["?"] * len(business_keys))
+        bk, sk = self.db.backend.quote(bk_column), self.db.backend.quote(sk_column)
 
-        query = f"SELECT DISTINCT [{bk_column}] as bk, [{sk_column}] as sk FROM {table_name} WHERE [{bk_column}] IN ({placeholders})"
+        query = f"SELECT DISTINCT {bk} as bk, {sk} as sk FROM {table_name} WHERE {bk} IN ({placeholders})"
         results = self.db.fetch_all(query, business_keys)
 
         if results:
@@ -202,153 +661,411 @@ class LoadDwService:
 
         return pd.DataFrame(columns=[bk_column, sk_column])
 
-    def _load_fact_tickets(self, df: pd.DataFrame):
-        fact_table = "Fact_Tickets"
-        temp_fact_table = "##Fact_Tickets_temp"
-        logger.info(
-            f"Starting load for fact table {fact_table}. Total of {len(df)} records."
+    def _stage_fact_with_client_keys(
+        self, df: pd.DataFrame, temp_fact_table: str, shared: bool = False
+    ) -> List[str]:
+        """
+        Fetches the surrogate keys of every dimension, merges them into the
+        fact rows in pandas and inserts the result into the temp fact table.
+        Returns its columns, or an empty list when no row has its keys.
+        """
+        backend = self.db.backend
+        quote = backend.quote
+        df_with_keys = df.copy()
+
+        for dim_table, bk_col_df, bk_col_db, sk_to_fetch in FACT_KEY_LOOKUPS:
+            unique_bks = df_with_keys[bk_col_df].dropna().unique().tolist()
+            if not unique_bks:
+                df_with_keys[sk_to_fetch] = pd.NA
+                continue
+
+            keys_df = self._get_surrogate_keys_bulk(
+                dim_table, bk_col_db, sk_to_fetch, unique_bks
+            )
+
+            if not keys_df.empty:
+                df_with_keys[bk_col_df] = df_with_keys[bk_col_df].astype(str)
+                keys_df[bk_col_db] = keys_df[bk_col_db].astype(str)
+                df_with_keys = pd.merge(
+                    df_with_keys,
+                    keys_df,
+                    left_on=bk_col_df,
+                    right_on=bk_col_db,
+                    how="left",
+                )
+                df_with_keys.drop(columns=[bk_col_db], inplace=True, errors="ignore")
+            else:
+                df_with_keys[sk_to_fetch] = pd.NA
+
+        bk_cols_to_drop = [lkp[1] for lkp in FACT_KEY_LOOKUPS]
+        df_with_keys.drop(columns=bk_cols_to_drop, inplace=True, errors="ignore")
+        df_with_keys.dropna(subset=["TicketKey", "UserKey"], inplace=True)
+
+        if df_with_keys.empty:
+            return []
+
+        df_to_insert = df_with_keys[
+            [col for col in self._fact_columns() if col in df_with_keys.columns]
+        ].copy()
+
+        cols_with_types = []
+        for col in df_to_insert.columns:
+            cols_with_types.append(f"{quote(col)} {fact_column_type(col)}")
+
+        create_temp_table_sql = backend.create_temp_table_sql(
+            temp_fact_table, ", ".join(cols_with_types), shared=shared
         )
+        self.db.execute_query(f"DROP TABLE IF EXISTS {temp_fact_table}")
+        self.db.execute_query(create_temp_table_sql)
 
-        try:
-            lookups = [
-                ("Dim_Users", "UserId_BK", "UserId_BK", "UserKey"),
-                ("Dim_Agents", "AgentId_BK", "AgentId_BK", "AgentKey"),
-                ("Dim_Companies", "CompanyId_BK", "CompanyId_BK", "CompanyKey"),
-                ("Dim_Categories", "CategoryId_BK", "CategoryId_BK", "CategoryKey"),
-                ("Dim_Priorities", "PriorityId_BK", "PriorityId_BK", "PriorityKey"),
-                ("Dim_Status", "StatusId_BK", "StatusId_BK", "StatusKey"),
-                ("Dim_Products", "ProductId_BK", "ProductId_BK", "ProductKey"),
-                ("Dim_Tags", "TagId_BK", "TagId_BK", "TagKey"),
-                ("Dim_Channel", "Channel_BK", "ChannelName", "ChannelKey"),
-            ]
+        if not df_to_insert.empty:
+            logger.info(
+                f"Starting optimized bulk insert of {len(df_to_insert)} records..."
+            )
 
-            df_with_keys = df.copy()
+            self._insert_frame(temp_fact_table, df_to_insert, dw_table="Fact_Tickets")
+            logger.info("Bulk insert completed.")
+        return list(df_to_insert.columns)
 
-            for dim_table, bk_col_df, bk_col_db, sk_to_fetch in lookups:
-                unique_bks = df_with_keys[bk_col_df].dropna().unique().tolist()
-                if not unique_bks:
-                    df_with_keys[sk_to_fetch] = pd.NA
-                    continue
+    def _stage_fact_with_server_keys(
+        self, df: pd.DataFrame, temp_fact_table: str, shared: bool = False
+    ) -> List[str]:
+        """
+        Stages the fact rows with their business keys as text, then fills the
+        temp fact table with a single INSERT...SELECT joining every dimension
+        on the server, so no key travels back to Python. Returns its columns.
+        """
+        backend = self.db.backend
+        quote = backend.quote
+        stage_table = backend.temp_table_name("Fact_Tickets_bk")
 
-                keys_df = self._get_surrogate_keys_bulk(
-                    dim_table, bk_col_db, sk_to_fetch, unique_bks
-                )
+        surrogate_keys = [lookup[3] for lookup in FACT_KEY_LOOKUPS]
+        fact_columns = [
+            col
+            for col in self._fact_columns()
+            if col in surrogate_keys or col in df.columns
+        ]
+        passthrough = [col for col in fact_columns if col not in surrogate_keys]
+        business_keys = [
+            lookup[1] for lookup in FACT_KEY_LOOKUPS if lookup[1] in df.columns
+        ]
 
-                if not keys_df.empty:
-                    df_with_keys[bk_col_df] = df_with_keys[bk_col_df].astype(str)
-                    keys_df[bk_col_db] = keys_df[bk_col_db].astype(str)
-                    df_with_keys = pd.merge(
-                        df_with_keys,
-                        keys_df,
-                        left_on=bk_col_df,
-                        right_on=bk_col_db,
-                        how="left",
-                    )
-                    df_with_keys.drop(
-                        columns=[bk_col_db], inplace=True, errors="ignore"
-                    )
-                else:
-                    df_with_keys[sk_to_fetch] = pd.NA
-
-            bk_cols_to_drop = [lkp[1] for lkp in lookups]
-            df_with_keys.drop(columns=bk_cols_to_drop, inplace=True, errors="ignore")
-            df_with_keys.dropna(subset=["TicketKey", "UserKey"], inplace=True)
-
-            if df_with_keys.empty:
-                logger.info("No valid fact record to load.")
-                return
-
-            final_columns = [
-                "TicketKey",
-                "UserKey",
-                "AgentKey",
-                "CompanyKey",
-                "CategoryKey",
-                "PriorityKey",
-                "StatusKey",
-                "ProductKey",
-                "TagKey",
-                "ChannelKey",
-                "EntryDateKey",
-                "ClosedDateKey",
-                "FirstResponseDateKey",
-                "QtTickets",
-            ]
-            df_to_insert = df_with_keys[
-                [col for col in final_columns if col in df_with_keys.columns]
-            ].copy()
+        stage_ddl = [f"{quote(c)} {fact_column_type(c)}" for c in passthrough] + [
+            f"{quote(c)} {backend.business_key_type}" for c in business_keys
+        ]
+        fact_ddl = [f"{quote(c)} {fact_column_type(c)}" for c in fact_columns]
 
-            cols_with_types = []
-            for col in df_to_insert.columns:
-                dtype = "BIGINT" if "Key" in col else "INT"
-                cols_with_types.append(f"[{col}] {dtype}")
+        self.db.execute_query(f"DROP TABLE IF EXISTS {stage_table}")
+        self.db.execute_query(
+            backend.create_temp_table_sql(stage_table, ", ".join(stage_ddl))
+        )
+        df_stage = pd.DataFrame(
+            {
+                **{c: df[c] for c in passthrough},
+                **{
+                    # Same text the dimensions were loaded with
+                    c: df[c].astype(str).astype(object).where(df[c].notna(), None)
+                    for c in business_keys
+                },
+            }
+        )
+        logger.info(f"Staging {len(df_stage)} fact rows with business keys...")
+        self._insert_frame(stage_table, df_stage, dw_table="Fact_Tickets")
 
-            create_temp_table_sql = (
-                f"CREATE TABLE {temp_fact_table} ({', '.join(cols_with_types)})"
+        self.db.execute_query(f"DROP TABLE IF EXISTS {temp_fact_table}")
+        self.db.execute_query(
+            backend.create_temp_table_sql(
+                temp_fact_table, ", ".join(fact_ddl), shared=shared
             )
-            self.db.execute_query(f"DROP TABLE IF EXISTS {temp_fact_table}")
-            self.db.execute_query(create_temp_table_sql)
+        )
 
-            if not df_to_insert.empty:
-                logger.info(
-                    f"Starting optimized bulk insert of {len(df_to_insert)} records..."
+        joins = []
+        select_list = {c: f"Source.{quote(c)}" for c in passthrough}
+        for index, (dim_table, bk_col_df, bk_col_db, sk) in enumerate(FACT_KEY_LOOKUPS):
+            alias = f"d{index}"
+            select_list[sk] = f"{alias}.{quote(sk)}"
+            if bk_col_df not in business_keys:
+                select_list[sk] = "NULL"
+                continue
+            joins.append(
+                f"""
+                LEFT JOIN (
+                    SELECT DISTINCT
+                        CAST({quote(bk_col_db)} AS {backend.business_key_type}) AS bk,
+                        {quote(sk)}
+                    FROM {dim_table}
+                ) AS {alias} ON {alias}.bk = Source.{quote(bk_col_df)}"""
+            )
+
+        insert_cols = ", ".join(quote(c) for c in fact_columns)
+        select_cols = ", ".join(select_list[c] for c in fact_columns)
+        self.db.execute_query(
+            f"""
+            INSERT INTO {temp_fact_table} ({insert_cols})
+            SELECT {select_cols}
+            FROM {stage_table} AS Source{"".join(joins)}
+            WHERE Source.{quote("TicketKey")} IS NOT NULL
+                AND {select_list["UserKey"]} IS NOT NULL
+            """
+        )
+        logger.info("Surrogate keys resolved on the server.")
+        # Runs inside the staging transaction: on failure its rollback drops
+        # the stage table
+        self.db.execute_query(f"DROP TABLE IF EXISTS {stage_table}")
+        return fact_columns
+
+    def _fact_merge_sql(
+        self,
+        backend,
+        source: str,
+        merge_on_clause: str,
+        fact_columns: List[str],
+    ) -> List[str]:
+        """
+        Statements merging the staged fact rows of `source` into Fact_Tickets,
+        matched by ticket and tag. In upsert mode the rows whose RowHash
+        changed are updated first, and the rows of a staged ticket whose tag
+        is no longer staged are deleted.
+        """
+        statements = []
+        if self.fact_load_mode == "upsert":
+            quote = backend.quote
+            row_hash = quote(ROW_HASH_COLUMN)
+            statements.extend(
+                backend.update_changed_sql(
+                    "Fact_Tickets",
+                    source,
+                    merge_on_clause,
+                    [c for c in fact_columns if c not in ("TicketKey", "TagKey")],
+                    f"Target.{row_hash} IS NULL OR Target.{row_hash} <> Source.{row_hash}",
                 )
+            )
+            statements.extend(
+                backend.delete_missing_sql(
+                    "Fact_Tickets", source, "TicketKey", merge_on_clause
+                )
+            )
+        statements.extend(
+            backend.insert_missing_sql(
+                "Fact_Tickets", source, merge_on_clause, fact_columns
+            )
+        )
+        return statements
 
-                def to_native(val):
-                    if pd.isna(val):
-                        return None
-                    if hasattr(val, "item"):
-                        return val.item()
-                    return val
-
-                data_to_insert = [
-                    tuple(to_native(x) for x in row)
-                    for row in df_to_insert.itertuples(index=False, name=None)
-                ]
-                cols_str = ", ".join([f"[{c}]" for c in df_to_insert.columns])
-                placeholders = ", ".join(["?"] * len(df_to_insert.columns))
-                insert_sql = f"INSERT INTO {temp_fact_table} ({cols_str}) VALUES ({placeholders})"
-
-                self.db.cursor.fast_executemany = True
-                self.db.cursor.executemany(insert_sql, data_to_insert)
-                self.db.connection.commit()
-                self.db.cursor.fast_executemany = False
-                logger.info("Bulk insert completed.")
-
-            logger.info("Optimizing temporary table for MERGE operation...")
-            index_name = f"IX_{temp_fact_table.replace('#','')}"
-            self.db.execute_query(
-                f"CREATE INDEX {index_name} ON {temp_fact_table}([TicketKey], [TagKey]);"
+    def _fact_merge_ranges(self, df: pd.DataFrame) -> List[tuple]:
+        """
+        Splits the fact rows into TicketKey or EntryDateKey month ranges of
+        ETL_FACT_MERGE_RANGE_SIZE. Returns (label, condition on the staged
+        table, content hash) per range; the hash sums the row hashes, so it
+        does not depend on the row order.
+        """
+        quote = self.db.backend.quote
+        size = self.fact_merge_range_size
+        if self.fact_merge_partition == "ticket":
+            column = "TicketKey"
+            values = pd.to_numeric(df[column], errors="coerce")
+            partitions = values // size
+        else:
+            column = "EntryDateKey"
+            values = pd.to_numeric(df[column], errors="coerce")
+            months = values // 10000 * 12 + values // 100 % 100 - 1
+            partitions = months // size
+
+        missing = np.iinfo(np.int64).min
+        partitions = partitions.fillna(missing).astype("int64").to_numpy()
+        row_hash = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        order = np.argsort(partitions, kind="stable")
+        ids, starts = np.unique(partitions[order], return_index=True)
+        # uint64 sums wrap around, which keeps them order-independent
+        content_hashes = np.add.reduceat(row_hash[order], starts)
+
+        ranges = []
+        for partition, content_hash in zip(ids.tolist(), content_hashes.tolist()):
+            if partition == missing:
+                if self.fact_merge_partition == "ticket":
+                    # Rows without a ticket are not loaded
+                    continue
+                label, condition = "null", f"{quote(column)} IS NULL"
+            else:
+                first, last = partition * size, partition * size + size - 1
+                if self.fact_merge_partition == "month":
+                    first = first // 12 * 10000 + (first % 12 + 1) * 100
+                    last = last // 12 * 10000 + (last % 12 + 1) * 100 + 99
+                label = f"{first}-{last}"
+                condition = f"{quote(column)} BETWEEN {first} AND {last}"
+            ranges.append(
+                (
+                    f"{self.fact_merge_partition}:{label}",
+                    condition,
+                    f"{content_hash:016x}",
+                )
             )
-            logger.info("Index created on temporary fact table.")
+        return ranges
 
-            cols_str = ", ".join([f"[{c}]" for c in df_to_insert.columns])
-            source_cols_str = ", ".join([f"Source.[{c}]" for c in df_to_insert.columns])
-            merge_on_clause = """
-            (Target.[TicketKey] = Source.[TicketKey]) AND
-            (Target.[TagKey] = Source.[TagKey] OR (Target.[TagKey] IS NULL AND Source.[TagKey] IS NULL))
-            """
+    def _merge_fact_range(
+        self,
+        db: DBConnector,
+        temp_fact_table: str,
+        merge_on_clause: str,
+        fact_columns: List[str],
+        condition: str,
+    ):
+        """Merges the staged rows matching `condition` in one transaction."""
+        source = f"(SELECT * FROM {temp_fact_table} WHERE {condition})"
+        with db.transaction():
+            for merge_sql in self._fact_merge_sql(
+                db.backend, source, merge_on_clause, fact_columns
+            ):
+                db.execute_query(merge_sql)
+
+    def _merge_fact_range_on_pooled_connection(self, *args):
+        """Runs one range MERGE on a connection borrowed from the pool."""
+        with self.connection_pool.connection() as db:
+            identity_on_sql = db.backend.identity_insert_sql("Fact_Tickets", True)
+            if identity_on_sql:
+                db.execute_query(identity_on_sql)
+            try:
+                self._merge_fact_range(db, *args)
+            finally:
+                if identity_on_sql:
+                    db.execute_query(
+                        db.backend.identity_insert_sql("Fact_Tickets", False)
+                    )
+
+    def _merge_fact_in_ranges(
+        self,
+        df: pd.DataFrame,
+        temp_fact_table: str,
+        merge_on_clause: str,
+        fact_columns: List[str],
+        concurrent: bool,
+    ):
+        """
+        Merges the staged fact one range at a time, each in its own
+        transaction, on up to ETL_FACT_MERGE_WORKERS pooled connections when
+        `concurrent`. Committed ranges are recorded in the hash store with
+        their content hash until every range is merged, so a rerun of the
+        same rows after a failure resumes after them.
+        """
+        ranges = self._fact_merge_ranges(df)
+        committed_ranges = HashStore(f"dw:Fact_Tickets:{self.fact_merge_partition}")
+        committed = committed_ranges.get_many(label for label, _, _ in ranges)
+        pending = [r for r in ranges if committed.get(r[0]) != r[2]]
+        logger.info(
+            f"Merging {len(pending)} {self.fact_merge_partition} ranges into "
+            f"Fact_Tickets; {len(ranges) - len(pending)} already committed."
+        )
 
-            merge_sql = f"""
-            MERGE {fact_table} AS Target
-            USING {temp_fact_table} AS Source
-                ON {merge_on_clause}
-            WHEN NOT MATCHED BY Target THEN
-                INSERT ({cols_str})
-                VALUES ({source_cols_str});
+        def merge(merge_range):
+            label, condition, content_hash = merge_range
+            args = (temp_fact_table, merge_on_clause, fact_columns, condition)
+            if concurrent:
+                self._merge_fact_range_on_pooled_connection(*args)
+            else:
+                self._merge_fact_range(self.db, *args)
+            committed_ranges.set_many({label: content_hash})
+            logger.info(f"Range {label} of Fact_Tickets committed.")
+
+        if not concurrent:
+            for merge_range in pending:
+                merge(merge_range)
+        else:
+            max_workers = min(self.fact_merge_workers, self.connection_pool.max_size)
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                futures = [pool.submit(merge, merge_range) for merge_range in pending]
+                for future in futures:
+                    future.result()
+
+        # The fact is loaded: a later run must merge its rows again, even if
+        # they did not change (e.g. after Fact_Tickets was emptied)
+        committed_ranges.clear()
+
+    def _load_fact_tickets(self, df: pd.DataFrame):
+        backend = self.db.backend
+        quote = backend.quote
+        fact_table = "Fact_Tickets"
+        # Ranges merged on pooled connections read the staged rows from other
+        # sessions, so they need a shared table of their own
+        shared = bool(
+            self.connection_pool
+            and self.fact_merge_partition != "none"
+            and self.fact_merge_workers > 1
+        )
+        temp_fact_name = "Fact_Tickets_temp"
+        if shared:
+            temp_fact_name = f"{temp_fact_name}_{uuid.uuid4().hex[:12]}"
+        temp_fact_table = backend.temp_table_name(temp_fact_name, shared=shared)
+        logger.info(
+            f"Starting load for fact table {fact_table}. Total of {len(df)} records."
+        )
+        df = df.assign(
+            **{
+                bk_col: integral_keys(df[bk_col])
+                for _, bk_col, _, _ in FACT_KEY_LOOKUPS
+                if bk_col in df.columns
+            }
+        )
+        if self.fact_load_mode == "upsert":
+            # Business keys stand for the surrogate keys they resolve to
+            df = df.assign(**{ROW_HASH_COLUMN: row_hashes(df, df.columns)})
+
+        try:
+            # The staged rows are committed before any MERGE starts, since
+            # range merges on pooled connections read them from other sessions
+            with self.db.transaction():
+                if self.fact_key_resolution == "server":
+                    fact_columns = self._stage_fact_with_server_keys(
+                        df, temp_fact_table, shared
+                    )
+                else:
+                    fact_columns = self._stage_fact_with_client_keys(
+                        df, temp_fact_table, shared
+                    )
+                if not fact_columns:
+                    logger.info("No valid fact record to load.")
+                    return
+
+                logger.info("Optimizing temporary table for MERGE operation...")
+                index_name = f"IX_{temp_fact_table.replace('#','')}"
+                create_index_sql = backend.create_index_sql(
+                    index_name, temp_fact_table, ["TicketKey", "TagKey"]
+                )
+                if create_index_sql:
+                    self.db.execute_query(create_index_sql)
+                    logger.info("Index created on temporary fact table.")
+
+            merge_on_clause = f"""
+            (Target.{quote("TicketKey")} = Source.{quote("TicketKey")}) AND
+            (Target.{quote("TagKey")} = Source.{quote("TagKey")} OR (Target.{quote("TagKey")} IS NULL AND Source.{quote("TagKey")} IS NULL))
             """
 
+            identity_on_sql = backend.identity_insert_sql(fact_table, True)
             try:
-                logger.info(f"Enabling IDENTITY_INSERT for {fact_table}...")
-                self.db.execute_query(f"SET IDENTITY_INSERT {fact_table} ON;")
+                if identity_on_sql:
+                    logger.info(f"Enabling IDENTITY_INSERT for {fact_table}...")
+                    self.db.execute_query(identity_on_sql)
 
-                logger.info(f"Executing MERGE operation for fact table {fact_table}...")
-                self.db.execute_query(merge_sql)
+                if self.fact_merge_partition != "none":
+                    self._merge_fact_in_ranges(
+                        df, temp_fact_table, merge_on_clause, fact_columns, shared
+                    )
+                else:
+                    logger.info(
+                        f"Executing MERGE operation for fact table {fact_table}..."
+                    )
+                    with self.db.transaction():
+                        for merge_sql in self._fact_merge_sql(
+                            backend, temp_fact_table, merge_on_clause, fact_columns
+                        ):
+                            self.db.execute_query(merge_sql)
                 logger.info(f"MERGE operation for fact table {fact_table} completed.")
 
             finally:
-                logger.info(f"Disabling IDENTITY_INSERT for {fact_table}...")
-                self.db.execute_query(f"SET IDENTITY_INSERT {fact_table} OFF;")
+                if identity_on_sql:
+                    logger.info(f"Disabling IDENTITY_INSERT for {fact_table}...")
+                    self.db.execute_query(
+                        backend.identity_insert_sql(fact_table, False)
+                    )
 
         except Exception as e:
             logger.error(
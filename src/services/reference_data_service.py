@@ -0,0 +1,293 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import aspectlib
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from config.aop_logging import log_execution
+from config.dotenv_loader import get_boolean_from_env
+from config.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class ReferenceTable:
+    key: str
+    source_tables: List[str]
+    query: str
+
+
+# Small lookup tables joined to the ticket rows in memory. Each query aliases
+# its key to the ticket column it matches.
+REFERENCE_TABLES = {
+    "companies": ReferenceTable(
+        key="company_id",
+        source_tables=["dbo.Companies"],
+        query="""
+        SELECT
+            c.CompanyId as company_id,
+            c.Name as company_name,
+            c.CNPJ as company_cnpj,
+            c.Segmento as company_segment
+        FROM dbo.Companies c
+        """,
+    ),
+    "users": ReferenceTable(
+        key="user_id",
+        source_tables=["dbo.Users"],
+        query="""
+        SELECT
+            u.UserId as user_id,
+            u.FullName as user_full_name,
+            u.Email as user_email,
+            u.Phone as user_phone,
+            u.CPF as user_cpf,
+            u.IsVIP as user_is_vip
+        FROM dbo.Users u
+        """,
+    ),
+    "agents": ReferenceTable(
+        key="agent_id",
+        source_tables=["dbo.Agents", "dbo.Departments"],
+        query="""
+        SELECT
+            a.AgentId as agent_id,
+            a.FullName as agent_full_name,
+            a.Email as agent_email,
+            d.Name as agent_department
+        FROM dbo.Agents a
+        LEFT JOIN dbo.Departments d ON a.DepartmentId = d.DepartmentId
+        """,
+    ),
+    "priorities": ReferenceTable(
+        key="priorityId",
+        source_tables=["dbo.Priorities"],
+        query="""
+        SELECT pe.PriorityId as priorityId, pe.Name as priority
+        FROM dbo.Priorities pe
+        """,
+    ),
+    "products": ReferenceTable(
+        key="product_id",
+        source_tables=["dbo.Products"],
+        query="""
+        SELECT
+            p.ProductId as product_id,
+            p.Name as product_name,
+            p.Code as product_code,
+            p.Description as product_description
+        FROM dbo.Products p
+        """,
+    ),
+    "statuses": ReferenceTable(
+        key="current_status",
+        source_tables=["dbo.Statuses"],
+        query="""
+        SELECT s.StatusId as current_status, s.Name as status_name
+        FROM dbo.Statuses s
+        """,
+    ),
+    "categories": ReferenceTable(
+        key="category_id",
+        source_tables=["dbo.Categories"],
+        query="""
+        SELECT cat.CategoryId as category_id, cat.Name as category_name
+        FROM dbo.Categories cat
+        """,
+    ),
+    "subcategories": ReferenceTable(
+        key="subcategory_id",
+        source_tables=["dbo.Subcategories"],
+        query="""
+        SELECT sub.SubcategoryId as subcategory_id, sub.Name as subcategory_name
+        FROM dbo.Subcategories sub
+        """,
+    ),
+    "sla_plans": ReferenceTable(
+        key="sla_plan",
+        source_tables=["dbo.SLA_Plans"],
+        query="""
+        SELECT
+            sla.SLAPlanId as sla_plan,
+            sla.Name as sla_plan_name,
+            sla.FirstResponseMins as sla_first_response_mins,
+            sla.ResolutionMins as sla_resolution_mins
+        FROM dbo.SLA_Plans sla
+        """,
+    ),
+}
+
+
+@dataclass
+class _CachedTable:
+    table: pa.Table
+    loaded_at: float
+    checksum: Optional[tuple]
+
+
+# Shared by every run of the process, so reference tables survive between
+# scheduled executions
+_cache: Dict[str, _CachedTable] = {}
+_cache_lock = threading.Lock()
+
+ROW_ORDER_COLUMN = "__row_order"
+
+
+class ReferenceDataService:
+    """
+    Loads the small reference tables (companies, users, agents, products...)
+    and joins them to narrow ticket rows in memory, so their columns are not
+    read from the source once per ticket.
+
+    Tables are kept in a process-wide cache. An entry younger than
+    ETL_REFERENCE_CACHE_TTL seconds is reused; an older one is revalidated by
+    checksum when ETL_REFERENCE_CACHE_CHECKSUM is enabled, or reloaded. A
+    ticket pointing to a key missing from a cached table reloads that table.
+    """
+
+    def __init__(self, db_connection):
+        """
+        Args:
+            db_connection: Instance of DBConnector class
+        """
+        self.db = db_connection
+        self.ttl_seconds = int(os.getenv("ETL_REFERENCE_CACHE_TTL", "0"))
+        self.use_checksum = bool(get_boolean_from_env("ETL_REFERENCE_CACHE_CHECKSUM"))
+
+        self.tables: Dict[str, pa.Table] = {}
+        self._loaded_this_run = set()
+
+    def _checksum(self, name: str) -> Optional[tuple]:
+        if not self.use_checksum:
+            return None
+
+        checksum_queries = [
+            self.db.backend.table_checksum_sql(table)
+            for table in REFERENCE_TABLES[name].source_tables
+        ]
+        if not all(checksum_queries):
+            return None
+
+        checksum = []
+        for query in checksum_queries:
+            results = self.db.fetch_all(query)
+            if not results:
+                return None
+            checksum.append(results[0][0])
+        return tuple(checksum)
+
+    def _is_fresh(self, name: str, cached: _CachedTable) -> bool:
+        if time.monotonic() - cached.loaded_at < self.ttl_seconds:
+            return True
+
+        if cached.checksum is not None and self._checksum(name) == cached.checksum:
+            cached.loaded_at = time.monotonic()
+            logger.info(f"Reference table '{name}' unchanged, reusing cache.")
+            return True
+        return False
+
+    def _load_table(self, name: str):
+        # The checksum is taken first, so a change made during the read is
+        # caught by the next validation
+        checksum = self._checksum(name)
+        table = self.db.fetch_table(REFERENCE_TABLES[name].query)
+
+        _cache[name] = _CachedTable(
+            table=table, loaded_at=time.monotonic(), checksum=checksum
+        )
+        self.tables[name] = table
+        self._loaded_this_run.add(name)
+        logger.info(f"Reference table '{name}' loaded with {table.num_rows} rows.")
+
+    def load(self):
+        """Validates or loads every reference table, once per run."""
+        if self.tables:
+            return
+
+        with _cache_lock:
+            for name in REFERENCE_TABLES:
+                cached = _cache.get(name)
+                if cached and self._is_fresh(name, cached):
+                    self.tables[name] = cached.table
+                else:
+                    self._load_table(name)
+
+    def _reference_for(self, name: str, keys: pa.ChunkedArray) -> pa.Table:
+        """
+        Returns the reference table, reloading a cached one when the tickets
+        point to keys it does not have yet (rows created since it was cached).
+        """
+        reference = self.tables[name]
+        if name in self._loaded_this_run:
+            return reference
+
+        known_keys = reference.column(REFERENCE_TABLES[name].key).combine_chunks()
+        missing = pc.and_(pc.is_valid(keys), pc.invert(pc.is_in(keys, known_keys)))
+        if pc.any(missing).as_py():
+            logger.info(f"Reference table '{name}' is missing keys, reloading.")
+            with _cache_lock:
+                self._load_table(name)
+        return self.tables[name]
+
+    @staticmethod
+    def _set_aside_null_columns(table: pa.Table, kept: List[str]):
+        """
+        Drops the null-typed columns (all NULL, from a backend that reports
+        no column types, e.g. SQLite) but `kept`, since Arrow joins reject
+        them. Returns the table and the names dropped.
+        """
+        names = [
+            field.name
+            for field in table.schema
+            if pa.types.is_null(field.type) and field.name not in kept
+        ]
+        return table.drop_columns(names), names
+
+    def enrich(self, tickets: pa.Table, columns: List[str]) -> pa.Table:
+        """
+        Left-joins the reference tables to narrow ticket rows with Arrow hash
+        joins, keeping the row order, and returns `columns` in that order.
+        """
+        if tickets.num_rows == 0:
+            return tickets
+
+        self.load()
+        join_keys = [
+            reference_table.key for reference_table in REFERENCE_TABLES.values()
+        ]
+        enriched, null_columns = self._set_aside_null_columns(tickets, join_keys)
+        enriched = enriched.append_column(
+            ROW_ORDER_COLUMN, pa.array(range(tickets.num_rows), pa.int64())
+        )
+        # Every key is cast before the first join, which would otherwise carry
+        # a null-typed key of a later table as a non-key field
+        for name, reference_table in REFERENCE_TABLES.items():
+            key = reference_table.key
+            key_type = self.tables[name].schema.field(key).type
+            if enriched.schema.field(key).type != key_type:
+                enriched = enriched.set_column(
+                    enriched.schema.get_field_index(key),
+                    key,
+                    enriched.column(key).cast(key_type),
+                )
+
+        for name, reference_table in REFERENCE_TABLES.items():
+            key = reference_table.key
+            reference, null_reference_columns = self._set_aside_null_columns(
+                self._reference_for(name, enriched.column(key)), [key]
+            )
+            null_columns.extend(null_reference_columns)
+            enriched = enriched.join(reference, keys=key, join_type="left outer")
+
+        enriched = enriched.sort_by(ROW_ORDER_COLUMN)
+        for column in null_columns:
+            enriched = enriched.append_column(column, pa.nulls(enriched.num_rows))
+        return enriched.select(columns)
+
+
+aspectlib.weave(ReferenceDataService, log_execution)
@@ -1,54 +1,275 @@
-from typing import Any, Dict, List
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Optional
 
 import aspectlib
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 from config.aop_logging import log_execution, setup_logger
+from config.dotenv_loader import get_boolean_from_env
+from utils.calendar_keys import date_keys, time_keys
+from utils.columnar import as_datetime, to_frame
+from utils.memory_usage import track_peak_rss
+from utils.shared_arrow import SharedArrowTable
 
 logger = setup_logger(__name__)
 
+# Fact date columns and the key columns they are resolved to
+FACT_DATE_KEYS = [
+    ("created_at", "EntryDateKey", "EntryTimeKey"),
+    ("closed_at", "ClosedDateKey", "ClosedTimeKey"),
+    ("first_response_at", "FirstResponseDateKey", "FirstResponseTimeKey"),
+]
+
+# Low-cardinality source columns read as categoricals in memory-lean mode
+LEAN_CATEGORICAL_COLUMNS = [
+    "channel",
+    "status_name",
+    "priority",
+    "agent_department",
+    "company_segment",
+    "category_name",
+    "subcategory_name",
+]
+
+# Ticket columns read by each builder, so a worker process only converts those
+TICKET_COLUMNS = {
+    "Dim_Dates": ["first_response_at", "created_at", "closed_at"],
+    "Dim_Companies": ["company_id", "company_name", "company_segment", "company_cnpj"],
+    "Dim_Users": ["user_id", "user_full_name", "user_is_vip"],
+    "Dim_Agents": ["agent_id", "agent_full_name", "agent_department"],
+    "Dim_Products": ["product_id", "product_name", "product_code"],
+    "Dim_Categories": ["category_id", "category_name", "subcategory_name"],
+    "Dim_Status": ["current_status", "status_name"],
+    "Dim_Priorities": ["priorityId", "priority"],
+    "Dim_Tags": [],
+    "Dim_Channel": ["channel"],
+    "Fact_Tickets": [
+        "ticket_id",
+        "user_id",
+        "agent_id",
+        "company_id",
+        "category_id",
+        "priorityId",
+        "current_status",
+        "product_id",
+        "channel",
+        "created_at",
+        "closed_at",
+        "first_response_at",
+    ],
+}
+
+
+def _build_table_in_worker(
+    table_name: str,
+    tickets: SharedArrowTable,
+    tags: SharedArrowTable,
+    dim_dates: pd.DataFrame = None,
+) -> pd.DataFrame:
+    """Builds one dimension or the fact table in a pool worker process."""
+    service = TransformDwService()
+    with service._copy_on_write(), track_peak_rss(
+        f"DW transform: {table_name}", service.memory_lean
+    ):
+        tickets_df, tags_data = service._read_frames(
+            tickets.read(TICKET_COLUMNS[table_name]), tags.read()
+        )
+        if table_name == "Fact_Tickets":
+            result = service._create_fact_tickets(tickets_df, tags_data, dim_dates)
+        else:
+            build, source = service._builders()[table_name]
+            result = build(tickets_df if source == "tickets" else tags_data)
+
+    del tickets_df, tags_data
+    tickets.close()
+    tags.close()
+    return result
+
 
 class TransformDwService:
-    def transform(self, extracted_data: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
-        tickets_df = pd.DataFrame(extracted_data.get("tickets", []))
-        if tickets_df.empty:
-            return {}
+    def __init__(self):
+        # minute: per-batch Dim_Dates keyed by row; calendar: pre-populated
+        # Dim_Date/Dim_Time with YYYYMMDD and HHMM keys
+        self.date_dimension = os.getenv("ETL_DATE_DIMENSION", "minute").lower()
+        if self.date_dimension not in ("minute", "calendar"):
+            raise ValueError(
+                f"Unsupported ETL_DATE_DIMENSION '{self.date_dimension}'. "
+                "Expected 'minute' or 'calendar'."
+            )
 
-        tags_data = extracted_data.get("tags", {})
-
-        dim_dates = self._create_dim_dates(tickets_df)
-        dim_companies = self._create_dim_companies(tickets_df)
-        dim_users = self._create_dim_users(tickets_df)
-        dim_agents = self._create_dim_agents(tickets_df)
-        dim_products = self._create_dim_products(tickets_df)
-        dim_categories = self._create_dim_categories(tickets_df)
-        dim_status = self._create_dim_status(tickets_df)
-        dim_priorities = self._create_dim_priorities(tickets_df)
-        dim_tags = self._create_dim_tags(tags_data)
-        dim_channel = self._create_dim_channel(tickets_df)
-
-        fact_tickets = self._create_fact_tickets(tickets_df, tags_data, dim_dates)
-
-        return {
-            "Dim_Dates": dim_dates,
-            "Dim_Companies": dim_companies,
-            "Dim_Users": dim_users,
-            "Dim_Agents": dim_agents,
-            "Dim_Products": dim_products,
-            "Dim_Categories": dim_categories,
-            "Dim_Status": dim_status,
-            "Dim_Priorities": dim_priorities,
-            "Dim_Tags": dim_tags,
-            "Dim_Channel": dim_channel,
-            "Fact_Tickets": fact_tickets,
+        # Categorical and nullable integer columns, copy-on-write (while the
+        # tables are built) instead of defensive copies, and the peak RSS of
+        # every stage in the logs
+        self.memory_lean = bool(get_boolean_from_env("ETL_TRANSFORM_MEMORY_LEAN"))
+
+        # More than one: dimensions and fact are built in a process pool
+        self.workers = int(os.getenv("ETL_TRANSFORM_WORKERS", "1"))
+
+    def _copy_on_write(self):
+        """
+        Enables pandas copy-on-write while the tables are built in lean mode,
+        leaving the option of the rest of the process untouched.
+        """
+        if self.memory_lean:
+            return pd.option_context("mode.copy_on_write", True)
+        return nullcontext()
+
+    def _select(self, df: pd.DataFrame, columns) -> pd.DataFrame:
+        """
+        Columns of a dimension. Under copy-on-write the selection is a lazy
+        copy, so it is only copied eagerly when that mode is off.
+        """
+        if self.memory_lean:
+            return df[columns]
+        return df[columns].copy()
+
+    def _read_frames(self, tickets, tags):
+        tickets_df = to_frame(
+            tickets,
+            categories=LEAN_CATEGORICAL_COLUMNS if self.memory_lean else None,
+            nullable_ints=self.memory_lean,
+        )
+        tags_data = to_frame(tags, nullable_ints=self.memory_lean)
+        return tickets_df, tags_data
+
+    def _builders(self):
+        """Dimension builders by table, with the extraction they read from."""
+        builders = {
+            "Dim_Companies": (self._create_dim_companies, "tickets"),
+            "Dim_Users": (self._create_dim_users, "tickets"),
+            "Dim_Agents": (self._create_dim_agents, "tickets"),
+            "Dim_Products": (self._create_dim_products, "tickets"),
+            "Dim_Categories": (self._create_dim_categories, "tickets"),
+            "Dim_Status": (self._create_dim_status, "tickets"),
+            "Dim_Priorities": (self._create_dim_priorities, "tickets"),
+            "Dim_Tags": (self._create_dim_tags, "tags"),
+            "Dim_Channel": (self._create_dim_channel, "tickets"),
         }
+        if self.date_dimension == "minute":
+            builders = {"Dim_Dates": (self._create_dim_dates, "tickets"), **builders}
+        return builders
+
+    def transform(
+        self,
+        extracted_data: Dict[str, Any],
+        staged: Optional[Dict[str, pd.DataFrame]] = None,
+        on_table_built: Optional[Callable[[str, pd.DataFrame], None]] = None,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Builds the dimensions and the fact table of an extraction.
+
+        Args:
+            staged: Tables already built from this extraction (by an
+                interrupted run), returned as they are instead of rebuilt.
+            on_table_built: Called with the name and frame of each table as
+                soon as it is built.
+        """
+        tickets = extracted_data.get("tickets")
+        if tickets is None or len(tickets) == 0:
+            return {}
+        staged = dict(staged or {})
+        table_names = [*self._builders(), "Fact_Tickets"]
+        if all(table_name in staged for table_name in table_names):
+            return {table_name: staged[table_name] for table_name in table_names}
+        if self.workers > 1:
+            return self._transform_in_pool(extracted_data, staged, on_table_built)
+
+        with self._copy_on_write():
+            with track_peak_rss("DW transform: read extraction", self.memory_lean):
+                tickets_df, tags_data = self._read_frames(
+                    tickets, extracted_data.get("tags")
+                )
+
+            transformed = staged
+            sources = {"tickets": tickets_df, "tags": tags_data}
+            for table_name, (build, source) in self._builders().items():
+                if table_name in staged:
+                    continue
+                with track_peak_rss(f"DW transform: {table_name}", self.memory_lean):
+                    transformed[table_name] = build(sources[source])
+                if on_table_built:
+                    on_table_built(table_name, transformed[table_name])
+
+            if "Fact_Tickets" not in staged:
+                with track_peak_rss("DW transform: Fact_Tickets", self.memory_lean):
+                    transformed["Fact_Tickets"] = self._create_fact_tickets(
+                        tickets_df, tags_data, transformed.get("Dim_Dates")
+                    )
+                if on_table_built:
+                    on_table_built("Fact_Tickets", transformed["Fact_Tickets"])
+            return {table_name: transformed[table_name] for table_name in table_names}
+
+    def _transform_in_pool(
+        self,
+        extracted_data: Dict[str, Any],
+        staged: Dict[str, pd.DataFrame],
+        on_table_built: Optional[Callable[[str, pd.DataFrame], None]],
+    ):
+        """
+        Builds every dimension and the fact table that is not `staged`
+        concurrently on ETL_TRANSFORM_WORKERS processes. The extraction is
+        placed once in shared memory as Arrow IPC, and each worker maps the
+        columns it needs. The fact table is submitted once Dim_Dates is built
+        (minute mode).
+        """
+        shared = [
+            SharedArrowTable(self._as_arrow(extracted_data.get("tickets"))),
+            SharedArrowTable(self._as_arrow(extracted_data.get("tags"))),
+        ]
+        # forkserver starts workers from a clean process: forking this one
+        # would copy the locks held by its logging and connection threads
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            # Imported once by the server instead of by every worker
+            context.set_forkserver_preload([__name__])
+        else:
+            context = multiprocessing.get_context("spawn")
+        logger.info(f"Building DW tables on {self.workers} worker processes...")
+        try:
+            with ProcessPoolExecutor(self.workers, mp_context=context) as pool:
+                futures = {
+                    table_name: pool.submit(_build_table_in_worker, table_name, *shared)
+                    for table_name in self._builders()
+                    if table_name not in staged
+                }
+                dim_dates = staged.get("Dim_Dates")
+                if "Dim_Dates" in futures:
+                    dim_dates = futures["Dim_Dates"].result()
+                if "Fact_Tickets" not in staged:
+                    futures["Fact_Tickets"] = pool.submit(
+                        _build_table_in_worker, "Fact_Tickets", *shared, dim_dates
+                    )
+
+                transformed = staged
+                for table_name, future in futures.items():
+                    transformed[table_name] = future.result()
+                    if on_table_built:
+                        on_table_built(table_name, transformed[table_name])
+                return {
+                    table_name: transformed[table_name]
+                    for table_name in [*self._builders(), "Fact_Tickets"]
+                }
+        finally:
+            for table in shared:
+                table.unlink()
+
+    @staticmethod
+    def _as_arrow(data) -> pa.Table:
+        if isinstance(data, pa.Table):
+            return data
+        return pa.Table.from_pandas(to_frame(data), preserve_index=False)
 
     def _create_dim_dates(self, df: pd.DataFrame) -> pd.DataFrame:
         date_cols = ["first_response_at", "created_at", "closed_at"]
         dim_prep = pd.DataFrame()
         for col in date_cols:
             if col in df.columns:
-                temp = df[[col]].copy()
+                temp = self._select(df, [col])
                 temp = temp.rename(columns={col: "datetime"})
                 dim_prep = pd.concat([dim_prep, temp], ignore_index=True)
         dim_prep = (
@@ -57,7 +278,7 @@ class TransformDwService:
             .reset_index(drop=True)
         )
 
-        dim_prep["datetime"] = pd.to_datetime(dim_prep["datetime"], errors="coerce")
+        dim_prep["datetime"] = as_datetime(dim_prep["datetime"])
         dim_prep = dim_prep.dropna(subset=["datetime"]).reset_index(drop=True)
 
         dim_prep["Year"] = dim_prep["datetime"].dt.year
@@ -75,14 +296,14 @@ class TransformDwService:
         return dim
 
     def _create_dim_channel(self, df: pd.DataFrame) -> pd.DataFrame:
-        dim = df[["channel"]].copy().dropna().drop_duplicates()
+        dim = self._select(df, ["channel"]).dropna().drop_duplicates()
         dim.rename(columns={"channel": "ChannelName"}, inplace=True)
         return dim.reset_index(drop=True)
 
     def _create_dim_companies(self, df: pd.DataFrame) -> pd.DataFrame:
-        dim = df[
-            ["company_id", "company_name", "company_segment", "company_cnpj"]
-        ].copy()
+        dim = self._select(
+            df, ["company_id", "company_name", "company_segment", "company_cnpj"]
+        )
         dim.rename(
             columns={
                 "company_id": "CompanyId_BK",
@@ -95,7 +316,7 @@ class TransformDwService:
         return dim.drop_duplicates(subset=["CompanyId_BK"]).reset_index(drop=True)
 
     def _create_dim_users(self, df: pd.DataFrame) -> pd.DataFrame:
-        dim = df[["user_id", "user_full_name", "user_is_vip"]].copy()
+        dim = self._select(df, ["user_id", "user_full_name", "user_is_vip"])
         dim.rename(
             columns={
                 "user_id": "UserId_BK",
@@ -107,7 +328,7 @@ class TransformDwService:
         return dim.drop_duplicates(subset=["UserId_BK"]).reset_index(drop=True)
 
     def _create_dim_agents(self, df: pd.DataFrame) -> pd.DataFrame:
-        dim = df[["agent_id", "agent_full_name", "agent_department"]].copy()
+        dim = self._select(df, ["agent_id", "agent_full_name", "agent_department"])
         dim["IsActive"] = True
         dim.rename(
             columns={
@@ -120,7 +341,7 @@ class TransformDwService:
         return dim.drop_duplicates(subset=["AgentId_BK"]).reset_index(drop=True)
 
     def _create_dim_products(self, df: pd.DataFrame) -> pd.DataFrame:
-        dim = df[["product_id", "product_name", "product_code"]].copy()
+        dim = self._select(df, ["product_id", "product_name", "product_code"])
         dim["IsActive"] = True
         dim.rename(
             columns={
@@ -133,7 +354,7 @@ class TransformDwService:
         return dim.drop_duplicates(subset=["ProductId_BK"]).reset_index(drop=True)
 
     def _create_dim_categories(self, df: pd.DataFrame) -> pd.DataFrame:
-        dim = df[["category_id", "category_name", "subcategory_name"]].copy()
+        dim = self._select(df, ["category_id", "category_name", "subcategory_name"])
         dim.rename(
             columns={
                 "category_id": "CategoryId_BK",
@@ -145,7 +366,7 @@ class TransformDwService:
         return dim.drop_duplicates(subset=["CategoryId_BK"]).reset_index(drop=True)
 
     def _create_dim_status(self, df: pd.DataFrame) -> pd.DataFrame:
-        dim = df[["current_status", "status_name"]].copy()
+        dim = self._select(df, ["current_status", "status_name"])
         dim.rename(
             columns={"current_status": "StatusId_BK", "status_name": "Name"},
             inplace=True,
@@ -153,24 +374,24 @@ class TransformDwService:
         return dim.drop_duplicates(subset=["StatusId_BK"]).reset_index(drop=True)
 
     def _create_dim_priorities(self, df: pd.DataFrame) -> pd.DataFrame:
-        dim = df[["priorityId", "name"]].copy()
-        dim.rename(columns={"priorityId": "PriorityId_BK"}, inplace=True)
+        dim = self._select(df, ["priorityId", "priority"])
+        dim.rename(
+            columns={"priorityId": "PriorityId_BK", "priority": "name"}, inplace=True
+        )
+        dim = dim.drop_duplicates(subset=["PriorityId_BK"]).reset_index(drop=True)
         dim["name"] = dim["name"].astype(str)
-        return dim.drop_duplicates(subset=["PriorityId_BK"]).reset_index(drop=True)
-
-    def _create_dim_tags(self, tags_data: Dict[str, List[Dict]]) -> pd.DataFrame:
-        all_tags = {}
-        for ticket_tags in tags_data.values():
-            for tag_dict in ticket_tags:
-                tag_id = tag_dict.get("tag_id")
-                tag_name = tag_dict.get("tag_name")
-                if tag_id is not None:
-                    all_tags[tag_id] = tag_name
-
-        if not all_tags:
+        return dim
+
+    def _create_dim_tags(self, tags_data: pd.DataFrame) -> pd.DataFrame:
+        if tags_data.empty:
             df = pd.DataFrame(columns=["TagId_BK", "Name"])
         else:
-            df = pd.DataFrame(list(all_tags.items()), columns=["TagId_BK", "Name"])
+            df = (
+                tags_data[["tag_id", "tag_name"]]
+                .dropna(subset=["tag_id"])
+                .drop_duplicates(subset=["tag_id"], keep="last")
+                .rename(columns={"tag_id": "TagId_BK", "tag_name": "Name"})
+            )
 
         na_tag = pd.DataFrame([{"TagId_BK": "-1", "Name": "N/A"}])
 
@@ -180,97 +401,126 @@ class TransformDwService:
 
         return df
 
-    def _create_fact_tickets(
-        self,
-        df: pd.DataFrame,
-        tags_data: Dict[str, List[Dict]],
-        dim_dates: pd.DataFrame = None,
-    ) -> pd.DataFrame:
-        logger.info("Starting creation of fact table...")
-
-        ticket_to_tags_map = {
-            ticket_id: [tag.get("tag_id") for tag in tags]
-            for ticket_id, tags in tags_data.items()
-        }
-
-        df["TagId_BK_List"] = df["ticket_id"].astype(str).map(ticket_to_tags_map)
-        df["TagId_BK_List"] = df["TagId_BK_List"].apply(
-            lambda x: x if (isinstance(x, list) and x) else ["-1"]
+    def _ticket_tag_grain(self, df: pd.DataFrame, tags_data: pd.DataFrame):
+        """
+        Builds the ticket x tag grain as index arrays: for each fact row, the
+        position of its ticket in `df`, and its tag id as a categorical.
+        Tickets keep their order and their tags the order of `tags_data`; a
+        ticket without tags gets one row with the "-1" (N/A) tag.
+        """
+        n_tickets = len(df)
+        if tags_data.empty:
+            return np.arange(n_tickets), pd.Categorical(["-1"] * n_tickets)
+
+        ticket_ids = df["ticket_id"]
+        tag_ticket_ids = tags_data["ticket_id"]
+        if ticket_ids.dtype != tag_ticket_ids.dtype:
+            ticket_ids = ticket_ids.astype(str)
+            tag_ticket_ids = tag_ticket_ids.astype(str)
+
+        # One code per distinct ticket id, shared by both sides
+        codes, uniques = pd.factorize(
+            pd.concat([ticket_ids, tag_ticket_ids], ignore_index=True)
         )
+        ticket_codes, tag_codes = codes[:n_tickets], codes[n_tickets:]
 
-        fact_exploded = df.explode("TagId_BK_List").rename(
-            columns={"TagId_BK_List": "TagId_BK"}
-        )
+        tag_id_codes, tag_id_values = pd.factorize(tags_data["tag_id"])
+        if "-1" in tag_id_values:
+            na_tag_code = tag_id_values.get_loc("-1")
+        else:
+            na_tag_code = len(tag_id_values)
+            tag_id_values = tag_id_values.append(pd.Index(["-1"], dtype=object))
 
-        fact = fact_exploded[
-            [
-                "ticket_id",
-                "user_id",
-                "agent_id",
-                "company_id",
-                "category_id",
-                "priorityId",
-                "current_status",
-                "product_id",
-                "channel",
-                "TagId_BK",
-                "created_at",
-                "closed_at",
-                "first_response_at",
-            ]
-        ].copy()
-
-        fact.rename(
-            columns={
-                "ticket_id": "TicketKey",
-                "user_id": "UserId_BK",
-                "agent_id": "AgentId_BK",
-                "company_id": "CompanyId_BK",
-                "category_id": "CategoryId_BK",
-                "priorityId": "PriorityId_BK",
-                "current_status": "StatusId_BK",
-                "product_id": "ProductId_BK",
-                "channel": "Channel_BK",
-            },
-            inplace=True,
-        )
+        matched = tag_codes >= 0
+        tag_codes, tag_id_codes = tag_codes[matched], tag_id_codes[matched]
 
-        logger.info("Optimizing date key lookups...")
+        # Tags grouped by ticket code (stable, so each group keeps its order)
+        tag_order = np.argsort(tag_codes, kind="stable")
+        tags_per_code = np.bincount(tag_codes, minlength=len(uniques))
+        first_tag_of_code = np.cumsum(tags_per_code) - tags_per_code
 
-        dim_dates_with_key = dim_dates.reset_index().rename(
-            columns={"index": "DateKey"}
+        tags_per_ticket = np.where(ticket_codes >= 0, tags_per_code[ticket_codes], 0)
+        rows_per_ticket = np.maximum(tags_per_ticket, 1)
+        ticket_rows = np.repeat(np.arange(n_tickets), rows_per_ticket)
+
+        # Rank of each fact row among the rows of its ticket
+        first_row_of_ticket = np.cumsum(rows_per_ticket) - rows_per_ticket
+        rank = np.arange(len(ticket_rows)) - np.repeat(
+            first_row_of_ticket, rows_per_ticket
         )
 
-        for date_col_name, new_key_name in [
-            ("created_at", "EntryDateKey"),
-            ("closed_at", "ClosedDateKey"),
-            ("first_response_at", "FirstResponseDateKey"),
-        ]:
-            temp_dates = pd.to_datetime(fact[date_col_name], errors="coerce")
-            fact_date_parts = pd.DataFrame(
-                {
-                    "Year": temp_dates.dt.year,
-                    "Month": temp_dates.dt.month,
-                    "Day": temp_dates.dt.day,
-                    "Hour": temp_dates.dt.hour,
-                    "Minute": temp_dates.dt.minute,
-                }
-            ).reset_index()
+        row_tag_codes = np.full(len(ticket_rows), na_tag_code)
+        tagged = tags_per_ticket[ticket_rows] > 0
+        tag_positions = first_tag_of_code[ticket_codes[ticket_rows[tagged]]]
+        row_tag_codes[tagged] = tag_id_codes[tag_order[tag_positions + rank[tagged]]]
+        row_tags = pd.Categorical.from_codes(row_tag_codes, tag_id_values)
+        return ticket_rows, row_tags
+
+    def _minute_date_keys(
+        self, values: pd.Series, dim_minutes: pd.DatetimeIndex, dim_keys: np.ndarray
+    ):
+        """
+        Looks timestamps up in the per-batch minute-grain Dim_Dates by their
+        value truncated to the minute; `dim_minutes` and `dim_keys` hold the
+        minute and the DateKey of each Dim_Dates row.
+        """
+        positions = dim_minutes.get_indexer(as_datetime(values).dt.floor("min"))
+        keys = pd.array(dim_keys[positions], dtype="Int64")
+        keys[positions < 0] = pd.NA
+        return keys
 
-            merged_keys = pd.merge(
-                fact_date_parts,
-                dim_dates_with_key,
-                on=["Year", "Month", "Day", "Hour", "Minute"],
-                how="left",
+    def _create_fact_tickets(
+        self,
+        df: pd.DataFrame,
+        tags_data: pd.DataFrame,
+        dim_dates: pd.DataFrame = None,
+    ) -> pd.DataFrame:
+        logger.info("Starting creation of fact table...")
+
+        ticket_rows, row_tags = self._ticket_tag_grain(df, tags_data)
+
+        fact_columns = {
+            "TicketKey": "ticket_id",
+            "UserId_BK": "user_id",
+            "AgentId_BK": "agent_id",
+            "CompanyId_BK": "company_id",
+            "CategoryId_BK": "category_id",
+            "PriorityId_BK": "priorityId",
+            "StatusId_BK": "current_status",
+            "ProductId_BK": "product_id",
+            "Channel_BK": "channel",
+        }
+        fact = {
+            name: df[column].array.take(ticket_rows)
+            for name, column in fact_columns.items()
+        }
+        fact["TagId_BK"] = row_tags
+
+        if dim_dates is not None:
+            dim_minutes = pd.DatetimeIndex(
+                pd.to_datetime(
+                    dim_dates[["Year", "Month", "Day", "Hour", "Minute"]].rename(
+                        columns=str.lower
+                    )
+                )
             )
+            dim_keys = dim_dates.index.to_numpy()
 
-            fact[new_key_name] = merged_keys.sort_values("index")["DateKey"]
+        # Keys are computed once per ticket, then spread over its tag rows
+        for date_col_name, date_key_name, time_key_name in FACT_DATE_KEYS:
+            if dim_dates is None:
+                fact[date_key_name] = date_keys(df[date_col_name]).array[ticket_rows]
+                fact[time_key_name] = time_keys(df[date_col_name]).array[ticket_rows]
+            else:
+                fact[date_key_name] = self._minute_date_keys(
+                    df[date_col_name], dim_minutes, dim_keys
+                )[ticket_rows]
 
-        fact["QtTickets"] = 1
-        fact = fact.drop(columns=["created_at", "closed_at", "first_response_at"])
+        fact["QtTickets"] = np.ones(len(ticket_rows), dtype="int64")
 
         logger.info("Fact table creation completed.")
-        return fact.reset_index(drop=True)
+        # The columns are already fresh arrays; consolidating them would copy
+        return pd.DataFrame(fact, copy=False)
 
 
 aspectlib.weave(TransformDwService, log_execution)
@@ -5,6 +5,7 @@ import numpy as np
 import pandas as pd
 
 from config.aop_logging import log_execution
+from utils.columnar import as_datetime, to_frame
 
 
 class TransformeElasticService:
@@ -13,9 +14,9 @@ class TransformeElasticService:
     @staticmethod
     def _calculate_sla_metrics(df: pd.DataFrame) -> pd.Series:
         """Calculates SLA metrics in a vectorized way."""
-        created_at = pd.to_datetime(df["created_at"], errors="coerce")
-        first_response_at = pd.to_datetime(df["first_response_at"], errors="coerce")
-        closed_at = pd.to_datetime(df["closed_at"], errors="coerce")
+        created_at = as_datetime(df["created_at"])
+        first_response_at = as_datetime(df["first_response_at"])
+        closed_at = as_datetime(df["closed_at"])
 
         first_response_time = (first_response_at - created_at).dt.total_seconds() / 60
         resolution_time = (closed_at - created_at).dt.total_seconds() / 60
@@ -52,31 +53,25 @@ class TransformeElasticService:
     @staticmethod
     def _format_date_series(series: pd.Series) -> pd.Series:
         """Helper function to safely format a Series of date objects."""
-        dt_series = pd.to_datetime(series, errors="coerce")
+        dt_series = as_datetime(series)
         return dt_series.dt.strftime("%Y-%m-%d %H:%M:%S")
 
     @staticmethod
     def _process_nested_data(
-        df: pd.DataFrame, nested_map: Dict, col_name: str, date_col: str
+        df: pd.DataFrame, nested_df: pd.DataFrame, col_name: str, date_col: str
     ) -> pd.Series:
         """
-        Efficiently processes and formats dates in nested data structures.
+        Groups a child table into per-ticket lists of records, formatting its dates.
         """
-        nested_series = df["ticket_id_str"].map(nested_map).fillna("").apply(list)
-
-        flat_list = []
-        for ticket_id, items in nested_series.items():
-            if items and isinstance(items, list):
-                for item in items:
-                    if isinstance(item, dict):
-                        item_copy = item.copy()
-                        item_copy["ticket_id_str"] = df.loc[ticket_id, "ticket_id_str"]
-                        flat_list.append(item_copy)
-
-        if not flat_list:
+        if nested_df.empty:
             return pd.Series([[]] * len(df), index=df.index, name=col_name)
 
-        nested_df = pd.DataFrame(flat_list)
+        nested_df = nested_df.rename(columns={"ticket_id": "ticket_id_str"})
+        nested_df["ticket_id_str"] = nested_df["ticket_id_str"].astype(str)
+        nested_df = nested_df[nested_df["ticket_id_str"].isin(df.index)]
+
+        if nested_df.empty:
+            return pd.Series([[]] * len(df), index=df.index, name=col_name)
 
         if date_col in nested_df.columns:
             nested_df[date_col] = TransformeElasticService._format_date_series(
@@ -99,11 +94,10 @@ class TransformeElasticService:
         """
         Transforms a batch of extracted tickets to Elasticsearch format using Pandas for high performance.
         """
-        tickets = extracted_data.get("tickets", [])
-        if not tickets:
+        df = to_frame(extracted_data.get("tickets"))
+        if df.empty:
             return []
 
-        df = pd.DataFrame(tickets)
         df["ticket_id_str"] = df["ticket_id"].astype(str)
         df = df.set_index("ticket_id_str", drop=False)
 
@@ -121,22 +115,31 @@ class TransformeElasticService:
         )
 
         status_history_series = TransformeElasticService._process_nested_data(
-            df, extracted_data.get("status_history", {}), "status_history", "changed_at"
+            df,
+            to_frame(extracted_data.get("status_history")),
+            "status_history",
+            "changed_at",
         )
         attachments_series = TransformeElasticService._process_nested_data(
-            df, extracted_data.get("attachments", {}), "attachments", "uploaded_at"
+            df,
+            to_frame(extracted_data.get("attachments")),
+            "attachments",
+            "uploaded_at",
         )
         audit_logs_series = TransformeElasticService._process_nested_data(
-            df, extracted_data.get("audit_logs", {}), "audit_logs", "performed_at"
+            df, to_frame(extracted_data.get("audit_logs")), "audit_logs", "performed_at"
         )
 
         df = df.join([status_history_series, attachments_series, audit_logs_series])
-        df["tags"] = (
-            df["ticket_id_str"]
-            .map(extracted_data.get("tags", {}))
-            .fillna("")
-            .apply(list)
-        )
+        tags_df = to_frame(extracted_data.get("tags"))
+        tag_names = {}
+        if not tags_df.empty:
+            tag_names = (
+                tags_df.groupby(tags_df["ticket_id"].astype(str))["tag_name"]
+                .agg(list)
+                .to_dict()
+            )
+        df["tags"] = df["ticket_id_str"].map(tag_names).fillna("").apply(list)
 
         for col in ["status_history", "attachments", "audit_logs", "tags"]:
             if col not in df.columns:
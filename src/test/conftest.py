@@ -0,0 +1,234 @@
+import os
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+# CI runs the suite from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def backend_name():
+    """Engine of the local databases; test modules may parametrize it."""
+    return "sqlite"
+
+
+@pytest.fixture
+def local_backend(backend_name, tmp_path, monkeypatch):
+    """Points DBConnector at SQLite or DuckDB files in a temporary directory."""
+    monkeypatch.setenv("DB_BACKEND", backend_name)
+    monkeypatch.setenv("DB_LOCAL_DIR", str(tmp_path / "db"))
+    monkeypatch.setenv("LOGGER_OUTPUT", "CONSOLE")
+    return tmp_path
+
+
+@pytest.fixture
+def local_db(local_backend):
+    from config.db_connector import DBConnector
+
+    db = DBConnector(db_name="dw")
+    db.connect()
+    yield db
+    db.close()
+
+
+def run_script(db, script):
+    """Runs the statements of a SQL script in one transaction."""
+    with db.transaction():
+        for statement in script.split(";"):
+            if statement.strip():
+                db.execute_query(statement)
+
+
+# Data Warehouse tables as the loads expect them (the dimensions with RowHash
+# for ETL_DIMENSION_DELTA=column, Fact_Tickets with it for upsert loads)
+DW_SCHEMA = """
+CREATE TABLE Dim_Dates (DateKey INTEGER PRIMARY KEY AUTOINCREMENT, Year INT,
+    Month INT, Day INT, Hour INT, Minute INT);
+CREATE TABLE Dim_Companies (CompanyKey INTEGER PRIMARY KEY AUTOINCREMENT,
+    CompanyId_BK VARCHAR(255), Name TEXT, Segmento TEXT, CNPJ TEXT, RowHash CHAR(16));
+CREATE TABLE Dim_Users (UserKey INTEGER PRIMARY KEY AUTOINCREMENT,
+    UserId_BK VARCHAR(255), FullName TEXT, IsVIP BOOLEAN, RowHash CHAR(16));
+CREATE TABLE Dim_Agents (AgentKey INTEGER PRIMARY KEY AUTOINCREMENT,
+    AgentId_BK VARCHAR(255), FullName TEXT, DepartmentName TEXT, IsActive BOOLEAN,
+    RowHash CHAR(16));
+CREATE TABLE Dim_Products (ProductKey INTEGER PRIMARY KEY AUTOINCREMENT,
+    ProductId_BK VARCHAR(255), Name TEXT, Code TEXT, IsActive BOOLEAN,
+    RowHash CHAR(16));
+CREATE TABLE Dim_Categories (CategoryKey INTEGER PRIMARY KEY AUTOINCREMENT,
+    CategoryId_BK VARCHAR(255), CategoryName TEXT, SubcategoryName TEXT,
+    RowHash CHAR(16));
+CREATE TABLE Dim_Status (StatusKey INTEGER PRIMARY KEY AUTOINCREMENT,
+    StatusId_BK VARCHAR(255), Name TEXT, RowHash CHAR(16));
+CREATE TABLE Dim_Priorities (PriorityKey INTEGER PRIMARY KEY AUTOINCREMENT,
+    PriorityId_BK VARCHAR(255), name TEXT, RowHash CHAR(16));
+CREATE TABLE Dim_Tags (TagKey INTEGER PRIMARY KEY AUTOINCREMENT,
+    TagId_BK VARCHAR(255), Name TEXT, RowHash CHAR(16));
+CREATE TABLE Dim_Channel (ChannelKey INTEGER PRIMARY KEY AUTOINCREMENT,
+    ChannelName VARCHAR(255), RowHash CHAR(16));
+CREATE TABLE Fact_Tickets (TicketKey BIGINT, UserKey BIGINT, AgentKey BIGINT,
+    CompanyKey BIGINT, CategoryKey BIGINT, PriorityKey BIGINT, StatusKey BIGINT,
+    ProductKey BIGINT, TagKey BIGINT, ChannelKey BIGINT, EntryDateKey BIGINT,
+    ClosedDateKey BIGINT, FirstResponseDateKey BIGINT, EntryTimeKey BIGINT,
+    ClosedTimeKey BIGINT, FirstResponseTimeKey BIGINT, QtTickets INT,
+    RowHash CHAR(16));
+"""
+
+
+AUTOINCREMENT_KEY = re.compile(r"(\w+) INTEGER PRIMARY KEY AUTOINCREMENT")
+
+
+def dw_schema(backend_name):
+    """DW_SCHEMA for the engine: DuckDB numbers the dimension keys by sequence."""
+    if backend_name != "duckdb":
+        return DW_SCHEMA
+    sequences = "".join(
+        f"CREATE SEQUENCE {key}_seq;\n" for key in AUTOINCREMENT_KEY.findall(DW_SCHEMA)
+    )
+    return sequences + AUTOINCREMENT_KEY.sub(
+        r"\1 BIGINT PRIMARY KEY DEFAULT nextval('\1_seq')", DW_SCHEMA
+    )
+
+
+@pytest.fixture
+def dw_db(local_db, backend_name):
+    """Connection to an empty Data Warehouse named `dw`."""
+    run_script(local_db, dw_schema(backend_name))
+    return local_db
+
+
+SOURCE_SCHEMA = """
+CREATE TABLE dbo.Companies (CompanyId INTEGER PRIMARY KEY, Name TEXT, CNPJ TEXT,
+    Segmento TEXT);
+CREATE TABLE dbo.Users (UserId INTEGER PRIMARY KEY, FullName TEXT, Email TEXT,
+    Phone TEXT, CPF TEXT, IsVIP BOOLEAN);
+CREATE TABLE dbo.Departments (DepartmentId INTEGER PRIMARY KEY, Name TEXT);
+CREATE TABLE dbo.Agents (AgentId INTEGER PRIMARY KEY, FullName TEXT, Email TEXT,
+    DepartmentId INTEGER);
+CREATE TABLE dbo.Priorities (PriorityId INTEGER PRIMARY KEY, Name TEXT);
+CREATE TABLE dbo.Products (ProductId INTEGER PRIMARY KEY, Name TEXT, Code TEXT,
+    Description TEXT);
+CREATE TABLE dbo.Statuses (StatusId INTEGER PRIMARY KEY, Name TEXT);
+CREATE TABLE dbo.Categories (CategoryId INTEGER PRIMARY KEY, Name TEXT);
+CREATE TABLE dbo.Subcategories (SubcategoryId INTEGER PRIMARY KEY, Name TEXT);
+CREATE TABLE dbo.SLA_Plans (SLAPlanId INTEGER PRIMARY KEY, Name TEXT,
+    FirstResponseMins INTEGER, ResolutionMins INTEGER);
+CREATE TABLE dbo.Tickets (TicketId INTEGER PRIMARY KEY, Title TEXT,
+    Description TEXT, Channel TEXT, Device TEXT, CurrentStatusId INTEGER,
+    SLAPlanId INTEGER, PriorityId INTEGER, CreatedAt DATETIME,
+    FirstResponseAt DATETIME, ClosedAt DATETIME, CompanyId INTEGER,
+    CreatedByUserId INTEGER, AssignedAgentId INTEGER, ProductId INTEGER,
+    CategoryId INTEGER, SubcategoryId INTEGER);
+CREATE TABLE dbo.Attachments (AttachmentId INTEGER PRIMARY KEY, TicketId INTEGER,
+    FileName TEXT, MimeType TEXT, SizeBytes INTEGER, StoragePath TEXT,
+    UploadedAt DATETIME);
+CREATE TABLE dbo.Tags (TagId INTEGER PRIMARY KEY, Name TEXT);
+CREATE TABLE dbo.TicketTags (TicketId INTEGER, TagId INTEGER);
+CREATE TABLE dbo.TicketStatusHistory (Id INTEGER PRIMARY KEY, TicketId INTEGER,
+    FromStatusId INTEGER, ToStatusId INTEGER, ChangedAt DATETIME,
+    ChangedByAgentId INTEGER);
+CREATE TABLE dbo.AuditLogs (AuditId INTEGER PRIMARY KEY, EntityType TEXT,
+    EntityId INTEGER, Operation TEXT, PerformedBy TEXT, PerformedAt DATETIME,
+    DetailsJson TEXT);
+"""
+
+
+def seed_source(db, tickets=200, seed=1):
+    """
+    Fills the source tables with reference data and `tickets` random tickets;
+    about one in ten has no agent, and each has up to three tags.
+    """
+    with db.transaction():
+        _insert_source_rows(db.execute_query, tickets, random.Random(seed))
+
+
+def _insert_source_rows(insert, tickets, rng):
+    for i in range(1, 6):
+        insert(
+            "INSERT INTO dbo.Companies VALUES (?, ?, ?, ?)",
+            (i, f"Company {i}", f"cnpj {i}", "AB"[i % 2]),
+        )
+    for i in range(1, 21):
+        insert(
+            "INSERT INTO dbo.Users VALUES (?, ?, ?, ?, ?, ?)",
+            (i, f"User {i}", "user@example.com", "555", "000", i % 3 == 0),
+        )
+    for i in range(1, 4):
+        insert("INSERT INTO dbo.Departments VALUES (?, ?)", (i, f"Department {i}"))
+        insert("INSERT INTO dbo.Priorities VALUES (?, ?)", (i, f"Priority {i}"))
+        insert("INSERT INTO dbo.Statuses VALUES (?, ?)", (i, f"Status {i}"))
+        insert("INSERT INTO dbo.Categories VALUES (?, ?)", (i, f"Category {i}"))
+        insert("INSERT INTO dbo.Subcategories VALUES (?, ?)", (i, f"Subcategory {i}"))
+    for i in range(1, 8):
+        insert(
+            "INSERT INTO dbo.Agents VALUES (?, ?, ?, ?)",
+            (i, f"Agent {i}", "agent@example.com", i % 3 + 1),
+        )
+    for i in range(1, 5):
+        insert(
+            "INSERT INTO dbo.Products VALUES (?, ?, ?, ?)",
+            (i, f"Product {i}", f"P-{i}", ""),
+        )
+    for i in range(1, 3):
+        insert("INSERT INTO dbo.SLA_Plans VALUES (?, ?, 60, 600)", (i, f"SLA {i}"))
+    for i in range(1, 6):
+        insert("INSERT INTO dbo.Tags VALUES (?, ?)", (i, f"Tag {i}"))
+
+    base = datetime(2024, 1, 1)
+    for ticket_id in range(1, tickets + 1):
+        created = base + timedelta(minutes=rng.randint(0, 500000))
+        first_response = created + timedelta(minutes=rng.randint(1, 300))
+        closed = created + timedelta(minutes=rng.randint(300, 3000))
+        agent = rng.randint(1, 7) if rng.random() < 0.9 else None
+        insert(
+            "INSERT INTO dbo.Tickets VALUES "
+            "(?, ?, '', ?, 'pc', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                ticket_id,
+                f"Ticket {ticket_id}",
+                rng.choice(["email", "phone", "chat"]),
+                rng.randint(1, 3),
+                rng.randint(1, 2),
+                rng.randint(1, 3),
+                created,
+                first_response if rng.random() < 0.8 else None,
+                closed if rng.random() < 0.5 else None,
+                rng.randint(1, 5),
+                rng.randint(1, 20),
+                agent,
+                rng.randint(1, 4),
+                rng.randint(1, 3),
+                rng.randint(1, 3),
+            ),
+        )
+        for tag_id in rng.sample(range(1, 6), rng.randint(0, 3)):
+            insert("INSERT INTO dbo.TicketTags VALUES (?, ?)", (ticket_id, tag_id))
+        insert(
+            "INSERT INTO dbo.TicketStatusHistory "
+            "(Id, TicketId, FromStatusId, ToStatusId, ChangedAt, ChangedByAgentId) "
+            "VALUES (?, ?, 1, 2, ?, ?)",
+            (ticket_id, ticket_id, created, agent),
+        )
+        insert(
+            "INSERT INTO dbo.AuditLogs (AuditId, EntityType, EntityId, Operation, "
+            "PerformedBy, PerformedAt, DetailsJson) "
+            "VALUES (?, 'ticket', ?, 'create', 'system', ?, '{}')",
+            (ticket_id, ticket_id, created),
+        )
+
+
+@pytest.fixture
+def source_db(local_backend, monkeypatch):
+    """Connection to a seeded source database named `source` (CLIENT_DB_NAME)."""
+    from config.db_connector import DBConnector
+
+    monkeypatch.setenv("CLIENT_DB_NAME", "source")
+    db = DBConnector(db_name="source")
+    db.connect()
+    run_script(db, SOURCE_SCHEMA)
+    seed_source(db)
+    yield db
+    db.close()
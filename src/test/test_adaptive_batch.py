@@ -0,0 +1,132 @@
+import pytest
+
+from utils import adaptive_batch
+from utils.adaptive_batch import AdaptiveBatchController, BatchBackoff
+
+
+class HttpError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture(autouse=True)
+def enough_memory(monkeypatch):
+    monkeypatch.setenv("ETL_BATCH_TARGET_SECONDS", "2")
+    monkeypatch.setattr(adaptive_batch, "available_memory_fraction", lambda: 0.5)
+
+
+def test_controller_with_a_payload_cap_starts_at_its_initial_size():
+    controller = AdaptiveBatchController("test", 100, max_payload_bytes=1000)
+
+    assert controller.size == 100
+
+
+def test_record_resizes_toward_the_target_within_bounds():
+    controller = AdaptiveBatchController("test", 100, min_size=30, max_size=300)
+
+    controller.record(100, 0.1)  # 2000 fit in 2s: at most doubled
+    assert controller.size == 200
+    controller.record(200, 0.1)  # capped by max_size
+    assert controller.size == 300
+    controller.record(300, 60)  # 10 fit in 2s: at most halved
+    assert controller.size == 150
+    for _ in range(3):
+        controller.record(controller.size, 60)  # floored at min_size
+    assert controller.size == 30
+
+
+def test_record_ignores_a_short_final_batch():
+    controller = AdaptiveBatchController("test", 100)
+
+    controller.record(10, 0.01)
+
+    assert controller.size == 100
+
+
+def test_record_caps_the_size_by_the_payload():
+    controller = AdaptiveBatchController("test", 100, max_payload_bytes=1000)
+
+    controller.record(100, 2, payload_bytes=10000)
+
+    assert controller.size == 10
+
+
+def test_record_halves_the_size_under_memory_pressure(monkeypatch):
+    monkeypatch.setattr(adaptive_batch, "available_memory_fraction", lambda: 0.01)
+    controller = AdaptiveBatchController("test", 100)
+
+    controller.record(100, 0.1)
+
+    assert controller.size == 50
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        HttpError(413),
+        HttpError(429),
+        TimeoutError("query timeout"),
+        Exception("[HYT00] [Microsoft][ODBC Driver 18] Query timeout expired"),
+        BatchBackoff(),
+    ],
+)
+def test_back_off_halves_the_size_on_overload(error):
+    controller = AdaptiveBatchController("test", 100, min_size=40)
+
+    assert adaptive_batch.is_backoff_error(error)
+    assert controller.back_off(error)
+    assert controller.size == 50
+    assert controller.back_off(error)
+    assert controller.size == 40
+    assert not controller.back_off(error)
+    assert controller.size == 40
+
+
+def test_other_errors_are_not_overload():
+    assert not adaptive_batch.is_backoff_error(HttpError(400))
+    assert not adaptive_batch.is_backoff_error(ValueError("bad row"))
+
+
+def test_run_retries_an_overloaded_batch_smaller():
+    controller = AdaptiveBatchController("test", 40, min_size=5)
+    batches = []
+
+    def handle(batch):
+        if len(batch) > 10:
+            raise HttpError(413)
+        batches.append(list(batch))
+        return len(batch)
+
+    results = controller.run(list(range(100)), handle)
+
+    assert sum(results) == 100
+    assert [item for batch in batches for item in batch] == list(range(100))
+    assert batches[0] == list(range(10))
+
+
+def test_run_gives_up_at_the_minimum_size():
+    controller = AdaptiveBatchController("test", 40, min_size=10)
+    sizes = []
+
+    def handle(batch):
+        sizes.append(len(batch))
+        raise TimeoutError("query timeout")
+
+    with pytest.raises(TimeoutError):
+        controller.run(list(range(100)), handle)
+    assert sizes == [40, 20, 10]
+
+
+def test_run_raises_other_errors_without_retrying():
+    controller = AdaptiveBatchController("test", 40)
+    sizes = []
+
+    def handle(batch):
+        sizes.append(len(batch))
+        raise ValueError("bad row")
+
+    with pytest.raises(ValueError, match="bad row"):
+        controller.run(list(range(100)), handle)
+    assert sizes == [40]
+    assert controller.size == 40
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pandas as pd
+
+from config.db_backend import MssqlBackend, get_backend
+
+
+class RecordingCursor:
+    """Cursor recording the statements it is given, for SQL Server offline."""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+
+def staged_users():
+    return pd.DataFrame(
+        {
+            "UserId_BK": ["1", "2", None],
+            "Visits": pd.array([3, None, 5], dtype="Int64"),
+            "Score": [0.5, float("nan"), 2.0],
+            "IsVIP": [True, False, True],
+            "CreatedAt": pd.to_datetime(["2025-01-01 10:00", None, "2025-01-02 00:00"]),
+        }
+    )
+
+
+def test_table_type_columns_are_typed_from_the_dtypes():
+    backend = MssqlBackend()
+
+    assert backend.table_type_columns_ddl(staged_users()) == (
+        "[UserId_BK] NVARCHAR(MAX), [Visits] BIGINT, [Score] FLOAT, "
+        "[IsVIP] BIT, [CreatedAt] DATETIME2"
+    )
+
+
+def test_table_types_are_shared_by_tables_of_the_same_shape():
+    backend = MssqlBackend()
+    users = backend.table_type_columns_ddl(staged_users())
+    renamed = backend.table_type_columns_ddl(staged_users().rename(columns=str.lower))
+
+    assert backend.table_type_name(users) == backend.table_type_name(users)
+    assert backend.table_type_name(users) != backend.table_type_name(renamed)
+    assert backend.table_type_name(users).startswith("etl_rows_")
+
+
+def test_bulk_insert_sends_the_rows_as_one_table_valued_parameter():
+    backend = get_backend("mssql")
+    cursor = RecordingCursor()
+    df = staged_users()
+
+    backend.bulk_insert(cursor, "#Dim_Users_temp", df)
+
+    columns_ddl = backend.table_type_columns_ddl(df)
+    type_name = backend.table_type_name(columns_ddl)
+    (create_type, create_params), (insert, [tvp]) = cursor.statements
+    assert create_params is None
+    assert create_type == (
+        f"IF TYPE_ID(N'dbo.{type_name}') IS NULL "
+        f"CREATE TYPE dbo.[{type_name}] AS TABLE ({columns_ddl})"
+    )
+    columns = "[UserId_BK], [Visits], [Score], [IsVIP], [CreatedAt]"
+    assert insert == (
+        f"INSERT INTO #Dim_Users_temp WITH (TABLOCK) ({columns}) "
+        f"SELECT {columns} FROM ? AS Source"
+    )
+    # pyodbc's table-valued parameter: type name, schema, then the rows
+    assert tvp == [
+        type_name,
+        "dbo",
+        ("1", 3, 0.5, True, datetime(2025, 1, 1, 10)),
+        ("2", None, None, False, None),
+        (None, 5, 2.0, True, datetime(2025, 1, 2)),
+    ]
+    # Plain Python values, not numpy scalars
+    assert [type(value) for value in tvp[2]] == [str, int, float, bool, datetime]
@@ -0,0 +1,124 @@
+import sqlite3
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+BOTH_BACKENDS = pytest.mark.parametrize("backend_name", ["sqlite", "duckdb"])
+
+DUPLICATE_KEY_ERRORS = {
+    "sqlite": sqlite3.IntegrityError,
+    "duckdb": duckdb.ConstraintException,
+}
+
+
+def count(db, table):
+    return db.fetch_all(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+
+@pytest.fixture
+def db(local_db):
+    local_db.execute_query("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    return local_db
+
+
+@BOTH_BACKENDS
+def test_transaction_commits_together(db):
+    with db.transaction():
+        db.execute_many("INSERT INTO items VALUES (?, ?)", [(1, "a"), (2, "b")])
+        db.execute_query("INSERT INTO items VALUES (3, 'c')")
+
+    assert count(db, "items") == 3
+
+
+@BOTH_BACKENDS
+def test_failed_statement_aborts_the_scope_even_when_caught(db, backend_name):
+    with pytest.raises(RuntimeError, match="aborted"), db.transaction():
+        db.execute_many("INSERT INTO items VALUES (?, ?)", [(1, "a")])
+        with pytest.raises(DUPLICATE_KEY_ERRORS[backend_name]):
+            db.execute_many(
+                "INSERT INTO items VALUES (?, ?)", [(2, "b"), (1, "duplicate")]
+            )
+        with pytest.raises(RuntimeError, match="aborted"):
+            db.execute_query("INSERT INTO items VALUES (3, 'c')")
+
+    assert count(db, "items") == 0
+    assert not db.in_transaction
+
+
+def test_savepoint_rolls_back_only_the_failed_batch(db):
+    with db.transaction():
+        db.execute_many("INSERT INTO items VALUES (?, ?)", [(1, "a")])
+        with pytest.raises(sqlite3.IntegrityError), db.savepoint():
+            # (2, "b") is applied before the duplicate fails
+            db.execute_many(
+                "INSERT INTO items VALUES (?, ?)", [(2, "b"), (1, "duplicate")]
+            )
+        with db.savepoint():
+            db.execute_many("INSERT INTO items VALUES (?, ?)", [(2, "b")])
+
+    assert db.fetch_all("SELECT id, name FROM items ORDER BY id") == [
+        (1, "a"),
+        (2, "b"),
+    ]
+
+
+def test_interval_commits_wait_for_the_savepoint(db):
+    db.commit_interval_rows = 1
+    with db.transaction():
+        with pytest.raises(sqlite3.IntegrityError), db.savepoint():
+            db.execute_many("INSERT INTO items VALUES (?, ?)", [(1, "a")])
+            db.execute_many("INSERT INTO items VALUES (?, ?)", [(1, "duplicate")])
+        with db.savepoint():
+            db.execute_many("INSERT INTO items VALUES (?, ?)", [(1, "a"), (2, "b")])
+
+    assert count(db, "items") == 2
+
+
+@pytest.mark.parametrize("backend_name", ["duckdb"])
+def test_savepoint_without_backend_support_leaves_the_scope_aborted(db):
+    with pytest.raises(RuntimeError, match="aborted"), db.transaction():
+        db.execute_many("INSERT INTO items VALUES (?, ?)", [(1, "a")])
+        with pytest.raises(duckdb.ConstraintException), db.savepoint():
+            db.execute_many("INSERT INTO items VALUES (?, ?)", [(1, "duplicate")])
+
+    assert count(db, "items") == 0
+    assert not db.in_transaction
+
+
+@pytest.mark.parametrize("backend_name", ["duckdb"])
+def test_bulk_insert_commits_with_the_transaction(db):
+    with db.transaction():
+        db.bulk_insert("items", pd.DataFrame({"id": [1, 2], "name": ["a", None]}))
+        db.execute_query("INSERT INTO items VALUES (3, 'c')")
+
+    assert db.fetch_all("SELECT id, name FROM items ORDER BY id") == [
+        (1, "a"),
+        (2, None),
+        (3, "c"),
+    ]
+
+
+@BOTH_BACKENDS
+def test_iter_batches_streams_fetchmany_blocks(db):
+    db.execute_many(
+        "INSERT INTO items VALUES (?, ?)", [(i, f"item {i}") for i in range(1, 12)]
+    )
+
+    batches = list(
+        db.iter_batches("SELECT id, name FROM items ORDER BY id", arraysize=5)
+    )
+
+    assert [batch.num_rows for batch in batches] == [5, 5, 1]
+    assert [row["id"] for batch in batches for row in batch.to_pylist()] == list(
+        range(1, 12)
+    )
+    assert db.fetch_table("SELECT id, name FROM items ORDER BY id", arraysize=5).equals(
+        pa.Table.from_batches(batches)
+    )
+
+
+def test_iter_batches_raises_query_errors(db):
+    with pytest.raises(sqlite3.OperationalError):
+        list(db.iter_batches("SELECT missing FROM items"))
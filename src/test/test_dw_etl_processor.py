@@ -0,0 +1,647 @@
+import re
+import sqlite3
+import time
+from datetime import timedelta
+
+import pytest
+
+from process.dw_etl_processor import DwEtlProcessor
+from process.snapshot_replay_processor import SnapshotReplayProcessor
+from services.load_dw_service import LoadDwService
+from utils.hash_store import HashStore
+from utils.watermark_store import WatermarkStore
+
+# Fact_Tickets with its keys resolved back to the source IDs
+FACT_SOURCE_IDS_SQL = """
+SELECT f.TicketKey, u.UserId_BK, a.AgentId_BK, t.TagId_BK, c.ChannelName
+FROM Fact_Tickets f
+LEFT JOIN Dim_Users u ON u.UserKey = f.UserKey
+LEFT JOIN Dim_Agents a ON a.AgentKey = f.AgentKey
+LEFT JOIN Dim_Tags t ON t.TagKey = f.TagKey
+LEFT JOIN Dim_Channel c ON c.ChannelKey = f.ChannelKey
+"""
+
+DIMENSIONS = [
+    "Dim_Dates",
+    "Dim_Companies",
+    "Dim_Users",
+    "Dim_Agents",
+    "Dim_Products",
+    "Dim_Categories",
+    "Dim_Status",
+    "Dim_Priorities",
+    "Dim_Tags",
+    "Dim_Channel",
+]
+
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def backend_name(request):
+    return request.param
+
+
+@pytest.fixture
+def dw_job(source_db, dw_db, tmp_path, monkeypatch):
+    """Runs DwEtlProcessor from the seeded source into the empty DW."""
+    monkeypatch.setenv("DW_DB_NAME", "dw")
+    monkeypatch.setenv("ETL_WATERMARK_FILE", str(tmp_path / "watermarks.json"))
+    monkeypatch.setenv("ETL_HASH_STORE_FILE", str(tmp_path / "hashes.sqlite"))
+    monkeypatch.setenv("ETL_SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setenv("ETL_RUN_LEDGER_FILE", str(tmp_path / "run_ledger.sqlite"))
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    return lambda: DwEtlProcessor().execute()
+
+
+def source_id(value):
+    return None if value is None else int(value)
+
+
+def fact_source_ids(dw_db):
+    return sorted(
+        (ticket, source_id(user), source_id(agent), source_id(tag), channel)
+        for ticket, user, agent, tag, channel in dw_db.fetch_all(FACT_SOURCE_IDS_SQL)
+    )
+
+
+def expected_source_ids(source_db):
+    """One row per ticket and tag, tag -1 (N/A) for tickets without tags."""
+    return sorted(
+        source_db.fetch_all(
+            """
+            SELECT t.TicketId, t.CreatedByUserId, t.AssignedAgentId,
+                COALESCE(tt.TagId, -1), t.Channel
+            FROM dbo.Tickets t
+            LEFT JOIN dbo.TicketTags tt ON tt.TicketId = t.TicketId
+            """
+        )
+    )
+
+
+def table_names(db):
+    if db.backend.name == "duckdb":
+        query = "SELECT table_name FROM information_schema.tables"
+    else:
+        query = "SELECT name FROM sqlite_master WHERE type = 'table'"
+    return {name for (name,) in db.fetch_all(query)}
+
+
+def table_contents(dw_db):
+    return {
+        table: sorted(dw_db.fetch_all(f"SELECT * FROM {table}"), key=repr)
+        for table in [*DIMENSIONS, "Fact_Tickets"]
+    }
+
+
+def test_default_load(dw_job, source_db, dw_db):
+    dw_job()
+
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Dim_Agents") == [(7,)]
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Dim_Users") == [(20,)]
+    # Minute-grain Dim_Dates: one row per distinct minute of the fact dates
+    assert (
+        dw_db.fetch_all(
+            """
+        SELECT COUNT(*) FROM Fact_Tickets f
+        JOIN Dim_Dates d ON d.DateKey = f.EntryDateKey
+        """
+        )
+        == dw_db.fetch_all("SELECT COUNT(*) FROM Fact_Tickets")
+    )
+
+
+@pytest.mark.parametrize("batch_size", ["0", "37"])
+def test_rerun_is_idempotent(dw_job, source_db, dw_db, monkeypatch, batch_size):
+    monkeypatch.setenv("ETL_BATCH_SIZE", batch_size)
+    dw_job()
+    loaded = table_contents(dw_db)
+
+    dw_job()
+
+    assert table_contents(dw_db) == loaded
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Dim_Agents") == [(7,)]
+
+
+def test_upsert_load(dw_job, source_db, dw_db, monkeypatch):
+    monkeypatch.setenv("ETL_FACT_LOAD_MODE", "upsert")
+    dw_job()
+    loaded = table_contents(dw_db)
+
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+    assert dw_db.fetch_all(
+        "SELECT COUNT(*) FROM Fact_Tickets WHERE RowHash IS NULL"
+    ) == [(0,)]
+
+    dw_job()
+    assert table_contents(dw_db) == loaded
+
+
+def test_server_key_resolution(dw_job, source_db, dw_db, monkeypatch):
+    monkeypatch.setenv("ETL_FACT_KEY_RESOLUTION", "server")
+    dw_job()
+
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+    dw_job()
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+
+def test_calendar_date_dimension(dw_job, source_db, dw_db, monkeypatch):
+    monkeypatch.setenv("ETL_DATE_DIMENSION", "calendar")
+    monkeypatch.setenv("ETL_CALENDAR_START", "2024-01-01")
+    dw_job()
+
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+    entry_keys = dict(
+        dw_db.fetch_all("SELECT DISTINCT TicketKey, EntryDateKey FROM Fact_Tickets")
+    )
+    created = {
+        ticket_id: int(created_at.strftime("%Y%m%d"))
+        for ticket_id, created_at in source_db.fetch_all(
+            "SELECT TicketId, CreatedAt FROM dbo.Tickets"
+        )
+    }
+    assert entry_keys == created
+    # Every fact date resolves to a pre-populated calendar day
+    assert (
+        dw_db.fetch_all(
+            """
+        SELECT COUNT(*) FROM Fact_Tickets f
+        LEFT JOIN Dim_Date d ON d.DateKey = f.EntryDateKey
+        WHERE d.DateKey IS NULL
+        """
+        )
+        == [(0,)]
+    )
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Dim_Time") == [(1440,)]
+
+
+def record_extracted_tickets(monkeypatch):
+    """Records the IDs of the tickets of each window processed by the DW job."""
+    process_window = DwEtlProcessor.process_window
+    tickets = []
+
+    def recording_process_window(self, extracted, window_number=None):
+        tickets.extend(str(t) for t in extracted["tickets"]["ticket_id"].to_pylist())
+        return process_window(self, extracted, window_number)
+
+    monkeypatch.setattr(DwEtlProcessor, "process_window", recording_process_window)
+    return tickets
+
+
+# Changes of ticket 7, each dated `{changed_at}`
+TICKET_CHANGES = {
+    "closed": "UPDATE dbo.Tickets SET ClosedAt = ? WHERE TicketId = 7",
+    "status": "INSERT INTO dbo.TicketStatusHistory VALUES (1001, 7, 1, 3, ?, 2)",
+    "audit log": (
+        "INSERT INTO dbo.AuditLogs VALUES "
+        "(1001, 'ticket', 7, 'update', 'agent', ?, '{}')"
+    ),
+}
+
+
+@pytest.mark.parametrize("change", TICKET_CHANGES)
+def test_incremental_run_extracts_only_the_changed_ticket(
+    dw_job, source_db, dw_db, monkeypatch, change
+):
+    monkeypatch.setenv("ETL_INCREMENTAL", "true")
+    tickets = record_extracted_tickets(monkeypatch)
+    dw_job()
+    first_watermark = WatermarkStore().get("dw")
+    assert len(tickets) == 200 and first_watermark
+
+    source_db.execute_query(
+        TICKET_CHANGES[change], [first_watermark + timedelta(milliseconds=1)]
+    )
+    tickets.clear()
+    failing = fail_fact_loads(monkeypatch, loads={1})
+    with pytest.raises(RuntimeError, match="Fact_Tickets load failed"):
+        dw_job()
+
+    # The failed run keeps the watermark, so the next one extracts it again
+    assert tickets == ["7"]
+    assert WatermarkStore().get("dw") == first_watermark
+
+    failing.clear()
+    tickets.clear()
+    dw_job()
+    assert tickets == ["7"]
+    assert WatermarkStore().get("dw") > first_watermark
+
+    tickets.clear()
+    dw_job()
+    assert tickets == []
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+
+def fact_row_hashes(dw_db):
+    """RowHash and StatusKey of each ticket x tag fact row."""
+    return {
+        (ticket, tag): (status, row_hash)
+        for ticket, tag, status, row_hash in dw_db.fetch_all(
+            "SELECT TicketKey, TagKey, StatusKey, RowHash FROM Fact_Tickets"
+        )
+    }
+
+
+def test_upsert_deletes_the_fact_row_of_a_removed_tag(
+    dw_job, source_db, dw_db, monkeypatch
+):
+    monkeypatch.setenv("ETL_FACT_LOAD_MODE", "upsert")
+    dw_job()
+    before = fact_row_hashes(dw_db)
+    ticket_id, tag_id = source_db.fetch_all(
+        """
+        SELECT TicketId, MIN(TagId) FROM dbo.TicketTags
+        GROUP BY TicketId HAVING COUNT(*) > 1 ORDER BY TicketId LIMIT 1
+        """
+    )[0]
+    (tag_key,) = dw_db.fetch_all(
+        "SELECT TagKey FROM Dim_Tags WHERE TagId_BK = ?", [str(tag_id)]
+    )[0]
+    source_db.execute_query(
+        "DELETE FROM dbo.TicketTags WHERE TicketId = ? AND TagId = ?",
+        [ticket_id, tag_id],
+    )
+
+    dw_job()
+
+    del before[(ticket_id, tag_key)]
+    assert fact_row_hashes(dw_db) == before
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+
+def test_upsert_updates_only_the_changed_ticket(dw_job, source_db, dw_db, monkeypatch):
+    monkeypatch.setenv("ETL_FACT_LOAD_MODE", "upsert")
+    dw_job()
+    before = fact_row_hashes(dw_db)
+    ticket_id, status_id = source_db.fetch_all(
+        "SELECT TicketId, CurrentStatusId FROM dbo.Tickets WHERE TicketId = 1"
+    )[0]
+    new_status_id = status_id % 3 + 1
+    source_db.execute_query(
+        "UPDATE dbo.Tickets SET CurrentStatusId = ? WHERE TicketId = ?",
+        [new_status_id, ticket_id],
+    )
+
+    dw_job()
+
+    after = fact_row_hashes(dw_db)
+    (new_status_key,) = dw_db.fetch_all(
+        "SELECT StatusKey FROM Dim_Status WHERE StatusId_BK = ?", [str(new_status_id)]
+    )[0]
+    changed = {key for key in before if key[0] == ticket_id}
+    assert changed and after.keys() == before.keys()
+    for key in changed:
+        assert after[key][0] == new_status_key
+        assert after[key][1] != before[key][1]
+    assert {key: after[key] for key in before if key not in changed} == {
+        key: value for key, value in before.items() if key not in changed
+    }
+
+
+def record_dimension_staging(monkeypatch):
+    """
+    Records the business keys staged for each dimension but Dim_Dates, which
+    has none and is always staged.
+    """
+    insert_frame = LoadDwService._insert_frame
+    staged = {}
+
+    def recording_insert_frame(self, table_name, df, dw_table=None):
+        if dw_table and dw_table.startswith("Dim_") and dw_table != "Dim_Dates":
+            staged.setdefault(dw_table, []).extend(df.iloc[:, 0].astype(str))
+        return insert_frame(self, table_name, df, dw_table)
+
+    monkeypatch.setattr(LoadDwService, "_insert_frame", recording_insert_frame)
+    return staged
+
+
+@pytest.mark.parametrize("delta", ["cache", "column"])
+def test_dimension_delta_stages_only_changed_rows(
+    dw_job, source_db, dw_db, monkeypatch, delta
+):
+    monkeypatch.setenv("ETL_DIMENSION_DELTA", delta)
+    staged = record_dimension_staging(monkeypatch)
+    dw_job()
+    assert len(staged["Dim_Users"]) == 20
+
+    staged.clear()
+    source_db.execute_query(
+        "UPDATE dbo.Users SET FullName = 'Renamed' WHERE UserId = 3"
+    )
+    dw_job()
+
+    assert staged == {"Dim_Users": ["3"]}
+    assert dw_db.fetch_all("SELECT FullName FROM Dim_Users WHERE UserId_BK = '3'") == [
+        ("Renamed",)
+    ]
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Dim_Users") == [(20,)]
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+
+@pytest.mark.parametrize("delta", ["cache", "column"])
+def test_dimension_delta_reloads_emptied_tables(
+    dw_job, source_db, dw_db, monkeypatch, delta
+):
+    monkeypatch.setenv("ETL_DIMENSION_DELTA", delta)
+    dw_job()
+    for table in ("Dim_Users", "Dim_Companies", "Fact_Tickets"):
+        dw_db.execute_query(f"DELETE FROM {table}")
+    staged = record_dimension_staging(monkeypatch)
+
+    dw_job()
+
+    assert sorted(staged) == ["Dim_Companies", "Dim_Users"]
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Dim_Users") == [(20,)]
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Dim_Companies") == [(5,)]
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+
+def partition_fact_merge(monkeypatch, partition):
+    """Merges Fact_Tickets in ranges of 50 tickets or 2 months."""
+    monkeypatch.setenv("ETL_FACT_MERGE_PARTITION", partition)
+    if partition == "month":
+        monkeypatch.setenv("ETL_DATE_DIMENSION", "calendar")
+        monkeypatch.setenv("ETL_CALENDAR_START", "2024-01-01")
+        monkeypatch.setenv("ETL_FACT_MERGE_RANGE_SIZE", "2")
+    else:
+        monkeypatch.setenv("ETL_FACT_MERGE_RANGE_SIZE", "50")
+    return HashStore(f"dw:Fact_Tickets:{partition}")
+
+
+def record_range_merges(monkeypatch, fail_at=None):
+    """
+    Records the condition of each range merged, and makes merge number
+    `fail_at` (from 1) fail.
+    """
+    merge_range = LoadDwService._merge_fact_range
+    conditions = []
+    calls = []
+
+    def recording_merge_range(self, db, *args):
+        conditions.append(args[-1])
+        calls.append(args[-1])
+        if len(calls) == fail_at:
+            raise RuntimeError("Range merge failed")
+        return merge_range(self, db, *args)
+
+    monkeypatch.setattr(LoadDwService, "_merge_fact_range", recording_merge_range)
+    return conditions
+
+
+@pytest.mark.parametrize("partition", ["ticket", "month"])
+def test_fact_merged_in_ranges_is_reloaded_once_emptied(
+    dw_job, source_db, dw_db, monkeypatch, partition
+):
+    committed_ranges = partition_fact_merge(monkeypatch, partition)
+    conditions = record_range_merges(monkeypatch)
+    dw_job()
+
+    assert len(conditions) > 1
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+    assert committed_ranges.count() == 0
+
+    dw_db.execute_query("DELETE FROM Fact_Tickets")
+    conditions.clear()
+    dw_job()
+
+    assert len(conditions) > 1
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+
+def test_failed_range_merge_resumes_after_the_committed_ranges(
+    dw_job, source_db, dw_db, monkeypatch
+):
+    committed_ranges = partition_fact_merge(monkeypatch, "ticket")
+    conditions = record_range_merges(monkeypatch, fail_at=3)
+    with pytest.raises(RuntimeError, match="Range merge failed"):
+        dw_job()
+
+    assert committed_ranges.count() == 2
+    assert dw_db.fetch_all("SELECT MAX(TicketKey) FROM Fact_Tickets") == [(99,)]
+
+    first_run = list(conditions)
+    conditions.clear()
+    dw_job()
+
+    # Tickets 1 to 200: five ranges of 50, the first two already committed
+    assert len(conditions) == 3
+    assert conditions[0] == first_run[2]
+    assert not set(conditions) & set(first_run[:2])
+    assert committed_ranges.count() == 0
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+
+def test_fact_ranges_merged_by_concurrent_workers(
+    dw_job, source_db, dw_db, monkeypatch
+):
+    committed_ranges = partition_fact_merge(monkeypatch, "ticket")
+    monkeypatch.setenv("ETL_FACT_MERGE_WORKERS", "2")
+    conditions = record_range_merges(monkeypatch)
+    dw_job()
+
+    assert len(conditions) == 5
+    assert committed_ranges.count() == 0
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+    # The shared staging table is dropped
+    assert not [name for name in table_names(dw_db) if "Fact_Tickets_temp" in name]
+
+    dw_job()
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+
+def record_dimension_loads(monkeypatch, failing=None):
+    """
+    Records the connection each dimension is loaded on, raising for the
+    `failing` table.
+    """
+    load_dimension = LoadDwService._load_dimension
+    connections = {}
+
+    def recording_load_dimension(self, df, table_name, **kwargs):
+        connections[table_name] = self.db
+        if table_name == failing:
+            raise RuntimeError(f"{table_name} load failed")
+        return load_dimension(self, df, table_name, **kwargs)
+
+    monkeypatch.setattr(LoadDwService, "_load_dimension", recording_load_dimension)
+    return connections
+
+
+def test_dimensions_load_on_pooled_connections_with_the_job_settings(
+    dw_job, source_db, dw_db, monkeypatch
+):
+    monkeypatch.setenv("ETL_DW_LOAD_WORKERS", "2")
+    monkeypatch.setenv("ETL_DIMENSION_DELTA", "column")
+    created = []
+    init = LoadDwService.__init__
+
+    def recording_init(self, *args, **kwargs):
+        created.append(self)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(LoadDwService, "__init__", recording_init)
+    connections = record_dimension_loads(monkeypatch)
+    dw_job()
+
+    # One service parses the settings: its workers only swap the connection
+    [service] = created
+    assert service.db not in connections.values()
+    assert len(connections) == 10
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+    # The workers compare the RowHash column (ETL_DIMENSION_DELTA)
+    staged = record_dimension_staging(monkeypatch)
+    dw_job()
+    assert not any(staged.values())
+
+
+def test_dimension_worker_error_fails_the_load(dw_job, source_db, dw_db, monkeypatch):
+    monkeypatch.setenv("ETL_DW_LOAD_WORKERS", "2")
+    load_dimension = LoadDwService._load_dimension
+    record_dimension_loads(monkeypatch, failing="Dim_Agents")
+
+    with pytest.raises(RuntimeError, match="Dim_Agents load failed"):
+        dw_job()
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Fact_Tickets") == [(0,)]
+
+    monkeypatch.setattr(LoadDwService, "_load_dimension", load_dimension)
+    dw_job()
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+
+
+@pytest.fixture
+def resumable_dw_job(dw_job, tmp_path, monkeypatch):
+    """
+    Runs the DW job as a resumable run of 37-ticket windows. Returns the job
+    and the list of tables loaded by each LoadDwService.load call.
+    """
+    monkeypatch.setenv("ETL_RESUMABLE_RUNS", "true")
+    monkeypatch.setenv("ETL_BATCH_SIZE", "37")
+    loads = []
+    load = LoadDwService.load
+
+    def recording_load(self, transformed_data, on_table_loaded=None):
+        loads.append(sorted(transformed_data))
+        return load(self, transformed_data, on_table_loaded)
+
+    monkeypatch.setattr(LoadDwService, "load", recording_load)
+    return dw_job, loads
+
+
+def fail_fact_loads(monkeypatch, loads):
+    """
+    Makes the given Fact_Tickets loads (counted from 1 across runs) fail.
+    Returns the set of failing loads, which the test can clear.
+    """
+    load_fact = LoadDwService._load_fact_tickets
+    calls = []
+
+    def failing_load_fact(self, df):
+        calls.append(df)
+        if len(calls) in loads:
+            raise RuntimeError("Fact_Tickets load failed")
+        return load_fact(self, df)
+
+    monkeypatch.setattr(LoadDwService, "_load_fact_tickets", failing_load_fact)
+    return loads
+
+
+def ledger_runs(tmp_path):
+    with sqlite3.connect(tmp_path / "run_ledger.sqlite") as connection:
+        return connection.execute(
+            "SELECT run_id, status, attempts FROM runs ORDER BY started_at, rowid"
+        ).fetchall()
+
+
+def ledger_steps(tmp_path, run_id):
+    with sqlite3.connect(tmp_path / "run_ledger.sqlite") as connection:
+        return {
+            step
+            for (step,) in connection.execute(
+                "SELECT step FROM run_steps WHERE run_id = ?", (run_id,)
+            )
+        }
+
+
+def window_count(steps):
+    return sum(1 for step in steps if re.fullmatch(r"window-\d+:dw", step))
+
+
+def test_failed_run_resumes_at_its_first_incomplete_step(
+    resumable_dw_job, source_db, dw_db, tmp_path, monkeypatch
+):
+    dw_job, loads = resumable_dw_job
+    failing = fail_fact_loads(monkeypatch, loads={2})
+    with pytest.raises(RuntimeError, match="Fact_Tickets load failed"):
+        dw_job()
+
+    [(run_id, status, attempts)] = ledger_runs(tmp_path)
+    steps = ledger_steps(tmp_path, run_id)
+    assert (status, attempts) == ("running", 1)
+    assert "extract" in steps and "window-00001:dw" in steps
+    assert "window-00002:dw:load:Dim_Agents" in steps
+    assert "window-00002:dw:load:Fact_Tickets" not in steps
+    assert "window-00002:dw" not in steps
+
+    failing.clear()
+    loads.clear()
+    dw_job()
+
+    [(resumed_run_id, status, attempts)] = ledger_runs(tmp_path)
+    windows = window_count(ledger_steps(tmp_path, run_id))
+    assert (resumed_run_id, status, attempts) == (run_id, "completed", 2)
+    # Window 1 is skipped, window 2 only loads its fact table
+    assert loads[0] == ["Fact_Tickets"]
+    assert len(loads) == windows - 1
+    assert all("Dim_Agents" in tables for tables in loads[1:])
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Dim_Agents") == [(7,)]
+
+
+def test_run_out_of_attempts_is_abandoned(
+    resumable_dw_job, source_db, dw_db, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("ETL_RUN_MAX_ATTEMPTS", "2")
+    dw_job, _ = resumable_dw_job
+    fail_fact_loads(monkeypatch, loads={1, 2})
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="Fact_Tickets load failed"):
+            dw_job()
+    [(run_id, status, attempts)] = ledger_runs(tmp_path)
+    assert (status, attempts) == ("running", 2)
+
+    dw_job()
+
+    [abandoned, completed] = ledger_runs(tmp_path)
+    assert abandoned == (run_id, "abandoned", 2)
+    assert completed[1:] == ("completed", 1)
+    assert not (tmp_path / "snapshots" / run_id).exists()
+    assert fact_source_ids(dw_db) == expected_source_ids(source_db)
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Dim_Agents") == [(7,)]
+
+
+def test_replay_reloads_a_completed_run(
+    resumable_dw_job, source_db, dw_db, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("ETL_SNAPSHOT", "true")
+    dw_job, loads = resumable_dw_job
+    dw_job()
+    [(run_id, _, _)] = ledger_runs(tmp_path)
+    steps = ledger_steps(tmp_path, run_id)
+    facts = fact_source_ids(dw_db)
+    loads.clear()
+
+    # --replay reads the staged windows; the completed run is not resumed
+    processor = DwEtlProcessor()
+    replay = SnapshotReplayProcessor(run_id)
+    for window_number, extracted in enumerate(replay.iter_batches(), start=1):
+        processor.process_window(extracted, window_number)
+
+    assert len(loads) == window_count(steps)
+    assert ledger_runs(tmp_path) == [(run_id, "completed", 1)]
+    assert ledger_steps(tmp_path, run_id) == steps
+    assert fact_source_ids(dw_db) == facts
+    assert dw_db.fetch_all("SELECT COUNT(*) FROM Dim_Agents") == [(7,)]
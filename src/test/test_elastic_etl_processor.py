@@ -0,0 +1,101 @@
+import pytest
+
+from process import elastic_etl_processor
+from process.elastic_etl_processor import ElasticEtlProcessor
+from utils.hash_store import content_hash
+
+
+class StubElasticClient:
+    """Index in memory, rejecting the bulk items of the `rejected` IDs."""
+
+    def __init__(self, indexed=None):
+        self.indexed = dict(indexed or {})
+        self.rejected = set()
+        self.sent = []
+        self.scans = 0
+
+    def bulk_upsert(self, documents, on_batch_sent=None):
+        ids = [str(doc["ticket_id"]) for doc in documents]
+        self.sent.append(ids)
+        errors = [
+            {"update": {"_id": doc_id, "status": 400}}
+            for doc_id in ids
+            if doc_id in self.rejected
+        ]
+        for doc in documents:
+            if str(doc["ticket_id"]) not in self.rejected:
+                self.indexed[str(doc["ticket_id"])] = doc.get("content_hash")
+        return len(ids) - len(errors), errors
+
+    def scan_content_hashes(self):
+        self.scans += 1
+        return dict(self.indexed)
+
+
+@pytest.fixture
+def elastic(tmp_path, monkeypatch):
+    """Stubbed client of the processors, with content hashing enabled."""
+    monkeypatch.setenv("ETL_ELASTIC_SKIP_UNCHANGED", "true")
+    monkeypatch.setenv("ETL_HASH_STORE_FILE", str(tmp_path / "hashes.sqlite"))
+    monkeypatch.setenv("ETL_WATERMARK_FILE", str(tmp_path / "watermarks.json"))
+    client = StubElasticClient()
+    monkeypatch.setattr(elastic_etl_processor, "ElasticClient", lambda: client)
+    return client
+
+
+def documents(**titles):
+    """Fresh transformed documents, with `titles` replaced by ticket ID."""
+    titles = {"1": "Printer", "2": "Login", "3": "Invoice", **titles}
+    return [{"ticket_id": ticket, "title": title} for ticket, title in titles.items()]
+
+
+def load(processor, docs):
+    processor.transformed_data = docs
+    return processor.load_data()
+
+
+def test_unchanged_documents_are_not_sent_again(elastic):
+    processor = ElasticEtlProcessor()
+
+    assert load(processor, documents())
+    assert load(processor, documents())
+    assert load(processor, documents(**{"2": "Login (2FA)"}))
+
+    assert elastic.sent == [["1", "2", "3"], ["2"]]
+
+
+def test_every_document_is_sent_without_the_switch(elastic, monkeypatch):
+    monkeypatch.delenv("ETL_ELASTIC_SKIP_UNCHANGED")
+    processor = ElasticEtlProcessor()
+
+    assert load(processor, documents())
+    assert load(processor, documents())
+
+    assert processor.hash_store is None
+    assert elastic.sent == [["1", "2", "3"], ["1", "2", "3"]]
+
+
+def test_empty_store_is_rebuilt_from_the_index(elastic):
+    elastic.indexed = {doc["ticket_id"]: content_hash(doc) for doc in documents()}
+    processor = ElasticEtlProcessor()
+
+    assert load(processor, documents(**{"3": "Invoice copy"}))
+    assert load(processor, documents(**{"4": "VPN"}))
+
+    # Scanned once, when the processor first found the store empty
+    assert elastic.scans == 1
+    assert elastic.sent == [["3"], ["3", "4"]]
+
+
+def test_rejected_documents_are_not_recorded(elastic):
+    elastic.rejected = {"2"}
+    processor = ElasticEtlProcessor()
+
+    assert not load(processor, documents())
+    elastic.rejected.clear()
+    assert load(processor, documents())
+
+    assert elastic.sent == [["1", "2", "3"], ["2"]]
+    assert processor.hash_store.get_many(["1", "2", "3"]) == {
+        doc["ticket_id"]: content_hash(doc) for doc in documents()
+    }
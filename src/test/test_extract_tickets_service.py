@@ -0,0 +1,78 @@
+import pytest
+
+from config.db_connector import DBConnectionPool
+from process.tickets_extract_processor import TicketsExtractProcessor
+from services.extract_tickets_service import ExtractTicketsService
+
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def backend_name(request):
+    return request.param
+
+
+def test_pooled_child_extraction_shares_the_batch_controller(source_db, monkeypatch):
+    pool = DBConnectionPool(db_name="source", max_size=4)
+    service = ExtractTicketsService(source_db, connection_pool=pool)
+    # Every child table is read in IN-list batches sized by this controller
+    runs = []
+    run = service.in_list_batches.run
+    monkeypatch.setattr(
+        service.in_list_batches,
+        "run",
+        lambda *args, **kwargs: runs.append(args) or run(*args, **kwargs),
+    )
+
+    try:
+        children = service._extract_children_of([str(i) for i in range(1, 51)])
+    finally:
+        pool.close_all()
+
+    assert len(runs) == 4
+    assert set(children["tags"].column("ticket_id").to_pylist()) <= set(range(1, 51))
+    assert children["status_history"].num_rows == 50
+
+
+def extract_children(ticket_ids):
+    """Child tables of `ticket_ids` as extracted by the configured processor."""
+    processor = TicketsExtractProcessor(job_names=["dw"])
+    processor.db_client.connect()
+    try:
+        children = processor.extract_service._extract_children_of(ticket_ids)
+    finally:
+        if processor.connection_pool:
+            processor.connection_pool.close_all()
+        processor.db_client.close()
+    return {key: sorted(table.to_pylist(), key=repr) for key, table in children.items()}
+
+
+@pytest.mark.parametrize("max_workers", [None, "4"])
+def test_temp_table_strategy_extracts_the_in_list_children(
+    source_db, tmp_path, monkeypatch, max_workers
+):
+    monkeypatch.setenv("ETL_WATERMARK_FILE", str(tmp_path / "watermarks.json"))
+    if max_workers:
+        monkeypatch.setenv("ETL_EXTRACT_MAX_WORKERS", max_workers)
+    # Every third ticket, one repeated, and an ID with no ticket
+    ticket_ids = [str(i) for i in range(1, 201, 3)] + ["4", "9999"]
+    in_list = extract_children(ticket_ids)
+
+    monkeypatch.setenv("ETL_CHILD_FILTER_STRATEGY", "temp_table")
+    staged = []
+    stage_ticket_ids = ExtractTicketsService._stage_ticket_ids
+
+    def recording_stage_ticket_ids(self, ids):
+        staged.append(ids)
+        stage_ticket_ids(self, ids)
+
+    monkeypatch.setattr(
+        ExtractTicketsService, "_stage_ticket_ids", recording_stage_ticket_ids
+    )
+    monkeypatch.setattr(
+        ExtractTicketsService,
+        "_execute_in_chunks",
+        lambda *args, **kwargs: pytest.fail("IN-list query with a temp table"),
+    )
+
+    assert extract_children(ticket_ids) == in_list
+    assert staged == [ticket_ids]
+    assert in_list["status_history"]
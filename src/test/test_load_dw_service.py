@@ -0,0 +1,81 @@
+import pandas as pd
+
+from services.load_dw_service import LoadDwService
+from utils.adaptive_batch import AdaptiveBatchController
+
+
+class PartialTimeoutCursor:
+    """Applies the first half of the next executemany, then times out."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.failures = 1
+
+    def executemany(self, query, rows):
+        if self.failures:
+            self.failures -= 1
+            self._cursor.executemany(query, rows[: len(rows) // 2])
+            raise TimeoutError("HYT00 Query timeout expired")
+        self._cursor.executemany(query, rows)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def test_retried_staging_batch_does_not_duplicate_rows(local_db):
+    local_db.execute_query("CREATE TABLE staging (Id INTEGER, Name TEXT)")
+    service = LoadDwService(local_db)
+    service.insert_batches = AdaptiveBatchController(
+        "staging insert", initial_size=40, min_size=10
+    )
+    df = pd.DataFrame({"Id": range(100), "Name": [f"row {i}" for i in range(100)]})
+
+    local_db.cursor = PartialTimeoutCursor(local_db.cursor)
+    with local_db.transaction():
+        service._insert_frame("staging", df)
+
+    assert local_db.cursor.failures == 0
+    assert local_db.fetch_all("SELECT COUNT(*), COUNT(DISTINCT Id) FROM staging") == [
+        (100, 100)
+    ]
+
+
+def test_dimension_rows_without_business_key_are_not_loaded(dw_db):
+    df = pd.DataFrame(
+        {
+            "AgentId_BK": ["1", None, "2"],
+            "FullName": ["Ana", "Unassigned", "Bruno"],
+            "DepartmentName": ["Support", None, "Sales"],
+            "IsActive": True,
+        }
+    )
+    service = LoadDwService(dw_db)
+    for _ in range(2):
+        service._load_dimension(
+            df, "Dim_Agents", "AgentId_BK", ["FullName", "DepartmentName", "IsActive"]
+        )
+
+    assert dw_db.fetch_all("SELECT AgentId_BK FROM Dim_Agents ORDER BY 1") == [
+        ("1",),
+        ("2",),
+    ]
+
+
+def test_integer_business_keys_load_the_same_with_or_without_nulls(dw_db):
+    service = LoadDwService(dw_db)
+    columns = ["FullName", "DepartmentName", "IsActive"]
+    # A window with an unassigned ticket reads the agent IDs as float64
+    with_null = pd.DataFrame(
+        {
+            "AgentId_BK": [3.0, None],
+            "FullName": ["Ana", None],
+            "DepartmentName": ["Support", None],
+            "IsActive": True,
+        }
+    )
+    without_null = with_null.iloc[:1].astype({"AgentId_BK": "int64"})
+
+    service._load_dimension(with_null, "Dim_Agents", "AgentId_BK", columns)
+    service._load_dimension(without_null, "Dim_Agents", "AgentId_BK", columns)
+
+    assert dw_db.fetch_all("SELECT AgentId_BK FROM Dim_Agents") == [("3",)]
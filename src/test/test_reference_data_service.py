@@ -0,0 +1,108 @@
+import pyarrow as pa
+import pytest
+
+from services import reference_data_service
+from services.reference_data_service import REFERENCE_TABLES, ReferenceDataService
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    """Each test starts without the process-wide reference cache."""
+    monkeypatch.setattr(reference_data_service, "_cache", {})
+
+
+def narrow_tickets(count, **columns):
+    """Narrow ticket rows pointing to reference rows 1, with `columns` replaced."""
+    keys = {table.key: [1] * count for table in REFERENCE_TABLES.values()}
+    return pa.table({"ticket_id": list(range(1, count + 1)), **keys, **columns})
+
+
+@pytest.fixture
+def table_loads(monkeypatch):
+    """Names of the reference tables read from the source, in order."""
+    loads = []
+    load_table = ReferenceDataService._load_table
+
+    def recording_load_table(self, name):
+        loads.append(name)
+        load_table(self, name)
+
+    monkeypatch.setattr(ReferenceDataService, "_load_table", recording_load_table)
+    return loads
+
+
+def company_names(db, company_ids):
+    """Company names joined to tickets of `company_ids` by a new run's service."""
+    tickets = narrow_tickets(len(company_ids), company_id=company_ids)
+    enriched = ReferenceDataService(db).enrich(tickets, ["company_name"])
+    return enriched.column("company_name").to_pylist()
+
+
+def test_cached_tables_are_reused_within_the_ttl(source_db, table_loads, monkeypatch):
+    monkeypatch.setenv("ETL_REFERENCE_CACHE_TTL", "3600")
+    assert company_names(source_db, [1]) == ["Company 1"]
+    source_db.execute_query(
+        "UPDATE dbo.Companies SET Name = 'Renamed' WHERE CompanyId = 1"
+    )
+
+    assert company_names(source_db, [1]) == ["Company 1"]
+    assert table_loads == list(REFERENCE_TABLES)
+
+    # Expired: every table is read again
+    monkeypatch.setenv("ETL_REFERENCE_CACHE_TTL", "0")
+    assert company_names(source_db, [1]) == ["Renamed"]
+    assert table_loads == list(REFERENCE_TABLES) * 2
+
+
+def test_expired_tables_are_revalidated_by_checksum(
+    source_db, table_loads, monkeypatch
+):
+    monkeypatch.setenv("ETL_REFERENCE_CACHE_CHECKSUM", "true")
+    # SQLite has no table checksum: the row count stands in for it
+    monkeypatch.setattr(
+        source_db.backend,
+        "table_checksum_sql",
+        lambda table: f"SELECT COUNT(*) FROM {table}",
+    )
+    assert company_names(source_db, [1]) == ["Company 1"]
+    assert company_names(source_db, [1]) == ["Company 1"]
+    assert table_loads == list(REFERENCE_TABLES)
+
+    source_db.execute_query(
+        "INSERT INTO dbo.Companies VALUES (99, 'Company 99', 'cnpj 99', 'A')"
+    )
+    assert company_names(source_db, [99]) == ["Company 99"]
+    assert table_loads == [*REFERENCE_TABLES, "companies"]
+
+
+def test_cached_table_missing_a_key_is_reloaded(source_db, table_loads, monkeypatch):
+    monkeypatch.setenv("ETL_REFERENCE_CACHE_TTL", "3600")
+    assert company_names(source_db, [1]) == ["Company 1"]
+    source_db.execute_query(
+        "INSERT INTO dbo.Companies VALUES (99, 'Company 99', 'cnpj 99', 'A')"
+    )
+
+    assert company_names(source_db, [1, 99, None]) == ["Company 1", "Company 99", None]
+    assert table_loads == [*REFERENCE_TABLES, "companies"]
+    # Known keys only: the reloaded table is reused
+    assert company_names(source_db, [99]) == ["Company 99"]
+    assert table_loads == [*REFERENCE_TABLES, "companies"]
+
+
+def test_enrich_keeps_all_null_columns(source_db):
+    # SQLite reports no column types: all-NULL columns come back null-typed
+    source_db.execute_query("UPDATE dbo.Companies SET Segmento = NULL")
+    tickets = narrow_tickets(2, agent_id=pa.nulls(2), closed_at=pa.nulls(2))
+
+    enriched = ReferenceDataService(source_db).enrich(
+        tickets,
+        ["ticket_id", "closed_at", "company_name", "company_segment", "agent_id"],
+    )
+
+    assert enriched.to_pydict() == {
+        "ticket_id": [1, 2],
+        "closed_at": [None, None],
+        "company_name": ["Company 1", "Company 1"],
+        "company_segment": [None, None],
+        "agent_id": [None, None],
+    }
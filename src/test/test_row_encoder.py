@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from utils.row_encoder import encode_rows, native_column
+
+
+def assert_native(values, expected):
+    """Equal to `expected`, value by value and type by type."""
+    assert values == expected
+    assert [type(value) for value in values] == [type(value) for value in expected]
+
+
+@pytest.mark.parametrize(
+    "series, expected",
+    [
+        (pd.Series([1.5, np.nan, 3.0]), [1.5, None, 3.0]),
+        (pd.Series([1, None, 3], dtype="Int64"), [1, None, 3]),
+        (pd.Series([0.5, None], dtype="Float64"), [0.5, None]),
+        (pd.Series([True, None], dtype="boolean"), [True, None]),
+        (pd.Series(["a", None], dtype="string"), ["a", None]),
+        (pd.Series(["a", pd.NA, np.nan, None]), ["a", None, None, None]),
+        (
+            pd.Series(pd.to_datetime(["2025-01-02 03:04:05.123456", None])),
+            [datetime(2025, 1, 2, 3, 4, 5, 123456), None],
+        ),
+    ],
+    ids=["float", "Int64", "Float64", "boolean", "string", "object", "datetime"],
+)
+def test_missing_values_become_none(series, expected):
+    assert_native(native_column(series), expected)
+
+
+def test_numpy_scalars_become_python_values():
+    assert_native(native_column(pd.Series([1, 2], dtype="int32")), [1, 2])
+    assert_native(native_column(pd.Series([True, False])), [True, False])
+    assert_native(native_column(pd.Series([0.25], dtype="float32")), [0.25])
+    # Object columns mixing types may hold numpy scalars
+    mixed = pd.Series([np.int64(7), "x", np.float64(0.5), np.bool_(True)], dtype=object)
+    assert_native(native_column(mixed), [7, "x", 0.5, True])
+
+
+def test_categories_are_converted_with_missing_codes():
+    categories = pd.Series(pd.Categorical(["Email", None, "Chat", "Email"]))
+    assert_native(native_column(categories), ["Email", None, "Chat", "Email"])
+
+    numbers = pd.Series(pd.Categorical([np.int64(3), np.nan, np.int64(1)]))
+    assert_native(native_column(numbers), [3, None, 1])
+
+
+def test_timezone_aware_datetimes_keep_their_wall_time():
+    times = pd.Series(
+        pd.to_datetime(["2025-01-02 10:00", None]).tz_localize("America/Sao_Paulo")
+    )
+    assert_native(native_column(times), [datetime(2025, 1, 2, 10), None])
+
+
+def test_arrow_columns_are_converted():
+    timestamps = pa.array(
+        [pd.Timestamp("2025-01-02 03:04:05.000001"), None], pa.timestamp("ns")
+    )
+    assert_native(
+        native_column(pa.chunked_array([timestamps])),
+        [datetime(2025, 1, 2, 3, 4, 5, 1), None],
+    )
+    assert_native(native_column(pa.array([1, None])), [1, None])
+
+
+def test_encode_rows_yields_chunks_of_tuples():
+    df = pd.DataFrame(
+        {
+            "Id": pd.array([1, 2, None], dtype="Int64"),
+            "Channel": pd.Categorical(["Chat", None, "Chat"]),
+            "Score": [0.5, np.nan, 2.0],
+        }
+    )
+
+    chunks = list(encode_rows(df, chunk_rows=2))
+    assert chunks == [[(1, "Chat", 0.5), (2, None, None)], [(None, "Chat", 2.0)]]
+    assert list(encode_rows(pa.Table.from_pandas(df), chunk_rows=2)) == chunks
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+
+import pytest
+
+from utils.run_ledger import EXTRACT_STEP, RunLedger, window_step
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    monkeypatch.setenv("ETL_SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setenv("ETL_RUN_MAX_ATTEMPTS", "2")
+    return RunLedger(str(tmp_path / "run_ledger.sqlite"))
+
+
+def run_statuses(ledger):
+    with sqlite3.connect(ledger.path) as connection:
+        return dict(connection.execute("SELECT run_id, status FROM runs"))
+
+
+def test_steps_are_checkpointed_per_run(ledger):
+    run_id, resumed = ledger.open_run("dw")
+    ledger.checkpoint(run_id, window_step(1, "dw", "load", "Dim_Users"))
+    ledger.checkpoint(run_id, window_step(1, "dw"))
+    ledger.checkpoint(run_id, "window-00001:elastic:load", detail="500")
+
+    assert not resumed
+    assert ledger.is_done(run_id, "window-00001:dw")
+    assert not ledger.is_done(run_id, "window-00002:dw")
+    assert ledger.completed_steps(run_id, window_step(1, "dw", "load", "")) == {
+        "window-00001:dw:load:Dim_Users": None
+    }
+    assert ledger.completed_steps(run_id, "window-00001:elastic") == {
+        "window-00001:elastic:load": "500"
+    }
+
+
+def test_failed_run_is_resumed_until_its_attempts_are_exhausted(ledger):
+    run_id, _ = ledger.open_run("dw")
+    ledger.checkpoint(run_id, EXTRACT_STEP)
+
+    assert ledger.open_run("dw") == (run_id, True)
+    assert ledger.open_run("other job")[1] is False
+
+    new_run_id, resumed = ledger.open_run("dw")
+    assert new_run_id != run_id and not resumed
+    assert run_statuses(ledger)[run_id] == "abandoned"
+
+
+def test_run_with_incomplete_extraction_is_abandoned(ledger):
+    run_id, _ = ledger.open_run("dw")
+    staged = os.path.join(ledger.snapshot_store.base_dir, run_id, "tickets")
+    os.makedirs(staged)
+
+    new_run_id, resumed = ledger.open_run("dw")
+
+    assert new_run_id != run_id and not resumed
+    assert run_statuses(ledger) == {run_id: "abandoned", new_run_id: "running"}
+    assert not os.path.exists(os.path.join(ledger.snapshot_store.base_dir, run_id))
+
+
+def test_finished_run_is_not_resumed(ledger, monkeypatch):
+    monkeypatch.setenv("ETL_SNAPSHOT", "true")
+    run_id, _ = ledger.open_run("dw")
+    ledger.checkpoint(run_id, EXTRACT_STEP)
+    run_dir = os.path.join(ledger.snapshot_store.base_dir, run_id)
+    os.makedirs(os.path.join(run_dir, "transformed"))
+
+    ledger.finish_run(run_id)
+
+    assert run_statuses(ledger) == {run_id: "completed"}
+    # ETL_SNAPSHOT keeps the extraction for --replay, not the built tables
+    assert os.path.isdir(run_dir)
+    assert not os.path.exists(os.path.join(run_dir, "transformed"))
+    assert ledger.open_run("dw")[0] != run_id
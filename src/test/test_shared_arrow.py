@@ -0,0 +1,29 @@
+import pickle
+from multiprocessing import resource_tracker
+
+import pyarrow as pa
+
+from utils.shared_arrow import SharedArrowTable
+
+
+def test_attached_block_is_left_to_its_owner(monkeypatch):
+    table = pa.table({"ticket_id": [1, 2, 3], "channel": ["Email", "Chat", None]})
+    shared = SharedArrowTable(table)
+    tracked = []
+    monkeypatch.setattr(
+        resource_tracker, "register", lambda name, rtype: tracked.append(name)
+    )
+    monkeypatch.setattr(
+        resource_tracker, "unregister", lambda name, rtype: tracked.remove(name)
+    )
+    try:
+        # As received by a worker process
+        attached = pickle.loads(pickle.dumps(shared))
+        assert attached.read(["channel"]) == table.select(["channel"])
+        attached.close()
+
+        # Only the owner's resource tracker may unlink the block
+        assert tracked == []
+    finally:
+        monkeypatch.undo()
+        shared.unlink()
@@ -0,0 +1,78 @@
+import pandas as pd
+import pyarrow as pa
+
+from services.transform_dw_service import TransformDwService
+
+
+def extraction(n=20):
+    ids = list(range(1, n + 1))
+    tickets = pa.table(
+        {
+            "ticket_id": ids,
+            "user_id": [i % 4 + 1 for i in ids],
+            "agent_id": pa.array([None if i % 7 == 0 else i % 3 for i in ids]),
+            "company_id": [i % 2 + 1 for i in ids],
+            "category_id": [1] * n,
+            "priorityId": [i % 2 + 1 for i in ids],
+            "current_status": [1] * n,
+            "product_id": [2] * n,
+            "channel": ["Email" if i % 2 else "Chat" for i in ids],
+            "company_name": ["Acme"] * n,
+            "company_segment": pa.array(
+                [None if i % 3 == 0 else "Retail" for i in ids]
+            ),
+            "company_cnpj": ["00.000.000/0001-00"] * n,
+            "user_full_name": ["User"] * n,
+            "user_is_vip": [i % 5 == 0 for i in ids],
+            "agent_full_name": ["Agent"] * n,
+            "agent_department": ["Support"] * n,
+            "product_name": ["Product"] * n,
+            "product_code": ["P-2"] * n,
+            "category_name": ["Hardware"] * n,
+            "subcategory_name": ["Printer"] * n,
+            "status_name": ["Open"] * n,
+            "priority": ["High"] * n,
+            "created_at": pa.array(
+                pd.date_range("2025-01-01", periods=n, freq="37min")
+            ),
+            "closed_at": pa.array(
+                [None if i % 2 else pd.Timestamp("2025-02-01 10:00") for i in ids],
+                pa.timestamp("us"),
+            ),
+            "first_response_at": pa.array(
+                pd.date_range("2025-01-01 00:10", periods=n, freq="37min")
+            ),
+        }
+    )
+    tags = pa.table(
+        {
+            "ticket_id": [1, 1, 2, 3],
+            "tag_id": ["1", "2", "1", "3"],
+            "tag_name": ["urgent", "printer", "urgent", "vip"],
+        }
+    )
+    return {"tickets": tickets, "tags": tags}
+
+
+def test_memory_lean_transform_keeps_the_global_pandas_options(monkeypatch):
+    monkeypatch.setenv("ETL_TRANSFORM_MEMORY_LEAN", "true")
+    copy_on_write = pd.get_option("mode.copy_on_write")
+
+    service = TransformDwService()
+    assert pd.get_option("mode.copy_on_write") == copy_on_write
+
+    transformed = service.transform(extraction())
+    assert pd.get_option("mode.copy_on_write") == copy_on_write
+    assert len(transformed["Dim_Agents"]) == 4
+    assert len(transformed["Fact_Tickets"]) == 21
+
+
+def test_process_pool_builds_the_same_tables(monkeypatch):
+    sequential = TransformDwService().transform(extraction())
+
+    monkeypatch.setenv("ETL_TRANSFORM_WORKERS", "2")
+    pooled = TransformDwService().transform(extraction())
+
+    assert list(pooled) == list(sequential)
+    for table_name, table in sequential.items():
+        pd.testing.assert_frame_equal(pooled[table_name], table)
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+from typing import Any, Callable, List, Optional, Sequence
+
+from config.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Responses meaning "send less per request": payload too large, throttled
+BACKOFF_HTTP_STATUSES = {413, 429}
+
+
+class BatchBackoff(Exception):
+    """Raised by a batch handler to ask for a smaller batch and a retry."""
+
+
+def is_backoff_error(error: Exception) -> bool:
+    """
+    Tells whether an error is a sign of overload (timeout, HTTP 413/429,
+    memory) rather than of a bad batch, so a smaller batch may succeed.
+    """
+    if isinstance(error, (BatchBackoff, MemoryError, TimeoutError)):
+        return True
+
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status in BACKOFF_HTTP_STATUSES:
+        return True
+
+    # pyodbc reports query timeouts as SQLSTATE HYT00
+    text = f"{type(error).__name__} {error}".lower()
+    return "timeout" in text or "timed out" in text or "hyt00" in text
+
+
+def available_memory_fraction() -> Optional[float]:
+    """Fraction of physical memory available, or None where unknown (non-Linux)."""
+    try:
+        meminfo = {}
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                name, value = line.split(":", 1)
+                meminfo[name] = int(value.split()[0])
+        return meminfo["MemAvailable"] / meminfo["MemTotal"]
+    except (OSError, KeyError, ValueError, ZeroDivisionError):
+        return None
+
+
+class AdaptiveBatchController:
+    """
+    Sizes the consecutive batches of a workload from the measured latency and
+    payload of the previous ones: the size moves toward the number of items
+    that fits in ETL_BATCH_TARGET_SECONDS (at most doubling or halving per
+    batch), is capped by `max_payload_bytes`, and is halved on timeouts,
+    HTTP 413/429 or when available memory drops below ETL_BATCH_MIN_FREE_MEMORY.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_size: int,
+        min_size: int = 1,
+        max_size: Optional[int] = None,
+        max_payload_bytes: Optional[int] = None,
+    ):
+        """
+        Args:
+            name: Workload name, used in the logs.
+            initial_size: Size of the first batch.
+            min_size: Smallest batch; a backoff at this size is not retried.
+            max_size: Largest batch (e.g. a driver parameter limit).
+            max_payload_bytes: Largest payload per batch, when measurable.
+        """
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_payload_bytes = max_payload_bytes
+        self.target_seconds = float(os.getenv("ETL_BATCH_TARGET_SECONDS", "2"))
+        self.min_free_memory = float(os.getenv("ETL_BATCH_MIN_FREE_MEMORY", "0.1"))
+
+        # _clamp reads the measured payload per item
+        self._bytes_per_item = None
+        self._lock = threading.Lock()
+        self.size = self._clamp(initial_size)
+
+    def _clamp(self, size: int) -> int:
+        if self.max_size:
+            size = min(size, self.max_size)
+        if self.max_payload_bytes and self._bytes_per_item:
+            size = min(size, int(self.max_payload_bytes / self._bytes_per_item))
+        return max(size, self.min_size)
+
+    def _resize(self, size: int, reason: str):
+        size = self._clamp(size)
+        if size != self.size:
+            logger.info(
+                f"Batch size for {self.name}: {self.size} -> {size} ({reason})."
+            )
+            self.size = size
+
+    def record(self, count: int, seconds: float, payload_bytes: Optional[int] = None):
+        """Adjusts the size after a batch of `count` items took `seconds`."""
+        with self._lock:
+            if payload_bytes and count:
+                self._bytes_per_item = payload_bytes / count
+
+            free_memory = available_memory_fraction()
+            if free_memory is not None and free_memory < self.min_free_memory:
+                self._resize(self.size // 2, "memory pressure")
+                return
+
+            # A short final batch says little about the best size
+            if count < self.size and seconds < self.target_seconds:
+                return
+
+            items_per_second = count / max(seconds, 1e-6)
+            proposed = int(items_per_second * self.target_seconds)
+            proposed = min(max(proposed, self.size // 2), self.size * 2)
+            self._resize(proposed, f"{count} items in {seconds:.2f}s")
+
+    def back_off(self, error: Exception) -> bool:
+        """
+        Halves the size after an overload error. Returns False when the size
+        is already minimal, so the caller should give up instead of retrying.
+        """
+        with self._lock:
+            if self.size <= self.min_size:
+                return False
+            self._resize(self.size // 2, f"backoff: {error}")
+            return True
+
+    def run(
+        self,
+        items: Sequence,
+        handle: Callable[[Sequence], Any],
+        payload_bytes: Optional[Callable[[Any], int]] = None,
+    ) -> List[Any]:
+        """
+        Calls `handle` on consecutive batches of `items` and returns its
+        results. A batch failing with an overload error is retried smaller;
+        any other error is raised.
+
+        Args:
+            payload_bytes: Optional function giving the payload size of a
+                batch from its result.
+        """
+        results = []
+        position = 0
+        while position < len(items):
+            batch = items[position : position + self.size]
+            started = time.perf_counter()
+            try:
+                result = handle(batch)
+            except Exception as e:
+                if is_backoff_error(e) and self.back_off(e):
+                    continue
+                raise
+
+            self.record(
+                len(batch),
+                time.perf_counter() - started,
+                payload_bytes(result) if payload_bytes else None,
+            )
+            results.append(result)
+            position += len(batch)
+        return results
@@ -0,0 +1,84 @@
+from datetime import date
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.columnar import as_datetime
+
+# Columns of the pre-populated calendar dimensions, in table order
+DIM_DATE_COLUMNS = [
+    "DateKey",
+    "FullDate",
+    "Year",
+    "Quarter",
+    "Month",
+    "MonthName",
+    "Day",
+    "DayOfWeek",
+    "DayName",
+    "WeekOfYear",
+    "IsWeekend",
+]
+DIM_TIME_COLUMNS = ["TimeKey", "Hour", "Minute"]
+
+MINUTES_PER_DAY = 1440
+
+
+def date_keys(values: pd.Series) -> pd.Series:
+    """
+    Returns the YYYYMMDD date key of each timestamp as a nullable integer
+    series; missing or unparseable values give <NA>.
+    """
+    timestamps = as_datetime(values)
+    keys = timestamps.dt.year * 10000 + timestamps.dt.month * 100 + timestamps.dt.day
+    return keys.astype("Int64")
+
+
+def time_keys(values: pd.Series) -> pd.Series:
+    """Returns the HHMM time-of-day key of each timestamp (minute grain)."""
+    timestamps = as_datetime(values)
+    return (timestamps.dt.hour * 100 + timestamps.dt.minute).astype("Int64")
+
+
+def key_to_date(date_key: int) -> date:
+    return date(date_key // 10000, date_key // 100 % 100, date_key % 100)
+
+
+def date_key_range(keys: pd.Series) -> Tuple[int, int]:
+    """Returns the smallest and largest non-null key, or (None, None)."""
+    keys = keys.dropna()
+    if keys.empty:
+        return None, None
+    return int(keys.min()), int(keys.max())
+
+
+def build_dim_date(start: date, end: date) -> pd.DataFrame:
+    """Builds one Dim_Date row per day from `start` to `end`, both included."""
+    days = pd.date_range(start, end, freq="D")
+    dim = pd.DataFrame(
+        {
+            "DateKey": days.year * 10000 + days.month * 100 + days.day,
+            "FullDate": days.date,
+            "Year": days.year,
+            "Quarter": days.quarter,
+            "Month": days.month,
+            "MonthName": days.month_name(),
+            "Day": days.day,
+            # ISO numbering: Monday = 1 ... Sunday = 7
+            "DayOfWeek": days.dayofweek + 1,
+            "DayName": days.day_name(),
+            "WeekOfYear": days.isocalendar().week.to_numpy(),
+            "IsWeekend": days.dayofweek >= 5,
+        }
+    )
+    return dim[DIM_DATE_COLUMNS]
+
+
+def build_dim_time() -> pd.DataFrame:
+    """Builds the 1440 Dim_Time rows, one per minute of the day."""
+    minutes = np.arange(MINUTES_PER_DAY)
+    hours, minutes = minutes // 60, minutes % 60
+    return pd.DataFrame(
+        {"TimeKey": hours * 100 + minutes, "Hour": hours, "Minute": minutes}
+    )
@@ -0,0 +1,102 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+
+# Arrow type for each Python type reported by pyodbc in cursor.description
+PYODBC_ARROW_TYPES = {
+    bool: pa.bool_(),
+    int: pa.int64(),
+    float: pa.float64(),
+    str: pa.string(),
+    datetime: pa.timestamp("us"),
+    date: pa.date32(),
+    bytes: pa.binary(),
+    bytearray: pa.binary(),
+}
+
+
+def _arrow_type(column_description: Sequence[Any]) -> pa.DataType:
+    type_code = column_description[1]
+    if type_code is Decimal:
+        precision = column_description[4] or 38
+        scale = column_description[5] or 0
+        return pa.decimal128(precision, scale)
+    # Anything else (e.g. uniqueidentifier as uuid.UUID) travels as text
+    return PYODBC_ARROW_TYPES.get(type_code, pa.string())
+
+
+def schema_from_description(description: Sequence[Sequence[Any]]) -> pa.Schema:
+    """Builds an Arrow schema from a DB-API cursor description."""
+    return pa.schema(
+        [
+            pa.field(column_description[0], _arrow_type(column_description))
+            for column_description in description
+        ]
+    )
+
+
+def record_batch_from_rows(rows: List[Sequence[Any]], schema: pa.Schema):
+    """Transposes a block of cursor rows into a typed Arrow record batch."""
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for values, field in zip(columns, schema):
+        if pa.types.is_string(field.type):
+            values = [None if v is None else str(v) for v in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def empty_table() -> pa.Table:
+    return pa.table({})
+
+
+def concat_tables(tables: List[pa.Table]) -> pa.Table:
+    tables = [table for table in tables if table.num_columns]
+    if not tables:
+        return empty_table()
+    # Blocks inferred from untyped rows may disagree (e.g. an all-NULL column)
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+# pandas nullable dtype for each Arrow integer type
+NULLABLE_INT_DTYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+}
+
+
+def to_frame(
+    data, categories: Optional[Sequence[str]] = None, nullable_ints: bool = False
+) -> pd.DataFrame:
+    """
+    Returns a DataFrame for an extracted collection, converting Arrow tables
+    once with their column types (datetimes stay datetime64).
+
+    Args:
+        categories: Columns to read as categoricals (dictionary-encoded by
+            Arrow, never materialized as one string object per row).
+        nullable_ints: Read integer columns as nullable Int dtypes instead
+            of float64 when they hold nulls.
+    """
+    if isinstance(data, pa.Table):
+        present = [c for c in categories or [] if c in data.column_names]
+        return data.to_pandas(
+            categories=present or None,
+            types_mapper=NULLABLE_INT_DTYPES.get if nullable_ints else None,
+        )
+    if isinstance(data, pd.DataFrame):
+        present = [c for c in categories or [] if c in data.columns]
+        return data.astype({c: "category" for c in present}) if present else data
+    return pd.DataFrame(data if data is not None else [])
+
+
+def as_datetime(series: pd.Series) -> pd.Series:
+    """Returns the series as datetime64, parsing it only when it is not typed yet."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, errors="coerce")
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Sequence
+
+import pandas as pd
+
+from config.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Keys per statement, below SQLite's bound-parameter limit
+QUERY_CHUNK_SIZE = 900
+
+
+def content_hash(record: dict) -> str:
+    """
+    Stable fingerprint of a JSON-like record: keys are sorted and values that
+    are not JSON types (dates, numpy scalars) are hashed by their text.
+    """
+    payload = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def row_hashes(df: pd.DataFrame, columns: Sequence[str]) -> pd.Series:
+    """
+    Vectorized 64-bit fingerprint of each row over `columns`, as 16 hex
+    digits. Values are hashed with their dtype, so a column changing type
+    (e.g. float64 to Int64) changes the hashes once.
+    """
+    hashes = pd.util.hash_pandas_object(df[list(columns)], index=False)
+    return hashes.map("{:016x}".format)
+
+
+class HashStore:
+    """
+    Persists the last content hash loaded for each key, split in namespaces
+    (e.g. one per target), in a local SQLite file.
+    """
+
+    def __init__(self, namespace: str, path: Optional[str] = None):
+        """
+        Args:
+            namespace: Target the hashes belong to.
+            path: SQLite file holding the hashes. Defaults to ETL_HASH_STORE_FILE.
+        """
+        self.namespace = namespace
+        self.path = path or os.getenv("ETL_HASH_STORE_FILE", "state/hashes.sqlite")
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS content_hashes (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Opens a connection that commits on success and is always closed."""
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def count(self) -> int:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT COUNT(*) FROM content_hashes WHERE namespace = ?",
+                (self.namespace,),
+            ).fetchone()
+        return row[0]
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Returns the stored hash of each key that has one."""
+        keys = list(keys)
+        hashes = {}
+        with self._connect() as connection:
+            for start in range(0, len(keys), QUERY_CHUNK_SIZE):
+                chunk = keys[start : start + QUERY_CHUNK_SIZE]
+                placeholders = ", ".join(["?"] * len(chunk))
+                rows = connection.execute(
+                    f"SELECT key, hash FROM content_hashes "
+                    f"WHERE namespace = ? AND key IN ({placeholders})",
+                    [self.namespace, *chunk],
+                )
+                hashes.update(rows)
+        return hashes
+
+    def set_many(self, hashes: Dict[str, str]):
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO content_hashes (namespace, key, hash) "
+                "VALUES (?, ?, ?)",
+                [(self.namespace, key, value) for key, value in hashes.items()],
+            )
+
+    def clear(self):
+        """Deletes every hash of the namespace."""
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM content_hashes WHERE namespace = ?", (self.namespace,)
+            )
+
+    def replace_all(self, hashes: Dict[str, str]):
+        """Replaces every hash of the namespace in one transaction."""
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM content_hashes WHERE namespace = ?", (self.namespace,)
+            )
+            connection.executemany(
+                "INSERT INTO content_hashes (namespace, key, hash) VALUES (?, ?, ?)",
+                [(self.namespace, key, value) for key, value in hashes.items()],
+            )
+        logger.info(
+            f"Hash store '{self.namespace}' rebuilt with {len(hashes)} entries."
+        )
@@ -0,0 +1,62 @@
+import resource
+import sys
+from contextlib import contextmanager
+from typing import Optional
+
+from config.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _proc_status_mib(field: str) -> Optional[float]:
+    """Reads a kB field (VmRSS, VmHWM) of /proc/self/status, or None off Linux."""
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def current_rss_mib() -> Optional[float]:
+    return _proc_status_mib("VmRSS")
+
+
+def peak_rss_mib() -> float:
+    """Peak resident set size since the last reset (or since process start)."""
+    peak = _proc_status_mib("VmHWM")
+    if peak is not None:
+        return peak
+    # ru_maxrss is in kB on Linux and in bytes on macOS, and cannot be reset
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def reset_peak_rss() -> bool:
+    """Resets the peak RSS to the current RSS. Returns False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf-8") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def track_peak_rss(stage: str, enabled: bool = True):
+    """Logs the peak RSS reached while the block runs."""
+    if not enabled:
+        yield
+        return
+
+    per_stage = reset_peak_rss()
+    start = current_rss_mib()
+    try:
+        yield
+    finally:
+        peak = peak_rss_mib()
+        growth = f", {peak - start:+.0f} MiB over its start" if start else ""
+        scope = "" if per_stage else " (process-wide)"
+        logger.info(f"Peak RSS during {stage}: {peak:.0f} MiB{scope}{growth}.")
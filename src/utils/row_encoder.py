@@ -0,0 +1,124 @@
+import gc
+from contextlib import contextmanager
+from typing import Iterator, List, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Rows encoded at a time; bounds the Python objects alive during a load
+DEFAULT_CHUNK_ROWS = 100000
+
+# Object columns holding only these kinds of values need no conversion
+NATIVE_INFERRED_TYPES = {
+    "string",
+    "bytes",
+    "empty",
+    "date",
+    "datetime",
+    "time",
+    "decimal",
+}
+
+
+def _with_nones(values: np.ndarray, missing: np.ndarray) -> list:
+    """Converts an array to a native list with None at the missing positions."""
+    if not missing.any():
+        return values.tolist()
+    objects = values.astype(object)
+    objects[missing] = None
+    return objects.tolist()
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Pauses the cyclic garbage collector: building millions of tuples would
+    trigger it over and over, although tuples of plain values hold no cycle.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def native_column(values: Union[pd.Series, pa.Array, pa.ChunkedArray]) -> list:
+    """
+    Converts a column to a list of Python values a DB-API driver accepts:
+    numpy scalars become int/float/bool, datetimes become `datetime`, and
+    missing values (NaN, NaT, pd.NA) become None. The work is done by numpy
+    and Arrow a column at a time; Python only touches the missing cells.
+    """
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        if pa.types.is_timestamp(values.type) and values.type.unit == "ns":
+            # Nanosecond timestamps would come out as pandas Timestamps
+            values = values.cast(pa.timestamp("us", values.type.tz), safe=False)
+        return values.to_pylist()
+
+    array = values.array
+    dtype = values.dtype
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Categories are converted once; code -1 picks the trailing None
+        categories = native_column(pd.Series(dtype.categories))
+        lookup = np.array([*categories, None], dtype=object)
+        return lookup[values.cat.codes.to_numpy()].tolist()
+
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        values = values.dt.tz_localize(None)
+        dtype = values.dtype
+
+    if dtype.kind == "M":
+        # Microsecond datetime64 converts to datetime objects, NaT to None
+        return values.to_numpy().astype("datetime64[us]").astype(object).tolist()
+
+    if isinstance(array, pd.arrays.ArrowExtensionArray) or dtype == "string":
+        return array.to_numpy(dtype=object, na_value=None).tolist()
+
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        # Nullable Int64/Float64/boolean: fill, convert, then blank the gaps
+        missing = np.asarray(array.isna())
+        filled = array.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+        return _with_nones(filled, missing)
+
+    if dtype.kind in "iub":
+        return values.to_numpy().tolist()
+
+    if dtype.kind == "f":
+        numbers = values.to_numpy()
+        return _with_nones(numbers, np.isnan(numbers))
+
+    objects = values.to_numpy(dtype=object)
+    missing = pd.isna(objects)
+    native = _with_nones(objects, missing)
+    if pd.api.types.infer_dtype(objects, skipna=True) not in NATIVE_INFERRED_TYPES:
+        # Mixed object columns may still hold numpy scalars
+        native = [
+            value.item() if isinstance(value, np.generic) else value for value in native
+        ]
+    return native
+
+
+def encode_rows(
+    data: Union[pd.DataFrame, pa.Table, pa.RecordBatch],
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[List[tuple]]:
+    """
+    Yields the rows of a DataFrame or Arrow table as lists of parameter
+    tuples ready for `executemany`, at most `chunk_rows` rows per list.
+    """
+    for start in range(0, len(data), chunk_rows):
+        with _gc_paused():
+            if isinstance(data, pd.DataFrame):
+                chunk = data.iloc[start : start + chunk_rows]
+                columns = [
+                    native_column(chunk.iloc[:, i]) for i in range(chunk.shape[1])
+                ]
+            else:
+                chunk = data.slice(start, chunk_rows)
+                columns = [native_column(column) for column in chunk.columns]
+            rows = list(zip(*columns))
+        yield rows
@@ -0,0 +1,159 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from config.dotenv_loader import get_boolean_from_env
+from config.logger import setup_logger
+from utils.snapshot_store import SnapshotStore
+
+logger = setup_logger(__name__)
+
+# Step recorded once every extraction window of a run is staged
+EXTRACT_STEP = "extract"
+
+
+def window_step(window_number: int, job_name: str, *parts: str) -> str:
+    """Name of a step of one extraction window, e.g. window-00003:dw:load:Dim_Users."""
+    return ":".join([f"window-{window_number:05d}", job_name, *parts])
+
+
+class RunLedger:
+    """
+    Persists the progress of the ETL runs in a local SQLite file: each run has
+    an ID (the one of its staged snapshot) and a status, and every step it
+    completes is checkpointed, so a failed or interrupted run is resumed at
+    its first incomplete step by the next one.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: SQLite file holding the ledger. Defaults to ETL_RUN_LEDGER_FILE.
+        """
+        self.path = path or os.getenv("ETL_RUN_LEDGER_FILE", "state/run_ledger.sqlite")
+        # A run failing this many times is abandoned for a fresh extraction
+        self.max_attempts = int(os.getenv("ETL_RUN_MAX_ATTEMPTS", "3"))
+        self.snapshot_store = SnapshotStore()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT NOT NULL PRIMARY KEY,
+                    job TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    started_at TEXT NOT NULL,
+                    finished_at TEXT
+                )
+                """
+            )
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS run_steps (
+                    run_id TEXT NOT NULL,
+                    step TEXT NOT NULL,
+                    detail TEXT,
+                    completed_at TEXT NOT NULL,
+                    PRIMARY KEY (run_id, step)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Opens a connection that commits on success and is always closed."""
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def open_run(self, job_name: str) -> Tuple[str, bool]:
+        """
+        Returns the run to execute for a job and whether it is resumed. The
+        last unfinished run is resumed when its extraction was fully staged
+        and it has attempts left; otherwise it is abandoned and a new run
+        is started.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT run_id, attempts FROM runs WHERE job = ? AND status = 'running' "
+                "ORDER BY started_at DESC LIMIT 1",
+                (job_name,),
+            ).fetchone()
+
+        if row:
+            run_id, attempts = row
+            if attempts < self.max_attempts and self.is_done(run_id, EXTRACT_STEP):
+                with self._connect() as connection:
+                    connection.execute(
+                        "UPDATE runs SET attempts = attempts + 1 WHERE run_id = ?",
+                        (run_id,),
+                    )
+                logger.info(
+                    f"Resuming run {run_id} of job '{job_name}' "
+                    f"(attempt {attempts + 1} of {self.max_attempts})."
+                )
+                return run_id, True
+
+            reason = (
+                "its extraction is incomplete"
+                if attempts < self.max_attempts
+                else f"it failed {attempts} times"
+            )
+            logger.warning(f"Abandoning run {run_id} of job '{job_name}': {reason}.")
+            self.finish_run(run_id, status="abandoned")
+
+        run_id = SnapshotStore.new_run_id()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO runs (run_id, job, status, attempts, started_at) "
+                "VALUES (?, ?, 'running', 1, ?)",
+                (run_id, job_name, datetime.now().isoformat()),
+            )
+        logger.info(f"Starting run {run_id} of job '{job_name}'.")
+        return run_id, False
+
+    def finish_run(self, run_id: str, status: str = "completed"):
+        """
+        Closes a run and deletes its staged intermediates. Its extraction is
+        kept for replay only when ETL_SNAPSHOT is enabled.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE runs SET status = ?, finished_at = ? WHERE run_id = ?",
+                (status, datetime.now().isoformat(), run_id),
+            )
+        self.snapshot_store.delete_run(
+            run_id, keep_extraction=bool(get_boolean_from_env("ETL_SNAPSHOT"))
+        )
+        logger.info(f"Run {run_id} {status}.")
+
+    def checkpoint(self, run_id: str, step: str, detail: Optional[str] = None):
+        """Records a completed step, or the progress `detail` of a partial one."""
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO run_steps (run_id, step, detail, completed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (run_id, step, detail, datetime.now().isoformat()),
+            )
+
+    def is_done(self, run_id: str, step: str) -> bool:
+        return step in self.completed_steps(run_id, step)
+
+    def completed_steps(self, run_id: str, prefix: str = "") -> Dict[str, str]:
+        """Returns the detail of every checkpointed step starting with `prefix`."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT step, detail FROM run_steps "
+                "WHERE run_id = ? AND substr(step, 1, ?) = ?",
+                (run_id, len(prefix), prefix),
+            )
+            return dict(rows)
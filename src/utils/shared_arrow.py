@@ -0,0 +1,88 @@
+import gc
+import os
+import sys
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Sequence
+
+import pyarrow as pa
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Maps an existing block without tracking it. Before Python 3.13 attaching
+    registers the block with the process's resource tracker, which unlinks
+    it under the owner (with a leak warning) once a worker exits.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SharedArrowTable:
+    """
+    An Arrow table written once, in IPC format, to a shared memory block.
+    Worker processes attach it by `name` and read it without a copy, instead
+    of receiving a pickled DataFrame each.
+    """
+
+    def __init__(self, table: pa.Table):
+        sink = pa.MockOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        self.size = sink.size()
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(self.size, 1))
+        self.name = self._shm.name
+        self._owner = True
+        with pa.ipc.new_stream(
+            pa.FixedSizeBufferWriter(pa.py_buffer(self._shm.buf)), table.schema
+        ) as writer:
+            writer.write_table(table)
+
+    def __getstate__(self):
+        # Only the reference travels to the workers
+        return {"name": self.name, "size": self.size}
+
+    def __setstate__(self, state):
+        self.name, self.size = state["name"], state["size"]
+        self._shm = None
+        self._owner = False
+
+    def read(self, columns: Optional[Sequence[str]] = None) -> pa.Table:
+        """
+        Returns the table (or some of its columns) backed by the shared
+        block. The block stays mapped until `close`.
+        """
+        if self._shm is None:
+            self._shm = (
+                shared_memory.SharedMemory(name=self.name)
+                if self._owner
+                else _attach(self.name)
+            )
+        reader = pa.ipc.open_stream(pa.py_buffer(self._shm.buf[: self.size]))
+        table = reader.read_all()
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        return table
+
+    def close(self):
+        """Unmaps the block; tables read from it must no longer be used."""
+        if self._shm is None:
+            return
+        gc.collect()
+        try:
+            self._shm.close()
+        except BufferError:
+            # Still referenced by a live Arrow buffer; unmapped at exit
+            return
+        self._shm = None
+
+    def unlink(self):
+        """Closes and frees the block (owner side, once the workers are done)."""
+        shm = self._shm or shared_memory.SharedMemory(name=self.name)
+        self._shm = shm
+        self.close()
+        shm.unlink()
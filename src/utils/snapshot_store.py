@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config.logger import setup_logger
+from utils.columnar import empty_table
+
+logger = setup_logger(__name__)
+
+EXTRACTED_COLLECTIONS = (
+    "tickets",
+    "attachments",
+    "tags",
+    "status_history",
+    "audit_logs",
+)
+
+
+def parquet_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Parquet columns hold one type, so object columns and categories mixing
+    value types (e.g. integer tag IDs with the "-1" N/A tag) are staged as
+    text. Business keys are text in the DW, and row hashes of the values
+    are the same either way.
+    """
+
+    def is_mixed(values) -> bool:
+        return pd.Series(values).dropna().map(type).nunique() > 1
+
+    columns = {}
+    for name, column in df.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            if is_mixed(column.cat.categories):
+                columns[name] = column.cat.rename_categories(str)
+        elif column.dtype == object and is_mixed(column):
+            columns[name] = column.where(column.isna(), column.astype(str))
+    return df.assign(**columns) if columns else df
+
+
+class SnapshotStore:
+    """
+    Stages extractions as compressed Parquet files under a run ID, so the
+    transform and load stages can be replayed without reading the source again.
+
+    Layout: <base_dir>/<run_id>/<collection>/window-<n>.parquet, plus a
+    manifest.json written once the extraction is complete. Resumable runs also
+    stage the tables they build under <base_dir>/<run_id>/transformed/.
+    """
+
+    def __init__(self, base_dir: Optional[str] = None):
+        self.base_dir = base_dir or os.getenv("ETL_SNAPSHOT_DIR", "state/snapshots")
+        self.compression = os.getenv("ETL_SNAPSHOT_COMPRESSION", "zstd")
+
+    @staticmethod
+    def new_run_id() -> str:
+        return f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+    def _run_dir(self, run_id: str) -> str:
+        return os.path.join(self.base_dir, run_id)
+
+    def _window_path(self, run_id: str, collection: str, window_number: int) -> str:
+        return os.path.join(
+            self._run_dir(run_id), collection, f"window-{window_number:05d}.parquet"
+        )
+
+    def write_window(
+        self, run_id: str, window_number: int, extracted: Dict[str, pa.Table]
+    ):
+        """Writes every collection of one extraction window."""
+        for collection in EXTRACTED_COLLECTIONS:
+            table = extracted.get(collection)
+            # Tables without columns come from empty results and are not written
+            if table is None or table.num_columns == 0:
+                continue
+
+            path = self._window_path(run_id, collection, window_number)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pq.write_table(table, path, compression=self.compression)
+
+        logger.info(f"Snapshot {run_id}: window {window_number} staged.")
+
+    def write_manifest(
+        self, run_id: str, windows: int, next_watermark: Optional[datetime]
+    ):
+        """Marks the snapshot as complete and replayable."""
+        manifest = {
+            "run_id": run_id,
+            "created_at": datetime.now().isoformat(),
+            "windows": windows,
+            "next_watermark": next_watermark.isoformat() if next_watermark else None,
+        }
+        os.makedirs(self._run_dir(run_id), exist_ok=True)
+        with open(
+            os.path.join(self._run_dir(run_id), "manifest.json"), "w", encoding="utf-8"
+        ) as f:
+            json.dump(manifest, f, indent=2)
+        logger.info(f"Snapshot {run_id} complete with {windows} windows.")
+
+    def read_manifest(self, run_id: str) -> dict:
+        path = os.path.join(self._run_dir(run_id), "manifest.json")
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"Snapshot {run_id} has no manifest: it does not exist or is incomplete."
+            )
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def read_window(self, run_id: str, window_number: int) -> Dict[str, pa.Table]:
+        extracted = {}
+        for collection in EXTRACTED_COLLECTIONS:
+            path = self._window_path(run_id, collection, window_number)
+            extracted[collection] = (
+                pq.read_table(path) if os.path.exists(path) else empty_table()
+            )
+        return extracted
+
+    def iter_windows(self, run_id: str) -> Iterator[Dict[str, pa.Table]]:
+        """Yields the extraction windows of a complete snapshot, in order."""
+        manifest = self.read_manifest(run_id)
+        for window_number in range(1, manifest["windows"] + 1):
+            yield self.read_window(run_id, window_number)
+
+    def _frame_path(
+        self, run_id: str, job_name: str, window_number: int, name: str
+    ) -> str:
+        return os.path.join(
+            self._run_dir(run_id),
+            "transformed",
+            job_name,
+            f"window-{window_number:05d}",
+            f"{name}.parquet",
+        )
+
+    def write_frame(
+        self,
+        run_id: str,
+        job_name: str,
+        window_number: int,
+        name: str,
+        df: pd.DataFrame,
+    ):
+        """Stages a table built by a job from one window, index included."""
+        path = self._frame_path(run_id, job_name, window_number, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        parquet_safe(df).to_parquet(tmp_path, compression=self.compression)
+        os.replace(tmp_path, path)
+
+    def read_frame(
+        self, run_id: str, job_name: str, window_number: int, name: str
+    ) -> pd.DataFrame:
+        return pd.read_parquet(self._frame_path(run_id, job_name, window_number, name))
+
+    def delete_run(self, run_id: str, keep_extraction: bool = False):
+        """Deletes the files of a run, or only its built tables."""
+        path = self._run_dir(run_id)
+        if keep_extraction:
+            path = os.path.join(path, "transformed")
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,53 @@
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+from config.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class WatermarkStore:
+    """Persists, per ETL job, the source timestamp of the last successful run."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: JSON file holding the watermarks. Defaults to ETL_WATERMARK_FILE.
+        """
+        self.path = path or os.getenv("ETL_WATERMARK_FILE", "state/watermarks.json")
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, job_name: str) -> Optional[datetime]:
+        """Returns the watermark of a job, or None when it never completed a run."""
+        value = self._read().get(job_name)
+        return datetime.fromisoformat(value) if value else None
+
+    def set(self, job_name: str, value: datetime):
+        """
+        Records the watermark of a job, replacing the file atomically. A value
+        older than the stored one is ignored, so replaying an old run never
+        moves a job backwards.
+        """
+        watermarks = self._read()
+        current = watermarks.get(job_name)
+        if current and datetime.fromisoformat(current) >= value:
+            logger.info(f"Watermark for job '{job_name}' already at {current}.")
+            return
+        watermarks[job_name] = value.isoformat()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(watermarks, f, indent=2)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Watermark for job '{job_name}' set to {value.isoformat()}.")